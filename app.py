@@ -1,7 +1,4 @@
 import asyncio
-import json
-import os
-from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
@@ -10,76 +7,10 @@ from rich.live import Live
 from rich.layout import Layout
 from rich.text import Text
 from rich import box
+from settings import SETTINGS_FILE, load_settings, save_settings, apply_settings_to_config
 
 console = Console()
 
-# Settings file
-SETTINGS_FILE = Path(__file__).parent / "settings.json"
-
-# Default settings
-DEFAULT_SETTINGS = {
-    "rpc_url": "https://mainnet.base.org",
-    "private_key": "",
-    "dry_run": True,
-    "pair_index": 1,
-    "pair_name": "BTC/USD",
-    "position_size": 10.0,
-    "leverage": 75,
-    "take_profit_pnl": 0.80,
-    "stop_loss_pnl": 0.80,
-    "entry_offset_min": 0.25,
-    "entry_offset_max": 1.0,
-    "reposition_threshold": 1.0,
-    "reposition_random": 0.2,
-    "check_interval_min": 10,
-    "check_interval_max": 30,
-    "trading_start_hour": 8,
-    "trading_end_hour": 24,
-    "trading_hours_variance": 15,
-}
-
-
-def load_settings() -> dict:
-    """Load settings from file or return defaults."""
-    if SETTINGS_FILE.exists():
-        try:
-            with open(SETTINGS_FILE, "r") as f:
-                saved = json.load(f)
-                # Merge with defaults (in case new settings added)
-                return {**DEFAULT_SETTINGS, **saved}
-        except:
-            pass
-    return DEFAULT_SETTINGS.copy()
-
-
-def save_settings(settings: dict):
-    """Save settings to file."""
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=2)
-
-
-def apply_settings_to_config(settings: dict):
-    """Apply settings to config module."""
-    import config
-    config.RPC_URL = settings["rpc_url"]
-    config.PRIVATE_KEY = settings["private_key"]
-    config.DRY_RUN = settings["dry_run"]
-    config.PAIR_INDEX = settings["pair_index"]
-    config.PAIR_NAME = settings["pair_name"]
-    config.POSITION_SIZE_USDC = settings["position_size"]
-    config.LEVERAGE = settings["leverage"]
-    config.TAKE_PROFIT_PNL = settings["take_profit_pnl"]
-    config.STOP_LOSS_PNL = settings["stop_loss_pnl"]
-    config.ENTRY_OFFSET_MIN = settings["entry_offset_min"] / 100
-    config.ENTRY_OFFSET_MAX = settings["entry_offset_max"] / 100
-    config.REPOSITION_THRESHOLD_PCT = settings["reposition_threshold"] / 100
-    config.REPOSITION_RANDOM = settings["reposition_random"] / 100
-    config.CHECK_INTERVAL_MIN = settings["check_interval_min"]
-    config.CHECK_INTERVAL_MAX = settings["check_interval_max"]
-    config.TRADING_START_HOUR = settings["trading_start_hour"]
-    config.TRADING_END_HOUR = settings["trading_end_hour"]
-    config.TRADING_HOURS_VARIANCE = settings["trading_hours_variance"]
-
 
 def show_header():
     """Show app header."""
@@ -109,8 +40,8 @@ def show_settings_table(settings: dict):
     table.add_row("Leverage", f"{settings['leverage']}x", "1-150")
 
     # TP/SL
-    table.add_row("Take Profit", f"{settings['take_profit_pnl']*100:.0f}%", "PnL to close with profit")
-    table.add_row("Stop Loss", f"{settings['stop_loss_pnl']*100:.0f}%", "PnL to close with loss")
+    table.add_row("Take Profit", f"{settings['take_profit_pnl']:.0f}%", "PnL to close with profit")
+    table.add_row("Stop Loss", f"{settings['stop_loss_pnl']:.0f}%", "PnL to close with loss")
 
     # Entry
     table.add_row("Entry Offset", f"{settings['entry_offset_min']}% - {settings['entry_offset_max']}%", "Distance from current price")
@@ -123,7 +54,7 @@ def show_settings_table(settings: dict):
 
     # Hours
     end_h = settings['trading_end_hour'] % 24
-    table.add_row("Trading Hours", f"{settings['trading_start_hour']:02d}:00 - {end_h:02d}:00 MSK", f"±{settings['trading_hours_variance']} min variance")
+    table.add_row("Trading Hours", f"{settings['trading_start_hour']:02d}:00 - {end_h:02d}:00 MSK", f"±{settings['trading_variance']} min variance")
 
     # Wallet
     pk = settings["private_key"]
@@ -177,13 +108,13 @@ def edit_position_settings(settings: dict):
 
     settings["take_profit_pnl"] = FloatPrompt.ask(
         "Take Profit PnL % (e.g. 80 for 80%)",
-        default=settings["take_profit_pnl"] * 100
-    ) / 100
+        default=settings["take_profit_pnl"]
+    )
 
     settings["stop_loss_pnl"] = FloatPrompt.ask(
         "Stop Loss PnL % (e.g. 80 for 80%)",
-        default=settings["stop_loss_pnl"] * 100
-    ) / 100
+        default=settings["stop_loss_pnl"]
+    )
 
     save_settings(settings)
     console.print("[green]Saved![/green]")
@@ -243,9 +174,9 @@ def edit_trading_hours(settings: dict):
         default=settings["trading_end_hour"]
     )
 
-    settings["trading_hours_variance"] = IntPrompt.ask(
+    settings["trading_variance"] = IntPrompt.ask(
         "Variance ± minutes",
-        default=settings["trading_hours_variance"]
+        default=settings["trading_variance"]
     )
 
     save_settings(settings)
@@ -312,9 +243,9 @@ async def run_bot(settings: dict):
     console.print("[dim]Press Ctrl+C to stop[/dim]")
     console.print()
 
-    # Import and run main
+    # Import and run main (settings.json edits are picked up live)
     from main import main
-    await main()
+    await main(settings_path=SETTINGS_FILE)
 
 
 def main_menu():
@@ -0,0 +1,254 @@
+"""
+End-to-end cycle latency benchmark.
+
+Runs the engine's cycle steps against the local mock chain and feed
+(mock_server.py, started in-process) and reports p50/p95/p99 per stage:
+
+    price_fetch     get_pair_price from the feed
+    decision        main.plan_entry (offset, TP/SL, size, threshold)
+    order_build     AvantisTrader._build_open_tx for both legs
+    sign            Signing both transactions
+    broadcast       eth_sendRawTransaction for both legs
+    confirm         Both receipts
+    cycle           Price fetch to both orders confirmed
+    reposition      Cancel both legs, re-plan and place a new pair
+
+Chain stages need the SDK; without it only price_fetch and decision run
+and the other stages report the error.
+
+Usage:
+    python bench_cycle.py --runs 20
+    python bench_cycle.py --runs 50 --speed 10 --latency 0.02 --json bench_cycle.json
+    python bench_cycle.py --json new.json --baseline old.json
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import config
+import mock_server
+
+ROOT = Path(__file__).parent
+
+STAGES = ["price_fetch", "decision", "order_build", "sign", "broadcast",
+          "confirm", "cycle", "reposition"]
+
+# Throwaway key: the mock chain does not check signatures
+BENCH_KEY = "0x" + "11" * 32
+
+
+def percentile(samples: list, q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: list) -> dict:
+    if not samples:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def start_mock(args) -> str:
+    """Run the mock server on a background thread, return its URL."""
+    mock_args = argparse.Namespace(
+        path=args.path, seed=args.seed, vol=0.0005, amplitude=0.01, period=600,
+        speed=args.speed, latency=args.latency, error_rate=0.0,
+        confirm_blocks=args.confirm_blocks)
+    server = mock_server.MockServer(mock_args)
+    ready = threading.Event()
+    address = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        srv = loop.run_until_complete(asyncio.start_server(server.handle, "127.0.0.1", 0))
+        address["port"] = srv.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait(10)
+    return f"http://127.0.0.1:{address['port']}"
+
+
+class Bench:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.errors = {}
+
+    def add(self, stage: str, started: float):
+        self.samples[stage].append((time.perf_counter() - started) * 1000)
+
+    def error(self, stage: str, e: Exception):
+        self.errors.setdefault(stage, f"{type(e).__name__}: {e}")
+
+
+async def place_pair(bench: Bench, trader, plan: dict):
+    """Build, sign, broadcast and confirm both legs, timing each stage."""
+    from eth_account import Account
+
+    orders = [dict(
+        pair_index=config.PAIR_INDEX, is_long=is_long, collateral=plan["collateral"],
+        leverage=config.LEVERAGE, limit_price=plan["entry_price"],
+        tp_price=plan["long_tp" if is_long else "short_tp"],
+        sl_price=plan["long_sl" if is_long else "short_sl"],
+        direction=plan["direction"]) for is_long in (True, False)]
+
+    w3 = trader.client.async_web3
+    nonce = await trader.client.get_transaction_count(trader.wallet)
+
+    t = time.perf_counter()
+    txs = [await trader._build_open_tx(**order) for order in orders]
+    bench.add("order_build", t)
+
+    t = time.perf_counter()
+    raws = []
+    for i, tx in enumerate(txs):
+        tx["nonce"] = nonce + i
+        signed = Account.sign_transaction(tx, trader.private_key)
+        raws.append(getattr(signed, "raw_transaction", None) or signed.rawTransaction)
+    bench.add("sign", t)
+
+    t = time.perf_counter()
+    hashes = [await w3.eth.send_raw_transaction(raw) for raw in raws]
+    bench.add("broadcast", t)
+
+    t = time.perf_counter()
+    await asyncio.gather(*(w3.eth.wait_for_transaction_receipt(h, poll_latency=0.01)
+                           for h in hashes))
+    bench.add("confirm", t)
+
+
+async def run_once(bench: Bench, trader):
+    import main
+    from price import get_pair_price
+
+    started = time.perf_counter()
+    t = started
+    anchor = await get_pair_price(config.PAIR_NAME)
+    bench.add("price_fetch", t)
+
+    t = time.perf_counter()
+    plan = main.plan_entry(anchor)
+    bench.add("decision", t)
+
+    if trader is None:
+        return
+    await place_pair(bench, trader, plan)
+    bench.add("cycle", started)
+
+    # Reposition as the engine does it: cancel both, then a fresh cycle
+    t = time.perf_counter()
+    for trade_index in (0, 1):
+        await trader.cancel_order(config.PAIR_INDEX, trade_index, dry_run=False)
+    plan = main.plan_entry(await get_pair_price(config.PAIR_NAME))
+    await trader.place_limit_orders([dict(
+        pair_index=config.PAIR_INDEX, is_long=is_long, collateral=plan["collateral"],
+        leverage=config.LEVERAGE, limit_price=plan["entry_price"],
+        tp_price=plan["long_tp" if is_long else "short_tp"],
+        sl_price=plan["long_sl" if is_long else "short_sl"],
+        direction=plan["direction"]) for is_long in (True, False)], dry_run=False)
+    bench.add("reposition", t)
+
+
+async def bench_cycles(args, url: str) -> Bench:
+    bench = Bench()
+    config.FEED_URL = url
+    config.RPC_URL = url
+    config.ADAPTIVE_ENTRY = False
+
+    trader = None
+    try:
+        from trader import AvantisTrader
+        trader = AvantisTrader(url, BENCH_KEY)
+    except Exception as e:
+        for stage in STAGES[2:]:
+            bench.error(stage, e)
+
+    for i in range(args.warmup + args.runs):
+        before = {stage: len(s) for stage, s in bench.samples.items()}
+        try:
+            await run_once(bench, trader)
+        except Exception as e:
+            done = [stage for stage in STAGES if len(bench.samples[stage]) > before[stage]]
+            missing = [stage for stage in STAGES if stage not in done]
+            bench.error(missing[0] if missing else "run", e)
+        if i < args.warmup:
+            # Warm-up runs fill caches and connections, not the results
+            for stage, s in bench.samples.items():
+                del s[before[stage]:]
+    return bench
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cycle latency benchmark against the mock chain")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--path", default="random", help="Mock price path (random, sine or CSV)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--speed", type=float, default=1.0, help="Mock clock speed (block time 2s / speed)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock latency per request (s)")
+    parser.add_argument("--confirm-blocks", type=int, default=1)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Earlier --json file to compare p50/p95 against")
+    args = parser.parse_args()
+
+    url = start_mock(args)
+    bench = asyncio.run(bench_cycles(args, url))
+
+    results = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "args": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "stages": {stage: summarize(bench.samples[stage]) for stage in STAGES},
+        "errors": bench.errors,
+    }
+
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["stages"]
+
+    print(f"{'stage':<12} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, stats in results["stages"].items():
+        if not stats["n"]:
+            print(f"{stage:<12} {0:>4}   {bench.errors.get(stage, 'no samples')}")
+            continue
+        line = (f"{stage:<12} {stats['n']:>4} {stats['p50_ms']:>10.2f} "
+                f"{stats['p95_ms']:>10.2f} {stats['p99_ms']:>10.2f}")
+        old = (baseline or {}).get(stage, {})
+        if old.get("n"):
+            line += f"   p50 {stats['p50_ms'] - old['p50_ms']:+.2f}, p95 {stats['p95_ms'] - old['p95_ms']:+.2f}"
+        print(line)
+    for stage, error in bench.errors.items():
+        if results["stages"].get(stage, {}).get("n"):
+            print(f"[WARN] {stage}: {error}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"Saved {args.json}")
+
+
+if __name__ == "__main__":
+    main()
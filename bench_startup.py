@@ -0,0 +1,150 @@
+"""
+Startup-time benchmark.
+
+Measures cold import time of the entry modules and time to first paint
+of the GUI, each in a fresh interpreter, and checks that importing them
+does not pull in the SDK. Exit code 1 if a limit is exceeded.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 10 --max-import-ms 300 --json bench_startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+# Modules whose import must stay cheap
+MODULES = ["config", "main", "gui"]
+
+# Heavy packages that must not be loaded by a plain import
+HEAVY = ["avantis_trader_sdk", "web3", "eth_account"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+dt = (time.perf_counter() - t0) * 1000
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"ms": dt, "heavy": heavy}}))
+"""
+
+PAINT_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import gui
+t_import = time.perf_counter()
+app = gui.App()
+app.update()
+t_paint = time.perf_counter()
+app.destroy()
+print(json.dumps({"import_ms": (t_import - t0) * 1000,
+                  "paint_ms": (t_paint - t0) * 1000}))
+"""
+
+
+def run_snippet(code: str) -> dict:
+    """Run code in a fresh interpreter and parse its last JSON line."""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "max_ms": round(max(samples), 2),
+    }
+
+
+def bench_imports(runs: int) -> dict:
+    results = {}
+    for module in MODULES:
+        samples = []
+        heavy = set()
+        try:
+            for _ in range(runs):
+                data = run_snippet(IMPORT_SNIPPET.format(module=module, heavy=HEAVY))
+                samples.append(data["ms"])
+                heavy.update(data["heavy"])
+        except Exception as e:
+            results[module] = {"error": str(e)}
+            continue
+        results[module] = {**summarize(samples), "heavy_loaded": sorted(heavy)}
+    return results
+
+
+def bench_first_paint(runs: int) -> dict:
+    import_samples = []
+    paint_samples = []
+    try:
+        for _ in range(runs):
+            data = run_snippet(PAINT_SNIPPET)
+            import_samples.append(data["import_ms"])
+            paint_samples.append(data["paint_ms"])
+    except Exception as e:
+        return {"error": str(e)}
+    return {"import": summarize(import_samples), "first_paint": summarize(paint_samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if a module median exceeds this")
+    parser.add_argument("--max-paint-ms", type=float, default=None, help="Fail if first paint median exceeds this")
+    parser.add_argument("--no-gui", action="store_true", help="Skip first-paint measurement (no display)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    report = {"python": sys.version.split()[0], "runs": args.runs}
+    report["imports"] = bench_imports(args.runs)
+    if not args.no_gui:
+        report["gui"] = bench_first_paint(args.runs)
+
+    failures = []
+    print(f"{'Module':<10} {'Median':>10} {'Min':>10} {'Max':>10}  Heavy")
+    for module, r in report["imports"].items():
+        if "error" in r:
+            print(f"{module:<10} ERROR: {r['error']}")
+            failures.append(f"{module} import failed")
+            continue
+        heavy = ", ".join(r["heavy_loaded"]) or "-"
+        print(f"{module:<10} {r['median_ms']:>8.1f}ms {r['min_ms']:>8.1f}ms {r['max_ms']:>8.1f}ms  {heavy}")
+        if r["heavy_loaded"]:
+            failures.append(f"{module} imports {heavy}")
+        if args.max_import_ms is not None and r["median_ms"] > args.max_import_ms:
+            failures.append(f"{module} import {r['median_ms']}ms > {args.max_import_ms}ms")
+
+    gui_report = report.get("gui")
+    if gui_report:
+        if "error" in gui_report:
+            print(f"First paint: ERROR: {gui_report['error']}")
+            # --no-gui is the way to skip first paint, e.g. without a display
+            failures.append("first paint failed")
+        else:
+            paint = gui_report["first_paint"]["median_ms"]
+            print(f"First paint: {paint:.1f}ms (import {gui_report['import']['median_ms']:.1f}ms)")
+            if args.max_paint_ms is not None and paint > args.max_paint_ms:
+                failures.append(f"first paint {paint}ms > {args.max_paint_ms}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
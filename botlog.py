@@ -0,0 +1,182 @@
+"""
+Structured logging for the engine, GUI and daemon.
+
+Modules log through standard loggers under "dn" (get("engine")). Records
+are put on a queue and written by one background thread, so a slow
+terminal or disk never blocks the event loop. The writer thread:
+
+    - prints the message to the console (same text as the old prints)
+    - appends a JSON line to config.LOG_FILE
+    - hands a dict of the record to every subscriber (GUI log box,
+      daemon GET /logs)
+
+Cycle id, pair and wallet come from bind() and follow the asyncio task
+that set them; side and tx hash are passed per record:
+
+    log.info(f"[LONG] LIMIT at ${price:.2f}: {tx}", extra={"side": "LONG", "tx_hash": tx})
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+ROOT = "dn"
+
+# Fields copied into every JSON line when set
+FIELDS = ("cycle_id", "pair", "wallet", "side", "tx_hash")
+
+_context = contextvars.ContextVar("botlog_context", default={})
+_subscribers = []
+_lock = threading.Lock()
+_listener = None
+
+# Until setup() runs (or after shutdown), records are printed directly
+_fallback = logging.StreamHandler(sys.stdout)
+logging.getLogger(ROOT).addHandler(_fallback)
+logging.getLogger(ROOT).setLevel(logging.INFO)
+# Records stop at "dn", not at the (possibly configured) root logger
+logging.getLogger(ROOT).propagate = False
+
+
+def get(name: str) -> logging.Logger:
+    """Logger for a module, e.g. get("engine") -> "dn.engine"."""
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def bind(**fields):
+    """Attach fields (cycle_id, pair, wallet) to records of the current task. None clears."""
+    current = dict(_context.get())
+    for key, value in fields.items():
+        if value is None:
+            current.pop(key, None)
+        else:
+            current[key] = value
+    _context.set(current)
+
+
+def subscribe(callback):
+    """
+    Call callback(record_dict) for every record, from the writer thread.
+    Callbacks must be quick and thread-safe (e.g. hand off to a GUI loop).
+    """
+    with _lock:
+        _subscribers.append(callback)
+    setup()
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def to_dict(record: logging.LogRecord) -> dict:
+    data = {
+        "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+        "level": record.levelname.lower(),
+        "logger": record.name,
+        "msg": record.getMessage(),
+    }
+    for key in FIELDS:
+        value = getattr(record, key, None)
+        if value is not None:
+            data[key] = value
+    if record.exc_info:
+        data["exc"] = logging.Formatter().formatException(record.exc_info)
+    return data
+
+
+class _ContextFilter(logging.Filter):
+    """Copy bound fields onto the record in the logging thread (before the queue)."""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if getattr(record, key, None) is None:
+                setattr(record, key, value)
+        return True
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(to_dict(record), default=str)
+
+
+class _SubscriberHandler(logging.Handler):
+    def emit(self, record):
+        with _lock:
+            callbacks = list(_subscribers)
+        if not callbacks:
+            return
+        data = to_dict(record)
+        for callback in callbacks:
+            try:
+                callback(data)
+            except Exception:
+                pass
+
+
+def setup(log_file: str = None, console: bool = True, console_json: bool = False):
+    """
+    Start the writer thread once per process. Later calls are no-ops.
+
+    Args:
+        log_file: JSON lines file (default: config.LOG_FILE in the state folder, "" = none)
+        console: Also write to stdout
+        console_json: Write JSON lines to stdout instead of plain messages
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        if log_file is None:
+            import config
+            from pathlib import Path
+            folder = Path(config.STATE_DIR) if config.STATE_DIR else Path(__file__).parent
+            log_file = str(folder / config.LOG_FILE) if config.LOG_FILE else ""
+
+        handlers = [_SubscriberHandler()]
+        if console:
+            out = logging.StreamHandler(sys.stdout)
+            if console_json:
+                out.setFormatter(_JsonFormatter())
+            handlers.append(out)
+        if log_file:
+            # Rotated at 10 MB
+            file = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=10 * 1024 * 1024, backupCount=3, encoding="utf-8")
+            file.setFormatter(_JsonFormatter())
+            handlers.append(file)
+
+        q = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(q)
+        handler.addFilter(_ContextFilter())
+        root = logging.getLogger(ROOT)
+        root.removeHandler(_fallback)
+        root.addHandler(handler)
+
+        _listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    root = logging.getLogger(ROOT)
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(_fallback)
@@ -0,0 +1,118 @@
+"""
+Price chart helpers for the GUI.
+
+Keeps recent ticks in memory and downsamples them to the chart width,
+so redrawing hours of history costs about the same as redrawing a minute.
+"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+
+
+class TickBuffer:
+    """
+    Ring buffer of (timestamp, price) ticks.
+    Oldest ticks are dropped once maxlen is reached.
+
+    add() runs on the price worker thread and window() on the Tk thread:
+    each tick is one tuple in one deque, so a copy never pairs a time
+    with the wrong price.
+    """
+
+    def __init__(self, maxlen: int = 50000):
+        self.ticks = deque(maxlen=maxlen)
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def add(self, price: float, ts: float = None):
+        """Append a tick. Non-positive prices are ignored."""
+        if price <= 0:
+            return
+        self.ticks.append((time.time() if ts is None else ts, price))
+
+    def clear(self):
+        self.ticks.clear()
+
+    def last(self):
+        """Last (timestamp, price) tick or None."""
+        try:
+            return self.ticks[-1]
+        except IndexError:
+            return None
+
+    def window(self, seconds: float = None):
+        """
+        Get ticks from the last `seconds` (all ticks if None).
+
+        Returns:
+            Tuple of (times, prices) lists
+        """
+        ticks = list(self.ticks)
+        if seconds is not None and ticks:
+            # Ticks are time-ordered, skip those before the window
+            ticks = ticks[bisect_left(ticks, (ticks[-1][0] - seconds,)):]
+        return [t for t, _ in ticks], [p for _, p in ticks]
+
+
+def downsample_minmax(times: list, prices: list, buckets: int):
+    """
+    Min/max bucketing: split ticks into `buckets` equal slices and keep
+    the lowest and highest tick of each slice, in time order.
+    Spikes survive downsampling, which matters when price touches TP/SL.
+
+    Returns:
+        Tuple of (times, prices) lists with at most 2 * buckets points
+    """
+    n = len(prices)
+    if buckets <= 0 or n <= 2 * buckets:
+        return list(times), list(prices)
+
+    out_t = []
+    out_p = []
+    step = n / buckets
+    for b in range(buckets):
+        lo = int(b * step)
+        hi = int((b + 1) * step)
+        if hi <= lo:
+            continue
+
+        seg = prices[lo:hi]
+        p_min = min(seg)
+        p_max = max(seg)
+        i_min = lo + seg.index(p_min)
+        i_max = lo + seg.index(p_max)
+
+        if i_min == i_max:
+            out_t.append(times[i_min])
+            out_p.append(p_min)
+        elif i_min < i_max:
+            out_t += (times[i_min], times[i_max])
+            out_p += (p_min, p_max)
+        else:
+            out_t += (times[i_max], times[i_min])
+            out_p += (p_max, p_min)
+
+    return out_t, out_p
+
+
+def to_canvas_coords(times: list, prices: list, width: int, height: int,
+                     p_low: float, p_high: float, pad: int = 4) -> list:
+    """
+    Map ticks to a flat [x0, y0, x1, y1, ...] list for Canvas.coords().
+    """
+    if not prices:
+        return []
+
+    t0 = times[0]
+    t_span = (times[-1] - t0) or 1.0
+    p_span = (p_high - p_low) or 1.0
+    w = max(width - 2 * pad, 1)
+    h = max(height - 2 * pad, 1)
+
+    coords = []
+    for t, p in zip(times, prices):
+        coords.append(pad + (t - t0) / t_span * w)
+        coords.append(pad + (p_high - p) / p_span * h)
+    return coords
@@ -8,6 +8,7 @@
 # NETWORK & WALLET
 # ------------------------------------------------------------
 RPC_URL = "https://mainnet.base.org"
+FEED_URL = ""  # Price feed override, e.g. "http://127.0.0.1:8545" for mock_server.py
 PRIVATE_KEY = ""  # Set via GUI or settings.json
 
 # ------------------------------------------------------------
@@ -15,6 +16,14 @@ PRIVATE_KEY = ""  # Set via GUI or settings.json
 # ------------------------------------------------------------
 DRY_RUN = True  # True = simulation, False = live trading
 
+# Dry run on a simulated exchange (fills, TP/SL, fees, latency).
+# False = old dry run that only prints orders.
+SIM_EXCHANGE = True
+SIM_LATENCY = 2.0        # Seconds per simulated transaction confirmation
+SIM_OPEN_FEE = 0.0006    # Fraction of position size charged on open
+SIM_CLOSE_FEE = 0.0006   # Fraction of position size charged on close
+SIM_BALANCE = 1000.0     # Starting USDC balance
+
 # ------------------------------------------------------------
 # TRADING PAIR
 # ------------------------------------------------------------
@@ -34,6 +43,8 @@ DEPOSIT_STEP = 0.5         # Rounding step for collateral (0.5 = 10.0, 10.5, 11.
 # ------------------------------------------------------------
 TAKE_PROFIT_PNL = 0.80  # +80% = close with profit
 STOP_LOSS_PNL = 0.80    # -80% = close with loss
+COST_AWARE_TPSL = False  # Targets net of fees, spread and borrow (pair table costs); opt-in
+HOLD_HOURS = 4          # Expected holding time for borrow fees
 
 # ------------------------------------------------------------
 # ENTRY LEVELS
@@ -47,11 +58,28 @@ ENTRY_OFFSET_MAX = 0.01     # 1.0% maximum
 REPOSITION_THRESHOLD_PCT = 0.01   # 1% - if price moved, cancel and reposition
 REPOSITION_RANDOM = 0.002         # ±0.2% randomness
 
+# ------------------------------------------------------------
+# GRID MODE
+# ------------------------------------------------------------
+GRID_LEVELS = 1  # LONG/SHORT pairs per cycle, spread above and below price (1 = off)
+
+# ------------------------------------------------------------
+# ADAPTIVE ENTRY (scale offset and reposition with volatility)
+# ------------------------------------------------------------
+ADAPTIVE_ENTRY = False     # Entry offset clamped to ENTRY_OFFSET_MIN..MAX
+VOLATILITY_WINDOW = 60     # Minutes of ticks for realized volatility
+OFFSET_VOL_MULT = 1.0      # Entry offset = mult x volatility over the window
+REPOSITION_VOL_MULT = 2.0  # Reposition threshold = mult x volatility
+REPOSITION_MIN = 0.003     # 0.3% lowest adaptive reposition threshold
+REPOSITION_MAX = 0.03      # 3% highest adaptive reposition threshold
+
 # ------------------------------------------------------------
 # INTERVALS
 # ------------------------------------------------------------
 CHECK_INTERVAL_MIN = 10   # Minimum seconds between checks
 CHECK_INTERVAL_MAX = 30   # Maximum seconds between checks
+CHECK_INTERVAL_FAST = 2   # Seconds between checks when price is at a trigger
+POLL_BUDGET_PER_MIN = 12  # Max checks per minute while waiting for fill/TP/SL
 
 # ------------------------------------------------------------
 # TRADING HOURS (UTC)
@@ -59,3 +87,45 @@ CHECK_INTERVAL_MAX = 30   # Maximum seconds between checks
 TRADING_START_HOUR = 8    # Start trading at 8:00
 TRADING_END_HOUR = 24     # End trading at 00:00 (24 = midnight)
 TRADING_HOURS_VARIANCE = 15  # ±15 minutes variance
+TRADING_SCHEDULE = {}     # Per weekday hours, e.g. {"sat": None, "sun": [10, 22]}
+TRADING_HOLIDAYS = []     # Days off (MSK dates), e.g. ["2025-01-01"]
+
+# ------------------------------------------------------------
+# STATE
+# ------------------------------------------------------------
+STATE_DIR = ""  # Folder for the cycle journal ("" = bot folder)
+TRADE_DB = "trades.db"  # SQLite trade journal in STATE_DIR ("" = disabled)
+LOG_FILE = "bot.log"    # JSON lines log in STATE_DIR ("" = console only)
+TRACE_FILE = "traces.jsonl"  # OTLP/JSON cycle traces in STATE_DIR ("" = disabled)
+PAIRS_CACHE = "pairs_cache.json"  # Pair table read from chain, in STATE_DIR ("" = no cache)
+PAIRS_TTL = 6 * 3600     # Re-read the pair table from chain when older (seconds)
+
+# ------------------------------------------------------------
+# MONITORING
+# ------------------------------------------------------------
+METRICS_PORT = 0  # Serve Prometheus /metrics on 127.0.0.1:PORT (0 = off, daemon has its own)
+PROFILE_CYCLES = 0        # Profile this many cycles to STATE_DIR/profiles (0 = off)
+STALL_THRESHOLD_MS = 100  # While profiling: log the stack when the event loop blocks longer
+TRACE_ENDPOINT = ""  # Also POST cycle traces to an OTLP/HTTP collector, e.g. "http://127.0.0.1:4318/v1/traces"
+
+# ------------------------------------------------------------
+# RETRIES & WATCHDOG
+# ------------------------------------------------------------
+FEED_TIMEOUT = 10        # Seconds per price feed request
+RPC_READ_TIMEOUT = 20    # Seconds per chain read (trades, nonce, gas, building a tx)
+TX_TIMEOUT = 180         # Seconds to sign, send and confirm a transaction
+CALL_RETRIES = 2         # Retries of a failed read or feed request before switching endpoint
+RETRY_BACKOFF = 0.5      # First retry delay in seconds, doubled per retry (half of it random)
+RETRY_BACKOFF_MAX = 8    # Cap of the retry delay
+BREAKER_FAILURES = 5     # Failures in a row that open an endpoint's circuit breaker
+BREAKER_COOLDOWN = 30    # Seconds an open breaker fails calls before a trial call
+RPC_FALLBACK_URLS = []   # Other RPCs to switch to when one fails
+WATCHDOG_TIMEOUT = 300   # Escalate when the engine misses its heartbeat this long (0 = off)
+
+# ------------------------------------------------------------
+# RATE LIMITS (shared by the engine and the GUI, 0 = unlimited)
+# ------------------------------------------------------------
+RATE_LIMIT_READ = 10     # Chain reads per second
+RATE_LIMIT_WRITE = 2     # Transactions per second
+RATE_LIMIT_FEED = 5      # Price feed requests per second
+RATE_LIMIT_BURST = 2     # Seconds of budget that can be spent at once
@@ -0,0 +1,141 @@
+"""
+Control channel for a running bot.
+
+The engine (main.main) runs in its own thread with its own event loop.
+Commands from the GUI or other threads are handed to that loop with
+call_soon_threadsafe, so every method below is safe to call from anywhere.
+"""
+
+import asyncio
+
+import botlog
+
+log = botlog.get("control")
+
+
+class BotControl:
+    """
+    Stop, pause/resume and cancel-all commands for main.main.
+
+    The engine calls attach() once, then uses sleep() instead of
+    asyncio.sleep() so any command interrupts a pending wait at once.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._task = None
+        self._wake = None
+        self.paused = False
+        self.stopped = False
+        self.cancel_requested = False
+
+        # Set by main.main when it runs with a settings file
+        self.watcher = None
+        # Set by main.main when config.TRADE_DB is enabled
+        self.journal = None
+        # Set by main.main: heartbeat monitor (watchdog.Watchdog)
+        self.watchdog = None
+
+        # Published by the engine for status readers (daemon API, GUI)
+        self.trader = None
+        self.status = {"phase": "starting", "cycle": 0}
+
+    # ----- Engine side -----
+
+    def attach(self):
+        """Bind to the current engine task. Must be called from inside it."""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._wake = asyncio.Event()
+        if self.stopped:
+            self._task.cancel()
+
+    def heartbeat(self, grace: float = 0.0):
+        """Tell the watchdog the engine is alive and may be quiet for `grace` seconds."""
+        if self.watchdog:
+            self.watchdog.beat(grace)
+
+    async def sleep(self, seconds: float) -> bool:
+        """
+        Sleep up to `seconds`, waking early on any command.
+
+        Returns:
+            True if woken by a command, False if the full time elapsed
+        """
+        self.heartbeat(seconds)
+        if self._wake.is_set():
+            self._wake.clear()
+            return True
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=max(seconds, 0))
+        except asyncio.TimeoutError:
+            return False
+        self._wake.clear()
+        return True
+
+    async def wait_if_paused(self):
+        """Block while paused. Returns early if cancel_all() is requested."""
+        if not self.paused or self.cancel_requested:
+            return
+        log.info("[CONTROL] Paused")
+        phase = self.status.get("phase")
+        self.status["phase"] = "paused"
+        if self.watchdog:
+            self.watchdog.suspend()
+        while self.paused and not self.cancel_requested:
+            self._wake.clear()
+            await self._wake.wait()
+        self.heartbeat()
+        self.status["phase"] = phase
+        if not self.paused:
+            log.info("[CONTROL] Resumed")
+
+    def take_cancel_request(self) -> bool:
+        """Return True once per cancel_all() call."""
+        if self.cancel_requested:
+            self.cancel_requested = False
+            return True
+        return False
+
+    # ----- Command side (thread-safe) -----
+
+    def stop(self):
+        """Cancel the engine task."""
+        self.stopped = True
+        self._call(lambda: self._task.cancel())
+
+    def pause(self):
+        """Hold the engine at its next checkpoint."""
+        self.paused = True
+        self._call(self._on_command)
+
+    def resume(self):
+        self.paused = False
+        self._call(self._on_command)
+
+    def notify(self):
+        """Wake the engine so it reaches its next safe point now."""
+        self._call(self._on_command)
+
+    def cancel_all(self, pause: bool = True):
+        """Cancel all pending orders now, then pause (unless pause is False)."""
+        self.cancel_requested = True
+        if pause:
+            self.paused = True
+        self._call(self._on_command)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _call(self, fn):
+        # Before attach() the flags above are picked up by attach itself
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(fn)
+        except RuntimeError:
+            pass  # Loop closed in between: engine already finished
+
+    def _on_command(self):
+        self._wake.set()
@@ -0,0 +1,358 @@
+"""
+Headless daemon: runs the trading engine under a supervisor and exposes
+a small local control API. No GUI, no terminal UI, stdlib only.
+
+Usage:
+    python daemon.py --port 8787 --autostart
+    python daemon.py --socket /run/dn-bot.sock --settings /etc/dn-bot/settings.json
+
+API (JSON):
+    GET  /status    Engine phase, cycle, price, uptime, restarts
+    GET  /orders    Open positions and pending orders
+    GET  /metrics   Engine and process metrics (Prometheus text format)
+    GET  /logs      Recent log records (JSON, with cycle id, pair, wallet, side, tx hash)
+    GET  /config    Current settings (private key masked)
+    POST /config    Merge JSON body into settings.json (hot-reloaded)
+    POST /start | /stop | /pause | /resume | /cancel
+
+Every request except GET /metrics needs "Authorization: Bearer <token>"
+with the token from daemon.token next to the settings file (created on
+first start). POSTs must be Content-Type: application/json, and over TCP
+the Host header must name the loopback address and port, so web pages
+in a local browser cannot drive the API (CSRF, DNS rebinding).
+"""
+
+import argparse
+import asyncio
+import collections
+import hmac
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+
+import botlog
+import metrics
+from settings import (SETTINGS_FILE, RESTART_KEYS, load_settings, save_settings,
+                      apply_settings_to_config, validate_settings)
+from control import BotControl
+from trader import order_to_dict
+
+log = botlog.get("daemon")
+
+
+MAX_BODY = 64 * 1024
+RESTART_DELAY_MIN = 5
+RESTART_DELAY_MAX = 300
+LOG_HISTORY = 500
+TOKEN_FILE = "daemon.token"
+
+
+class EngineSupervisor:
+    """
+    Runs main.main in a task and restarts it with backoff if it crashes.
+    """
+
+    def __init__(self, settings_path: Path):
+        self.settings_path = Path(settings_path)
+        self.control = None
+        self.task = None
+        self.started_at = time.time()
+        self.engine_started_at = None
+        self.restarts = 0
+        self.last_error = None
+        # Recent log records for GET /logs, filled by the log writer thread
+        self.logs = collections.deque(maxlen=LOG_HISTORY)
+        botlog.subscribe(self.logs.append)
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self) -> bool:
+        if self.running:
+            return False
+        settings = load_settings(self.settings_path)
+        # The simulated exchange works without a wallet; live and chain dry runs sign
+        simulated = settings.get("dry_run", True) and settings.get("sim_exchange", True)
+        if not simulated and not settings.get("private_key"):
+            raise ValueError("private_key is not set")
+        apply_settings_to_config(settings)
+        self.control = BotControl()
+        self.task = asyncio.create_task(self._supervise(self.control))
+        return True
+
+    async def stop(self) -> bool:
+        if not self.running:
+            return False
+        self.control.stop()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        return True
+
+    async def _supervise(self, control: BotControl):
+        from main import main
+
+        delay = RESTART_DELAY_MIN
+        while True:
+            self.engine_started_at = time.time()
+            try:
+                await main(control, self.settings_path)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.error(f"[DAEMON] Engine crashed: {self.last_error}. Restarting in {delay}s")
+
+            # Healthy for a while: start backoff from scratch
+            if time.time() - self.engine_started_at > RESTART_DELAY_MAX:
+                delay = RESTART_DELAY_MIN
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RESTART_DELAY_MAX)
+            self.restarts += 1
+
+            # Fresh control for the new engine, keep pause state
+            paused = control.paused
+            control = BotControl()
+            control.paused = paused
+            self.control = control
+
+    # ----- API views -----
+
+    def status(self) -> dict:
+        engine = dict(self.control.status) if self.control else {}
+        return {
+            "running": self.running,
+            "paused": bool(self.control and self.control.paused),
+            "uptime": round(time.time() - self.started_at, 1),
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "engine": engine,
+        }
+
+    async def orders(self) -> dict:
+        trader = self.control.trader if self.running else None
+        if trader is None:
+            return {"trades": [], "pending": []}
+        # Served from the engine's order book, the chain is read only if stale
+        trades, pending = await trader.open_trades()
+        return {
+            "trades": [order_to_dict(t) for t in trades],
+            "pending": [order_to_dict(o) for o in pending],
+        }
+
+    def metrics(self) -> str:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return metrics.render({
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "engine_running": int(self.running),
+            "engine_restarts": self.restarts,
+            "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+            # ru_maxrss is KiB on Linux
+            "max_rss_kb": usage.ru_maxrss,
+        })
+
+
+def load_token(path: Path) -> str:
+    """API token from `path`, created (owner-only) on first use."""
+    path = Path(path)
+    if not path.exists():
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_urlsafe(32) + "\n")
+    return path.read_text().strip()
+
+
+def masked_settings(settings: dict) -> dict:
+    safe = dict(settings)
+    for key in ("private_key", "license_key"):
+        if safe.get(key):
+            safe[key] = "***"
+    return safe
+
+
+class ControlAPI:
+    """
+    Minimal HTTP/1.0 JSON API served over TCP or a Unix socket.
+
+    Args:
+        supervisor: Engine supervisor the routes act on
+        token: Bearer token required on every route but GET /metrics
+        hosts: Accepted Host headers (None = any, e.g. on a Unix socket)
+    """
+
+    def __init__(self, supervisor: EngineSupervisor, token: str, hosts=None):
+        self.supervisor = supervisor
+        self.token = token
+        self.hosts = hosts
+
+    async def handle(self, reader, writer):
+        try:
+            method, path, headers, body = await self._read_request(reader)
+            rejected = self.check(method, path, headers)
+            if rejected:
+                status, payload = rejected
+            else:
+                status, payload = await self.route(method, path, self._parse_body(body))
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload, default=str).encode(), "application/json"
+        reason = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+                  404: "Not Found", 415: "Unsupported Media Type", 500: "Internal Server Error"}
+        writer.write(
+            f"HTTP/1.0 {status} {reason.get(status, 'Error')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = (await reader.readline()).decode("latin-1").strip()
+        parts = line.split()
+        if len(parts) < 2:
+            raise ValueError("Bad request line")
+        method, path = parts[0].upper(), parts[1].split("?")[0]
+
+        headers = {}
+        while True:
+            header = (await reader.readline()).decode("latin-1").strip()
+            if not header:
+                break
+            name, _, value = header.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise ValueError("Body too large")
+
+        body = await reader.readexactly(length) if length else None
+        return method, path, headers, body
+
+    def check(self, method: str, path: str, headers: dict):
+        """(status, error payload) if the request is refused, else None."""
+        if self.hosts is not None and headers.get("host", "").lower() not in self.hosts:
+            return 403, {"error": "Host not allowed"}
+        if method == "GET" and path == "/metrics":
+            return None
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+            return 401, {"error": "Missing or wrong token"}
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if method == "POST" and content_type != "application/json":
+            return 415, {"error": "Expected Content-Type: application/json"}
+        return None
+
+    @staticmethod
+    def _parse_body(body):
+        return json.loads(body) if body else None
+
+    async def route(self, method: str, path: str, body):
+        sup = self.supervisor
+
+        if method == "GET":
+            if path == "/status":
+                return 200, sup.status()
+            if path == "/orders":
+                return 200, await sup.orders()
+            if path == "/metrics":
+                return 200, sup.metrics()
+            if path == "/logs":
+                return 200, list(sup.logs)
+            if path == "/config":
+                return 200, masked_settings(load_settings(sup.settings_path))
+
+        if method == "POST":
+            if path == "/start":
+                return 200, {"started": sup.start()}
+            if path == "/stop":
+                return 200, {"stopped": await sup.stop()}
+            if path in ("/pause", "/resume", "/cancel"):
+                if not sup.running:
+                    return 400, {"error": "Engine is not running"}
+                {"/pause": sup.control.pause,
+                 "/resume": sup.control.resume,
+                 "/cancel": sup.control.cancel_all}[path]()
+                return 200, {"ok": True}
+            if path == "/config":
+                if not isinstance(body, dict):
+                    raise ValueError("Expected a JSON object")
+                settings = load_settings(sup.settings_path)
+                unknown = set(body) - set(settings)
+                if unknown:
+                    raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+                settings.update(body)
+                errors = validate_settings(settings)
+                if errors:
+                    raise ValueError("; ".join(errors))
+                save_settings(settings, sup.settings_path)
+                # The running engine picks the file up by itself
+                restart = sorted(k for k in body if k in RESTART_KEYS) if sup.running else []
+                return 200, {"saved": True, "restart_required": restart}
+
+        return 404, {"error": f"No route for {method} {path}"}
+
+
+async def serve(args):
+    botlog.setup(console_json=args.log_json)
+    supervisor = EngineSupervisor(args.settings)
+    token_path = Path(args.settings).with_name(TOKEN_FILE)
+    token = load_token(token_path)
+    # Browsers send the name they resolved: only loopback names are ours
+    hosts = None if args.socket else {
+        f"{name}:{args.port}" for name in ("127.0.0.1", "localhost", "[::1]", args.host)}
+    api = ControlAPI(supervisor, token, hosts)
+    log.info(f"[DAEMON] API token in {token_path}")
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = await asyncio.start_unix_server(api.handle, path=args.socket)
+        os.chmod(args.socket, 0o600)
+        log.info(f"[DAEMON] Control API on unix:{args.socket}")
+    else:
+        server = await asyncio.start_server(api.handle, host=args.host, port=args.port)
+        log.info(f"[DAEMON] Control API on http://{args.host}:{args.port}")
+
+    if args.autostart:
+        supervisor.start()
+        log.info("[DAEMON] Engine started")
+
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            await supervisor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Delta-Neutral Bot daemon")
+    parser.add_argument("--settings", default=str(SETTINGS_FILE), help="Path to settings.json")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP bind address")
+    parser.add_argument("--port", type=int, default=8787, help="HTTP port")
+    parser.add_argument("--socket", help="Serve on this Unix socket instead of TCP")
+    parser.add_argument("--autostart", action="store_true", help="Start the engine immediately")
+    parser.add_argument("--log-json", action="store_true", help="Write JSON log lines to stdout")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        log.info("\n[DAEMON] Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
 import customtkinter as ctk
-import json
 import asyncio
 import threading
-from pathlib import Path
 from datetime import datetime, timedelta, timezone
+from settings import load_settings, save_settings, apply_settings_to_config
+import ratelimit
 
-SETTINGS_FILE = Path(__file__).parent / "settings.json"
 MSK = timezone(timedelta(hours=3))
 
 # Dark theme + soft yellow
@@ -25,45 +24,6 @@ COLORS = {
     "danger": "#e06060",
 }
 
-DEFAULT_SETTINGS = {
-    "rpc_url": "https://mainnet.base.org",
-    "private_key": "",
-    "license_key": "",
-    "dry_run": True,
-    "pair_name": "BTC/USD",
-    "pair_index": 1,
-    "position_size": 10.0,
-    "leverage": 75,
-    "take_profit_pnl": 80,
-    "stop_loss_pnl": 80,
-    "entry_offset_min": 0.25,
-    "entry_offset_max": 1.0,
-    "reposition_threshold": 1.0,
-    "deposit_variance": 5.0,
-    "deposit_step": 0.5,
-    "check_interval_min": 10,
-    "check_interval_max": 30,
-    "trading_start_hour": 13,
-    "trading_end_hour": 4,
-    "trading_variance": 15,
-}
-
-
-def load_settings():
-    if SETTINGS_FILE.exists():
-        try:
-            with open(SETTINGS_FILE) as f:
-                return {**DEFAULT_SETTINGS, **json.load(f)}
-        except:
-            pass
-    return DEFAULT_SETTINGS.copy()
-
-
-def save_settings(settings):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=2)
-
-
 class Card(ctk.CTkFrame):
     def __init__(self, master, title="", **kwargs):
         super().__init__(master, fg_color=COLORS["card"], corner_radius=12,
@@ -94,15 +54,81 @@ class StatBox(ctk.CTkFrame):
             self.value_label.configure(text_color=color)
 
 
+class PriceChart(ctk.CTkFrame):
+    """Line chart of recent price with the running cycle's levels."""
+
+    LEVEL_STYLES = {
+        "anchor": (COLORS["text_dim"], (2, 4)),
+        "entry": (COLORS["primary"], ()),
+        "long_tp": ("#4CAF50", (4, 2)),
+        "short_tp": ("#4CAF50", (4, 2)),
+        "long_sl": ("#F44336", (4, 2)),
+        "short_sl": ("#F44336", (4, 2)),
+    }
+
+    def __init__(self, master, height=140, **kwargs):
+        super().__init__(master, fg_color=COLORS["input"], corner_radius=8,
+                        border_width=1, border_color=COLORS["border"], **kwargs)
+        self.canvas = ctk.CTkCanvas(self, height=height, bg=COLORS["input"],
+                                    highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True, padx=2, pady=2)
+        self.price_line = None
+        self.times, self.prices, self.levels = [], [], {}
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+
+    def draw(self, times, prices, levels=None):
+        self.times, self.prices, self.levels = times, prices, levels or {}
+        self.redraw()
+
+    def redraw(self):
+        from chart import downsample_minmax, to_canvas_coords
+
+        c = self.canvas
+        width, height = c.winfo_width(), c.winfo_height()
+        c.delete("level")
+        if len(self.prices) < 2 or width < 10:
+            if self.price_line:
+                c.delete(self.price_line)
+                self.price_line = None
+            return
+
+        # One min/max pair per 2 px keeps the polyline at ~width points
+        times, prices = downsample_minmax(self.times, self.prices, width // 2)
+
+        levels = {k: v for k, v in self.levels.items() if k in self.LEVEL_STYLES and v}
+        p_low = min(min(prices), *levels.values()) if levels else min(prices)
+        p_high = max(max(prices), *levels.values()) if levels else max(prices)
+        margin = (p_high - p_low) * 0.05 or p_high * 0.001
+        p_low, p_high = p_low - margin, p_high + margin
+
+        coords = to_canvas_coords(times, prices, width, height, p_low, p_high)
+        if self.price_line:
+            c.coords(self.price_line, *coords)
+        else:
+            self.price_line = c.create_line(*coords, fill=COLORS["text"], width=1)
+
+        for name, value in levels.items():
+            color, dash = self.LEVEL_STYLES[name]
+            y = 4 + (p_high - value) / (p_high - p_low) * max(height - 8, 1)
+            c.create_line(0, y, width, y, fill=color, dash=dash, tags="level")
+            c.create_text(width - 4, y - 2, text=f"{name.upper()} {value:,.2f}",
+                          anchor="se", fill=color, font=("Consolas", 8), tags="level")
+        c.tag_raise(self.price_line)
+
+
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, profile_cycles: int = 0):
         super().__init__()
         self.settings = load_settings()
+        # --profile N overrides settings.json "profile_cycles"
+        self.profile_cycles = profile_cycles
         self.bot_running = False
         self.bot_thread = None
+        self.control = None
         self.pending_orders = []
         self.open_trades = []
         self.license_valid = False
+        self.tick_buffer = None
 
         self.title("Delta-Neutral Bot")
         self.geometry("880x780")
@@ -130,9 +156,21 @@ class App(ctk.CTk):
         self.create_footer(scroll)
         self.load_pk_from_config()
 
-        # Check orders on startup
+        # Load the SDK in the background after first paint,
+        # then check orders on startup
+        self.after_idle(self.preload_sdk_async)
         self.after(500, self.check_orders_async)
 
+    def preload_sdk_async(self):
+        def preload():
+            try:
+                from trader import preload_sdk
+                preload_sdk()
+            except Exception as e:
+                self.after(0, lambda: self.log(f"SDK load error: {e}"))
+
+        threading.Thread(target=preload, daemon=True).start()
+
     def check_license(self) -> bool:
         from license import validate_key
         key = self.settings.get("license_key", "")
@@ -266,7 +304,7 @@ class App(ctk.CTk):
         self.mode_btn.pack()
 
     def create_pair_panel(self, parent):
-        from pairs import PAIR_NAMES, get_pair_index
+        from pairs import pair_names, registry
 
         pair_card = Card(parent, title="TRADING PAIR")
         pair_card.pack(fill="x", pady=(0, 10))
@@ -287,7 +325,7 @@ class App(ctk.CTk):
 
         self.pair_var = ctk.StringVar(value=self.settings.get("pair_name", "BTC/USD"))
         self.pair_selector = ctk.CTkComboBox(
-            left, values=PAIR_NAMES, variable=self.pair_var,
+            left, values=pair_names(), variable=self.pair_var,
             width=140, height=34, corner_radius=8,
             fg_color=COLORS["input"], border_color=COLORS["border"],
             button_color=COLORS["primary"], button_hover_color=COLORS["primary_dark"],
@@ -297,6 +335,11 @@ class App(ctk.CTk):
         )
         self.pair_selector.pack(pady=(3, 0))
 
+        # Pairs listed or delisted on chain show up without a restart
+        registry.listeners.append(
+            lambda r: self.after(0, lambda: self.pair_selector.configure(values=r.names())))
+        registry.start_refresh()
+
         # Current price display
         right = ctk.CTkFrame(row, fg_color="transparent")
         right.pack(side="right")
@@ -311,8 +354,14 @@ class App(ctk.CTk):
         )
         self.price_label.pack(anchor="e", pady=(3, 0))
 
-        # Start price updates
-        self.update_price()
+        # Price chart fed from the in-memory tick buffer
+        from chart import TickBuffer
+        self.tick_buffer = TickBuffer()
+        self.chart = PriceChart(content)
+        self.chart.pack(fill="x", pady=(10, 0))
+
+        # Start price updates once the window has been drawn
+        self.after_idle(self.update_price)
 
     def on_pair_change(self, value):
         from pairs import get_pair_index
@@ -322,6 +371,8 @@ class App(ctk.CTk):
         except:
             self.settings["pair_index"] = 1
         save_settings(self.settings)
+        self.tick_buffer.clear()
+        self.update_chart()
         self.update_price()
         self.log(f"Pair changed to {value}")
 
@@ -340,10 +391,15 @@ class App(ctk.CTk):
 
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            price = loop.run_until_complete(get_pair_price(pair))
+            # Cosmetic: yields to the engine when the feed budget is tight
+            with ratelimit.priority(ratelimit.LOW):
+                price = loop.run_until_complete(get_pair_price(pair))
             loop.close()
 
             if price > 0:
+                self.tick_buffer.add(price)
+                self.after(0, self.update_chart)
+
                 if price >= 1000:
                     price_str = f"${price:,.2f}"
                 elif price >= 1:
@@ -355,6 +411,15 @@ class App(ctk.CTk):
         except Exception as e:
             self.after(0, lambda: self.price_label.configure(text="Error"))
 
+    def update_chart(self):
+        import state
+
+        times, prices = self.tick_buffer.window()
+        levels = state.cycle_levels
+        if not self.bot_running or levels.get("pair") != self.settings.get("pair_name"):
+            levels = {}
+        self.chart.draw(times, prices, levels)
+
     def create_stats(self, parent):
         stats = ctk.CTkFrame(parent, fg_color="transparent")
         stats.pack(fill="x", pady=(0, 14))
@@ -437,6 +502,13 @@ class App(ctk.CTk):
         thread.start()
 
     def _check_orders_thread(self):
+        # A running engine keeps an order book: read it instead of the chain
+        trader = self.control.trader if self.bot_running and self.control else None
+        if trader and trader.book.synced_at:
+            self.open_trades, self.pending_orders = trader.book.snapshot()
+            self.after(0, self._update_orders_ui)
+            return
+
         try:
             self.apply_settings_to_config()
             from trader import AvantisTrader
@@ -446,7 +518,8 @@ class App(ctk.CTk):
 
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            trades, pending = loop.run_until_complete(trader.get_open_trades())
+            with ratelimit.priority(ratelimit.LOW):
+                trades, pending = loop.run_until_complete(trader.get_open_trades())
             loop.close()
 
             self.open_trades = trades
@@ -644,6 +717,14 @@ class App(ctk.CTk):
             self.after(0, lambda: self._orders_error(str(e)))
 
     def cancel_all_orders_async(self):
+        if self.bot_running and self.control:
+            # Let the running engine cancel its own orders, then hold
+            self.control.cancel_all()
+            self.pause_btn.configure(text="RESUME")
+            self.log("Cancel all requested - bot paused")
+            self.after(5000, self.check_orders_async)
+            return
+
         if not self.pending_orders:
             return
 
@@ -701,6 +782,7 @@ class App(ctk.CTk):
             from trader import AvantisTrader
             from price import get_btc_price
             from strategy import calc_tp_sl_price
+            from main import trade_costs
             import config
 
             trader = AvantisTrader(config.RPC_URL, config.PRIVATE_KEY)
@@ -725,13 +807,14 @@ class App(ctk.CTk):
             self.after(0, lambda: self.log(f"Entry: ${entry_price:.2f} ({direction}, {offset*100:.2f}%)"))
 
             # Calculate TP/SL
+            costs = trade_costs()
             long_tp, long_sl = calc_tp_sl_price(
                 entry_price, config.LEVERAGE,
-                config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, True
+                config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, True, costs
             )
             short_tp, short_sl = calc_tp_sl_price(
                 entry_price, config.LEVERAGE,
-                config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, False
+                config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, False, costs
             )
 
             # Vary collateral
@@ -960,13 +1043,25 @@ class App(ctk.CTk):
     def create_footer(self, parent):
         footer = ctk.CTkFrame(parent, fg_color="transparent")
         footer.pack(fill="x")
+        btn_row = ctk.CTkFrame(footer, fg_color="transparent")
+        btn_row.pack(fill="x")
+
         self.start_btn = ctk.CTkButton(
-            footer, text="START BOT", command=self.toggle_bot,
+            btn_row, text="START BOT", command=self.toggle_bot,
             font=ctk.CTkFont(size=13, weight="bold"), height=42,
             corner_radius=10, fg_color=COLORS["primary"],
             hover_color=COLORS["primary_dark"], text_color=COLORS["bg"]
         )
-        self.start_btn.pack(fill="x")
+        self.start_btn.pack(side="left", fill="x", expand=True)
+
+        self.pause_btn = ctk.CTkButton(
+            btn_row, text="PAUSE", command=self.toggle_pause, width=110,
+            font=ctk.CTkFont(size=13, weight="bold"), height=42,
+            corner_radius=10, fg_color=COLORS["border"],
+            hover_color=COLORS["card"], text_color=COLORS["text"],
+            state="disabled"
+        )
+        self.pause_btn.pack(side="left", padx=(8, 0))
 
         wallet_row = ctk.CTkFrame(footer, fg_color="transparent")
         wallet_row.pack(fill="x", pady=(10, 0))
@@ -1075,61 +1170,79 @@ class App(ctk.CTk):
         if not self.settings["dry_run"]:
             self.log("WARNING: LIVE mode!")
 
+        from control import BotControl
+
         self.bot_running = True
+        self.control = BotControl()
         self.start_btn.configure(text="STOP BOT", fg_color=COLORS["danger"], hover_color="#c04040")
+        self.pause_btn.configure(text="PAUSE", state="normal")
         self.apply_settings_to_config()
-        self.bot_thread = threading.Thread(target=self.run_bot_thread, daemon=True)
+        self.bot_thread = threading.Thread(target=self.run_bot_thread,
+                                           args=(self.control,), daemon=True)
         self.bot_thread.start()
         self.log("Bot started!")
 
     def stop_bot(self):
+        if self.control:
+            self.control.stop()
+        self._on_bot_finished()
+
+    def _on_bot_finished(self, control=None):
+        # Ignore a late finish from a previous run after a restart
+        if not self.bot_running or (control and control is not self.control):
+            return
         self.bot_running = False
+        self.control = None
         self.start_btn.configure(text="START BOT", fg_color=COLORS["primary"],
                                 hover_color=COLORS["primary_dark"])
+        self.pause_btn.configure(text="PAUSE", state="disabled")
         self.log("Bot stopped!")
 
+    def toggle_pause(self):
+        if not self.control:
+            return
+        if self.control.paused:
+            self.control.resume()
+            self.pause_btn.configure(text="PAUSE")
+            self.log("Bot resumed")
+        else:
+            self.control.pause()
+            self.pause_btn.configure(text="RESUME")
+            self.log("Bot paused")
+
     def apply_settings_to_config(self):
-        import config
-        config.RPC_URL = self.settings["rpc_url"]
-        config.PRIVATE_KEY = self.settings["private_key"]
-        config.DRY_RUN = self.settings["dry_run"]
-        config.PAIR_INDEX = self.settings["pair_index"]
-        config.PAIR_NAME = self.settings["pair_name"]
-        config.POSITION_SIZE_USDC = self.settings["position_size"]
-        config.LEVERAGE = self.settings["leverage"]
-        config.TAKE_PROFIT_PNL = self.settings["take_profit_pnl"] / 100
-        config.STOP_LOSS_PNL = self.settings["stop_loss_pnl"] / 100
-        config.ENTRY_OFFSET_MIN = self.settings["entry_offset_min"] / 100
-        config.ENTRY_OFFSET_MAX = self.settings["entry_offset_max"] / 100
-        config.REPOSITION_THRESHOLD_PCT = self.settings["reposition_threshold"] / 100
-        config.DEPOSIT_VARIANCE = self.settings.get("deposit_variance", 5.0) / 100
-        config.DEPOSIT_STEP = self.settings.get("deposit_step", 0.5)
-        config.CHECK_INTERVAL_MIN = self.settings["check_interval_min"]
-        config.CHECK_INTERVAL_MAX = self.settings["check_interval_max"]
-        config.TRADING_START_HOUR = self.settings["trading_start_hour"]
-        config.TRADING_END_HOUR = self.settings["trading_end_hour"]
-        config.TRADING_HOURS_VARIANCE = self.settings.get("trading_variance", 15)
-
-    def run_bot_thread(self):
-        import sys, io
-        class R(io.StringIO):
-            def __init__(s, cb): super().__init__(); s.cb = cb
-            def write(s, m):
-                if m.strip(): s.cb(m.strip())
-                return len(m)
-            def flush(s): pass
-
-        old = sys.stdout
-        sys.stdout = R(lambda m: self.after(0, lambda: self.log(m)))
+        apply_settings_to_config(self.settings)
+        if self.profile_cycles:
+            import config
+            config.PROFILE_CYCLES = self.profile_cycles
+
+    def run_bot_thread(self, control):
+        import botlog
+
+        def on_record(record):
+            # Called from the log writer thread: hand over to the Tk loop
+            msg = record["msg"].strip()
+            if msg:
+                self.after(0, lambda: self.log(msg))
+
+        botlog.subscribe(on_record)
         try:
             from main import main
-            asyncio.run(main())
+            from settings import SETTINGS_FILE
+            overrides = {"profile_cycles": self.profile_cycles} if self.profile_cycles else None
+            asyncio.run(main(control, SETTINGS_FILE, overrides))
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
             self.after(0, lambda: self.log(f"Error: {e}"))
         finally:
-            sys.stdout = old
-            self.after(0, self.stop_bot)
+            botlog.unsubscribe(on_record)
+            self.after(0, lambda: self._on_bot_finished(control))
 
 
 if __name__ == "__main__":
-    App().mainloop()
+    import argparse
+    parser = argparse.ArgumentParser(description="Delta-Neutral Bot")
+    parser.add_argument("--profile", type=int, metavar="N", default=0,
+                        help="Profile N cycles of the bot to STATE_DIR/profiles")
+    App(profile_cycles=parser.parse_args().profile).mainloop()
@@ -1,15 +1,40 @@
 import asyncio
 import random
 import time
-from datetime import datetime, timedelta, timezone
+import uuid
+from datetime import datetime
+from pathlib import Path
+import botlog
 import config
-from price import get_btc_price, get_pair_price
-from trader import AvantisTrader
-from strategy import calc_tp_sl_price
+import metrics
+import pairs
+import profiler
+import resilience
+import state
+import tracing
+import watchdog
+from control import BotControl
+from orderbook import follow_chain
+from scheduler import PollScheduler
+from trading_calendar import MSK, SessionCalendar
+from state import BotState, CycleMachine
+from price import get_pair_price
+from trader import AvantisTrader, order_type_name, order_to_dict
+from strategy import (calc_tp_sl_price, calc_tp_sl_prices, calc_pnl_pct, pair_break_even,
+                      RealizedVolatility, TradeCosts)
 
+log = botlog.get("engine")
 
-# MSK = UTC+3
-MSK = timezone(timedelta(hours=3))
+
+# Kept across cycles so the volatility estimate stays warm
+volatility = RealizedVolatility()
+poller = PollScheduler(volatility)
+sessions = SessionCalendar()
+
+
+def paper_only() -> bool:
+    """Dry run without the simulated exchange: orders are only printed."""
+    return config.DRY_RUN and not config.SIM_EXCHANGE
 
 
 def get_msk_time() -> datetime:
@@ -20,43 +45,61 @@ def get_msk_time() -> datetime:
 def is_trading_hours() -> bool:
     """
     Check if current time is within trading hours.
-    Supports overnight trading (e.g., 13:00 - 04:00).
+    Supports overnight trading (e.g., 13:00 - 04:00), per-weekday hours
+    and holidays. Each day's variance is drawn once (see SessionCalendar).
     """
-    now = get_msk_time()
-    current_minutes = now.hour * 60 + now.minute
+    return sessions.is_open()
 
-    # Apply variance
-    variance = random.randint(-config.TRADING_HOURS_VARIANCE, config.TRADING_HOURS_VARIANCE)
 
-    start_minutes = config.TRADING_START_HOUR * 60 + variance
-    end_minutes = config.TRADING_END_HOUR * 60 + variance
+def observe_price(pair_name: str, price: float):
+    """Feed a price tick to the realized volatility estimate."""
+    volatility.window = config.VOLATILITY_WINDOW * 60
+    volatility.add(pair_name, price)
+    if price:
+        metrics.PRICE.set(price)
 
-    # Clamp to valid range
-    start_minutes = max(0, min(start_minutes, 1439))
-    end_minutes = max(0, min(end_minutes, 1440))
 
-    # Handle overnight trading (e.g., 13:00 - 04:00)
-    if config.TRADING_END_HOUR <= config.TRADING_START_HOUR:
-        # Overnight: valid if after start OR before end
-        return current_minutes >= start_minutes or current_minutes < end_minutes
-    else:
-        # Same day: valid if between start and end
-        return start_minutes <= current_minutes < end_minutes
+async def poll_price(pair_name: str):
+    """Price for a monitoring check, or None if the feed failed (the check is skipped)."""
+    try:
+        return await get_pair_price(pair_name)
+    except resilience.CircuitOpen:
+        return None  # Logged once when the breaker opened
+    except resilience.ServiceError as e:
+        log.warning(f"[FEED] {e}")
+        return None
+
+
+def adaptive_volatility():
+    """Volatility over VOLATILITY_WINDOW if adaptive entry is on and warmed up, else None."""
+    if not config.ADAPTIVE_ENTRY or not volatility.ready or volatility.pair != config.PAIR_NAME:
+        return None
+    return volatility.over(config.VOLATILITY_WINDOW * 60)
 
 
 def get_random_offset() -> float:
     """
     Get random offset factor for both positions.
-    Random value between MIN and MAX.
+    Random value between MIN and MAX, or scaled from volatility
+    (clamped to MIN..MAX) in adaptive mode.
     """
-    return random.uniform(config.ENTRY_OFFSET_MIN, config.ENTRY_OFFSET_MAX)
+    vol = adaptive_volatility()
+    if vol is None:
+        return random.uniform(config.ENTRY_OFFSET_MIN, config.ENTRY_OFFSET_MAX)
+    offset = config.OFFSET_VOL_MULT * vol * random.uniform(0.8, 1.2)
+    return min(max(offset, config.ENTRY_OFFSET_MIN), config.ENTRY_OFFSET_MAX)
 
 
 def get_reposition_threshold() -> float:
     """
     Get reposition threshold with random variance.
+    In adaptive mode the base scales with volatility (clamped to REPOSITION_MIN..MAX).
     """
     base = config.REPOSITION_THRESHOLD_PCT
+    vol = adaptive_volatility()
+    if vol is not None:
+        base = min(max(config.REPOSITION_VOL_MULT * vol, config.REPOSITION_MIN),
+                   config.REPOSITION_MAX)
     variance = random.uniform(-config.REPOSITION_RANDOM, config.REPOSITION_RANDOM)
     return base + variance
 
@@ -75,243 +118,966 @@ def vary_amount(amount: float) -> float:
     return round(varied / step) * step
 
 
-async def wait_for_trading_hours():
-    """Wait until trading hours start."""
+async def wait_for_trading_hours(trader: AvantisTrader, control: BotControl):
+    """Sleep until the next session starts (woken early by commands or hot reload)."""
     while not is_trading_hours():
+        control.status["phase"] = "outside_hours"
         now = get_msk_time()
-        print(f"[{now.strftime('%H:%M:%S')} MSK] Outside trading hours. Waiting...")
-        await asyncio.sleep(60)  # Check every minute
+        start = sessions.next_start(now)
+        if start is None:
+            log.info(f"[{now.strftime('%H:%M:%S')} MSK] No trading session within a year. Waiting...")
+            await control.sleep(3600)
+        else:
+            log.info(f"[{now.strftime('%H:%M:%S')} MSK] Outside trading hours. "
+                     f"Next session at {start.strftime('%a %H:%M')} MSK")
+            await control.sleep((start - now).total_seconds() + 1)
+        await handle_commands(trader, control)
+
+
+async def cancel_pending_orders(trader: AvantisTrader, pending=None,
+                                journal=None, cycle_uid: str = None):
+    """Cancel pending orders (all open ones if `pending` is None)."""
+    if paper_only():
+        log.info("[DRY-RUN] Pending orders cancelled")
+        return
+
+    if pending is None:
+        _, pending = await trader.get_open_trades()
+
+    for order in pending:
+        try:
+            tx_hash = await trader.cancel_order(
+                pair_index=order.pair_index,
+                trade_index=order.trade_index,
+                dry_run=False
+            )
+            if journal:
+                o = order_to_dict(order)
+                journal.record_order(
+                    cycle_uid, "cancel", o["pair_index"], side=o["side"], price=o["price"],
+                    trade_index=o["trade_index"], tx_hash=tx_hash,
+                    gas_used=trader.gas_used.pop(tx_hash, None))
+            await asyncio.sleep(random.uniform(1, 2))
+        except Exception as e:
+            metrics.CANCEL_ERRORS.inc()
+            log.warning(f"Cancel error: {e}")
+
+
+async def handle_commands(trader: AvantisTrader, control: BotControl) -> bool:
+    """
+    Apply control commands at a safe point of the cycle.
 
+    Returns:
+        True if pending orders were cancelled (the current cycle is over)
+    """
+    cancelled = False
+    while True:
+        if control.take_cancel_request():
+            log.info("[CONTROL] Cancelling all pending orders...")
+            await cancel_pending_orders(trader, journal=control.journal)
+            cancelled = True
+        await control.wait_if_paused()
+        if not control.cancel_requested:
+            break
 
-async def main():
-    print("=" * 50)
-    print("DELTA-NEUTRAL BOT (v3)")
-    print("=" * 50)
-    print(f"Mode: {'DRY RUN' if config.DRY_RUN else 'LIVE'}")
-    print(f"Margin: {config.POSITION_SIZE_USDC} USDC")
-    print(f"Leverage: {config.LEVERAGE}x")
-    print(f"Entry Offset: {config.ENTRY_OFFSET_MIN*100:.2f}% - {config.ENTRY_OFFSET_MAX*100:.2f}%")
-    print(f"Reposition: {config.REPOSITION_THRESHOLD_PCT*100:.1f}% (±{config.REPOSITION_RANDOM*100:.1f}%)")
-    print(f"Check Interval: {config.CHECK_INTERVAL_MIN}-{config.CHECK_INTERVAL_MAX}s")
-    print(f"Trading Hours: {config.TRADING_START_HOUR}:00 - {config.TRADING_END_HOUR % 24}:00 MSK (±{config.TRADING_HOURS_VARIANCE}min)")
-    print("-" * 50)
+    if control.watcher:
+        control.watcher.apply_pending()
+    return cancelled
 
-    trader = AvantisTrader(config.RPC_URL, config.PRIVATE_KEY)
 
-    # Approve once
-    if not config.DRY_RUN:
-        await trader.check_and_approve_usdc(config.POSITION_SIZE_USDC * 2)
+async def main(control: BotControl = None, settings_path=None, overrides: dict = None):
+    """
+    Run the bot until its task is cancelled (see BotControl.stop).
 
-    cycle = 0
-    while True:
-        # Wait for trading hours
-        await wait_for_trading_hours()
+    Args:
+        control: Control channel, a private one is created if None
+        settings_path: settings.json to watch and hot-reload (optional)
+        overrides: Settings set on the command line, kept across reloads
+    """
+    control = control or BotControl()
+    control.attach()
+    botlog.setup()
+    if config.METRICS_PORT:
+        metrics.start_http_server(config.METRICS_PORT)
+
+    watch_task = None
+    if settings_path:
+        from settings import SettingsWatcher
+        control.watcher = SettingsWatcher(settings_path, overrides=overrides)
+        watch_task = asyncio.create_task(control.watcher.watch(control.notify))
+    control.watchdog = watchdog.Watchdog(control)
 
-        # Check if we already have pending orders
-        if not config.DRY_RUN:
-            trades, pending = await trader.get_open_trades()
-            if len(pending) > 0:
-                now = get_msk_time()
-                print(f"[{now.strftime('%H:%M:%S')}] Found {len(pending)} pending orders. Waiting...")
-
-                # Wait until orders are filled or cancelled
-                while len(pending) > 0:
-                    if not is_trading_hours():
-                        break
-                    await asyncio.sleep(get_check_interval())
-                    trades, pending = await trader.get_open_trades()
-
-                # If positions opened, wait for TP/SL
-                if len(trades) >= 2:
-                    print(f"Positions opened! Waiting for TP/SL...")
-                    while len(trades) > 0:
-                        if not is_trading_hours():
-                            break
-                        await asyncio.sleep(get_check_interval())
-                        trades, _ = await trader.get_open_trades()
-                    print("All positions closed!")
-
-                continue  # Start new cycle
-
-        cycle += 1
-        now = get_msk_time()
-        print(f"\n{'='*50}")
-        print(f"CYCLE {cycle} | {now.strftime('%H:%M:%S')} MSK")
-        print("=" * 50)
+    try:
+        while True:
+            # The watchdog cancels a stalled engine task to restart it
+            engine = asyncio.create_task(run(control))
+            control.watchdog.start(engine)
+            try:
+                await engine
+                return
+            except asyncio.CancelledError:
+                if control.stopped or not control.watchdog.take_restart():
+                    raise
+            log.warning("[WATCHDOG] Engine restarted")
+    except asyncio.CancelledError:
+        log.info("Bot stopped")
+        raise
+    finally:
+        control.watchdog.stop()
+        state.cycle_levels = {}
+        if watch_task:
+            watch_task.cancel()
+
+
+def log_task_error(task: asyncio.Task):
+    """Done callback for background tasks: they are never awaited, so report how they died."""
+    if not task.cancelled() and task.exception() is not None:
+        e = task.exception()
+        log.error(f"[ENGINE] Background task {task.get_name()} failed: {type(e).__name__}: {e}",
+                  exc_info=e)
+
+
+def state_dir() -> Path:
+    return Path(config.STATE_DIR) if config.STATE_DIR else Path(__file__).parent
+
+
+def journal_path(wallet: str) -> Path:
+    """Cycle journal for this wallet and mode (dry runs never resume live cycles)."""
+    mode = "dry" if config.DRY_RUN else "live"
+    return state_dir() / f"cycle_{wallet[2:10].lower()}_{mode}.jsonl"
+
+
+async def wait_for_existing_orders(trader: AvantisTrader, control: BotControl) -> bool:
+    """
+    Wait out pending orders the journal knows nothing about.
+
+    Returns:
+        True if there were such orders
+    """
+    trades, pending = await trader.get_open_trades()
+    if len(pending) == 0:
+        return False
 
-        # Get anchor price for selected pair
-        anchor_price = await get_pair_price(config.PAIR_NAME)
-        print(f"{config.PAIR_NAME} price: ${anchor_price:.2f}")
+    now = get_msk_time()
+    log.info(f"[{now.strftime('%H:%M:%S')}] Found {len(pending)} pending orders. Waiting...")
+    control.status["phase"] = "monitoring"
+
+    # Wait until orders are filled or cancelled
+    while len(pending) > 0:
+        if not is_trading_hours():
+            break
+        await control.sleep(get_check_interval())
+        if await handle_commands(trader, control):
+            break
+        trades, pending = await trader.open_trades()
+
+    # If positions opened, wait for TP/SL
+    if len(trades) >= 2:
+        log.info(f"Positions opened! Waiting for TP/SL...")
+        control.status["phase"] = "in_position"
+        while len(trades) > 0:
+            if not is_trading_hours():
+                break
+            await control.sleep(get_check_interval())
+            await handle_commands(trader, control)
+            trades, _ = await trader.open_trades()
+        log.info("All positions closed!")
+
+    return True
+
+
+def strategy_params() -> dict:
+    """Parameters that shape a cycle, journaled to compare parameter sets."""
+    return {
+        "pair": config.PAIR_NAME,
+        "position_size": config.POSITION_SIZE_USDC,
+        "leverage": config.LEVERAGE,
+        "take_profit_pnl": config.TAKE_PROFIT_PNL,
+        "stop_loss_pnl": config.STOP_LOSS_PNL,
+        "entry_offset_min": config.ENTRY_OFFSET_MIN,
+        "entry_offset_max": config.ENTRY_OFFSET_MAX,
+        "reposition_threshold": config.REPOSITION_THRESHOLD_PCT,
+        "reposition_random": config.REPOSITION_RANDOM,
+    }
+
+
+def end_cycle(control: BotControl, machine: CycleMachine, outcome: str):
+    """Journal the cycle outcome and go back to IDLE."""
+    metrics.CYCLES_ENDED[outcome].inc()
+    if outcome == "repositioned":
+        metrics.REPOSITIONS.inc()
+    if control.journal and machine.current.uid:
+        control.journal.record_cycle_end(machine.current.uid, outcome)
+    machine.transition(BotState.IDLE)
+    profiler.end_cycle(outcome)
+    tracing.end_cycle(outcome=outcome)
+    botlog.bind(cycle_id=None)
+
+
+def record_fills(control: BotControl, machine: CycleMachine, trades: list):
+    metrics.FILLS.inc(len(trades))
+    if not control.journal:
+        return
+    s = machine.current
+    for trade in trades:
+        t = order_to_dict(trade)
+        control.journal.record_fill(
+            s.uid, t["pair_index"], t["side"], t["price"], t["collateral"],
+            t["leverage"], trade_index=t["trade_index"])
+
+
+def pair_costs(pair_index: int = None):
+    """Costs of a position in a pair (default: the current one), None if the pair is unknown."""
+    if config.DRY_RUN and config.SIM_EXCHANGE:
+        # The simulated exchange charges its own fees, no spread or borrow
+        return TradeCosts(config.SIM_OPEN_FEE, config.SIM_CLOSE_FEE)
+    try:
+        pair = pairs.registry.by_index(pair_index) if pair_index is not None else pairs.get_pair(config.PAIR_NAME)
+    except ValueError:
+        return None
+    return TradeCosts.for_pair(pair, config.HOLD_HOURS)
 
-        # Get SAME random offset for both positions
-        offset = get_random_offset()
 
-        # Randomly choose direction: ABOVE or BELOW current price
-        direction = random.choice(["ABOVE", "BELOW"])
+def trade_costs():
+    """Costs netted out of TP/SL for the current pair (None = leverage only)."""
+    return pair_costs() if config.COST_AWARE_TPSL else None
 
-        if direction == "ABOVE":
-            entry_price = anchor_price * (1 + offset)
-        else:
-            entry_price = anchor_price * (1 - offset)
 
-        print(f"Direction: {direction} | Offset: {offset*100:.3f}%")
-        print(f"Entry price: ${entry_price:.2f} (both LONG and SHORT)")
+def plan_entry(anchor_price: float) -> dict:
+    """Entry, TP/SL, size and reposition threshold for one LONG + SHORT pair."""
+    # Get SAME random offset for both positions
+    offset = get_random_offset()
 
-        # Calculate TP/SL - both positions at SAME entry price
-        long_tp, long_sl = calc_tp_sl_price(entry_price, config.LEVERAGE, config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, True)
-        short_tp, short_sl = calc_tp_sl_price(entry_price, config.LEVERAGE, config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, False)
+    # Randomly choose direction: ABOVE or BELOW current price
+    direction = random.choice(["ABOVE", "BELOW"])
 
-        collateral = vary_amount(config.POSITION_SIZE_USDC)
+    if direction == "ABOVE":
+        entry_price = anchor_price * (1 + offset)
+    else:
+        entry_price = anchor_price * (1 - offset)
 
-        # Place 2 limit orders
-        print(f"\nPlacing 2 limit orders (collateral: {collateral} USDC)...")
+    # Calculate TP/SL - both positions at SAME entry price
+    costs = trade_costs()
+    long_tp, long_sl = calc_tp_sl_price(entry_price, config.LEVERAGE, config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, True, costs)
+    short_tp, short_sl = calc_tp_sl_price(entry_price, config.LEVERAGE, config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL, False, costs)
 
-        await trader.place_limit_order(
-            pair_index=config.PAIR_INDEX,
-            is_long=True,
-            collateral=collateral,
-            leverage=config.LEVERAGE,
-            limit_price=entry_price,
-            tp_price=long_tp,
-            sl_price=long_sl,
-            direction=direction,
-            dry_run=config.DRY_RUN
-        )
+    return {
+        "direction": direction, "offset": offset, "entry_price": entry_price,
+        "long_tp": long_tp, "long_sl": long_sl, "short_tp": short_tp, "short_sl": short_sl,
+        "collateral": vary_amount(config.POSITION_SIZE_USDC),
+        # Get reposition threshold for this cycle (same for both directions)
+        "reposition_threshold": get_reposition_threshold(),
+    }
 
-        if not config.DRY_RUN:
-            await asyncio.sleep(random.uniform(2, 4))
 
-        await trader.place_limit_order(
-            pair_index=config.PAIR_INDEX,
-            is_long=False,
+async def place_cycle(trader: AvantisTrader, control: BotControl, machine: CycleMachine):
+    """Pick entry, place LONG + SHORT limit orders. IDLE -> PLACING -> WAITING."""
+    cycle = machine.current.cycle + 1
+    uid = uuid.uuid4().hex[:16]
+    profiler.begin_cycle(cycle, uid)
+    tracing.start_cycle(uid, cycle=cycle, pair=config.PAIR_NAME, dry_run=config.DRY_RUN)
+    now = get_msk_time()
+    log.info(f"\n{'='*50}")
+    log.info(f"CYCLE {cycle} | {now.strftime('%H:%M:%S')} MSK")
+    log.info("=" * 50)
+
+    # Get anchor price for selected pair
+    anchor_price = await get_pair_price(config.PAIR_NAME)
+    observe_price(config.PAIR_NAME, anchor_price)
+    log.info(f"{config.PAIR_NAME} price: ${anchor_price:.2f}")
+    vol = adaptive_volatility()
+    if vol is not None:
+        log.info(f"Volatility ({config.VOLATILITY_WINDOW}m): {vol*100:.3f}%")
+
+    with tracing.span("plan_entry", price=anchor_price) as span:
+        plan = plan_entry(anchor_price)
+        span.set(direction=plan["direction"], offset=plan["offset"], entry_price=plan["entry_price"],
+                 long_tp=plan["long_tp"], long_sl=plan["long_sl"],
+                 short_tp=plan["short_tp"], short_sl=plan["short_sl"])
+    direction, offset, entry_price = plan["direction"], plan["offset"], plan["entry_price"]
+    long_tp, long_sl = plan["long_tp"], plan["long_sl"]
+    short_tp, short_sl = plan["short_tp"], plan["short_sl"]
+    collateral, reposition_threshold = plan["collateral"], plan["reposition_threshold"]
+
+    log.info(f"Direction: {direction} | Offset: {offset*100:.3f}%")
+    log.info(f"Entry price: ${entry_price:.2f} (both LONG and SHORT)")
+    costs = trade_costs()
+    if costs:
+        long_even, short_even = pair_break_even(entry_price, config.LEVERAGE, config.STOP_LOSS_PNL, costs)
+        log.info(f"Costs: {costs.total*100:.3f}% of size | Break-even after one SL: "
+                 f"LONG ${long_even:.2f} / SHORT ${short_even:.2f}")
+
+    # Journal the plan before anything is sent
+    s = machine.transition(
+        BotState.PLACING, cycle=cycle, uid=uid,
+        pair_name=config.PAIR_NAME, pair_index=config.PAIR_INDEX,
+        anchor_price=anchor_price, **plan,
+    )
+    botlog.bind(cycle_id=s.uid, pair=s.pair_name)
+    metrics.CYCLES_STARTED.inc()
+
+    journal = control.journal
+    if journal:
+        journal.record_cycle_start(
+            s.uid, cycle, s.pair_name, s.pair_index, config.DRY_RUN, direction,
+            anchor_price, entry_price, offset, reposition_threshold, collateral,
+            config.LEVERAGE, strategy_params())
+
+    # Place 2 limit orders
+    log.info(f"\nPlacing 2 limit orders (collateral: {collateral} USDC)...")
+
+    for is_long in (True, False):
+        tx_hash = await trader.place_limit_order(
+            pair_index=s.pair_index,
+            is_long=is_long,
             collateral=collateral,
             leverage=config.LEVERAGE,
             limit_price=entry_price,
-            tp_price=short_tp,
-            sl_price=short_sl,
+            tp_price=long_tp if is_long else short_tp,
+            sl_price=long_sl if is_long else short_sl,
             direction=direction,
-            dry_run=config.DRY_RUN
+            dry_run=paper_only()
         )
+        machine.transition(BotState.PLACING, tx_hashes=s.tx_hashes + [tx_hash])
+        if journal:
+            journal.record_order(
+                s.uid, "place", s.pair_index, side="LONG" if is_long else "SHORT",
+                order_type=order_type_name(direction, is_long), price=entry_price,
+                tp=long_tp if is_long else short_tp, sl=long_sl if is_long else short_sl,
+                collateral=collateral, leverage=config.LEVERAGE, tx_hash=tx_hash,
+                gas_used=trader.gas_used.pop(tx_hash, None))
+
+        if is_long and not paper_only():
+            await control.sleep(random.uniform(2, 4))
+
+    machine.transition(BotState.WAITING)
+    log.info("Orders placed. Monitoring...")
+    log.info(f"Reposition threshold: {reposition_threshold*100:.2f}%")
+
+
+async def recover_placing(trader: AvantisTrader, control: BotControl, machine: CycleMachine):
+    """Crashed while placing: one chain read decides what was sent."""
+    if paper_only():
+        machine.transition(BotState.WAITING)
+        return
+
+    trades, pending = await trader.get_open_trades()
+    if len(trades) >= 2:
+        machine.transition(BotState.WAITING)
+        machine.transition(BotState.IN_POSITION)
+    elif trades or pending:
+        machine.transition(BotState.WAITING)
+    else:
+        log.info("[STATE] No orders were sent before the restart")
+        end_cycle(control, machine, "cancelled")
 
-        print("Orders placed. Monitoring...")
 
-        # Get reposition threshold for this cycle (same for both directions)
-        reposition_threshold = get_reposition_threshold()
-        print(f"Reposition threshold: {reposition_threshold*100:.2f}%")
+async def monitor_cycle(trader: AvantisTrader, control: BotControl, machine: CycleMachine):
+    """
+    Watch pending orders until fill, reposition or end of session.
+    WAITING -> IN_POSITION | RESET -> IDLE.
+    """
+    s = machine.current
+    anchor_price = s.anchor_price
+    entry_price = s.entry_price
+    direction = s.direction
+    reposition_threshold = s.reposition_threshold
 
-        # Monitor loop
-        check_count = 0
-        last_status_time = 0
+    # Fill trigger and both reposition bounds
+    levels = [entry_price, anchor_price * (1 + reposition_threshold),
+              anchor_price * (1 - reposition_threshold)]
 
-        while True:
-            # Check trading hours
-            if not is_trading_hours():
+    # Monitor loop
+    check_count = 0
+    last_status_time = 0
+    current_price = 0.0
+
+    while True:
+        # Check trading hours
+        if not is_trading_hours():
+            now = get_msk_time()
+            log.info(f"\n[{now.strftime('%H:%M:%S')} MSK] Trading hours ended. Cancelling orders...")
+            machine.transition(BotState.RESET)
+            await cancel_pending_orders(trader, journal=control.journal, cycle_uid=s.uid)
+            end_cycle(control, machine, "session_end")
+
+            log.info("Waiting for next trading session...")
+            return
+
+        # Check sooner the closer price is to a trigger, and right at session end
+        interval = poller.next_interval(current_price, levels)
+        await control.sleep(min(interval, sessions.seconds_until_end()))
+        if await handle_commands(trader, control):
+            end_cycle(control, machine, "cancelled")
+            return
+
+        fresh = await poll_price(s.pair_name)
+        if fresh is None:
+            continue  # Feed error: never reposition on a missing price
+        current_price = fresh
+        observe_price(s.pair_name, current_price)
+        price_diff = abs(current_price - anchor_price) / anchor_price
+        control.status.update(price=current_price, price_diff=price_diff)
+        check_count += 1
+
+        # Show status only every 60 seconds
+        current_time = time.time()
+        show_status = (current_time - last_status_time) >= 60
+
+        if paper_only():
+            if show_status:
                 now = get_msk_time()
-                print(f"\n[{now.strftime('%H:%M:%S')} MSK] Trading hours ended. Cancelling orders...")
-
-                if not config.DRY_RUN:
-                    _, pending = await trader.get_open_trades()
-                    for order in pending:
-                        try:
-                            await trader.cancel_order(
-                                pair_index=order.pair_index,
-                                trade_index=order.trade_index,
-                                dry_run=False
-                            )
-                            await asyncio.sleep(random.uniform(1, 2))
-                        except Exception as e:
-                            print(f"Cancel error: {e}")
-
-                print("Waiting for next trading session...")
-                break
+                log.info(f"[{now.strftime('%H:%M:%S')}] ${current_price:.2f} | Diff: {price_diff*100:.2f}%")
+                last_status_time = current_time
+
+            if price_diff > reposition_threshold:
+                log.info(f"[DRY-RUN] Price moved {price_diff*100:.2f}% - repositioning")
+                machine.transition(BotState.RESET)
+                end_cycle(control, machine, "repositioned")
+                return
+
+            # Simulate order fill
+            if (direction == "BELOW" and current_price <= entry_price) or \
+               (direction == "ABOVE" and current_price >= entry_price):
+                log.info(f"[DRY-RUN] Orders filled at ${entry_price:.2f}")
+                metrics.FILLS.inc(2)
+                if control.journal:
+                    for side in ("LONG", "SHORT"):
+                        control.journal.record_fill(s.uid, s.pair_index, side, entry_price,
+                                                    s.collateral, config.LEVERAGE)
+                end_cycle(control, machine, "filled")
+                return
+
+        else:
+            # Live trading
+            trades, pending = await trader.open_trades()
+
+            if show_status:
+                now = get_msk_time()
+                log.info(f"[{now.strftime('%H:%M:%S')}] ${current_price:.2f} | Diff: {price_diff*100:.2f}% | Pos: {len(trades)} | Pend: {len(pending)}")
+                last_status_time = current_time
+
+            # If positions opened - wait for TP/SL
+            if len(trades) >= 2:
+                log.info(f"Both positions opened! Waiting for TP/SL...")
+                machine.transition(BotState.IN_POSITION)
+                record_fills(control, machine, trades)
+                return
+
+            # Check if price moved too far - reposition
+            if price_diff > reposition_threshold:
+                log.info(f"Price moved {price_diff*100:.2f}% - repositioning...")
+
+                # Cancel pending orders
+                machine.transition(BotState.RESET)
+                await cancel_pending_orders(trader, pending, control.journal, s.uid)
+                end_cycle(control, machine, "repositioned")
+                return  # Go to next cycle (new orders)
+
+
+def record_closes(control: BotControl, machine: CycleMachine, closed: list, price: float):
+    """Count and journal closed legs. TP vs SL is told apart by the current price."""
+    s = machine.current
+    for t in closed:
+        is_long = t["side"] == "LONG"
+        if price and t["tp"] and t["sl"]:
+            hit_tp = abs(price - t["tp"]) < abs(price - t["sl"])
+        else:
+            hit_tp = False
+        close_price = t["tp"] if hit_tp else t["sl"]
+        metrics.CLOSES["tp" if hit_tp else "sl"].inc()
+        if not control.journal:
+            continue
+        leverage = t["leverage"] or config.LEVERAGE
+        pnl = calc_pnl_pct(t["price"], close_price, leverage, is_long) * t["collateral"]
+        # Borrow is estimated for hold_hours: the journal has no exact holding time
+        costs = pair_costs(t["pair_index"])
+        fees = costs.fees(t["collateral"] * leverage) if costs else None
+        control.journal.record_close(
+            s.uid, t["pair_index"], t["side"], "tp" if hit_tp else "sl",
+            t["price"], close_price, t["collateral"], leverage, pnl, fees=fees,
+            trade_index=t["trade_index"])
+
+
+async def wait_for_close(trader: AvantisTrader, control: BotControl, machine: CycleMachine):
+    """Wait for TP/SL on both legs. IN_POSITION -> IDLE (stays if the session ends)."""
+    s = machine.current
+    levels = [s.long_tp, s.long_sl, s.short_tp, s.short_sl]
+    pos_last_status = time.time()
+    known = {}
+    price = 0.0
+
+    while True:
+        if not is_trading_hours():
+            return
+
+        await control.sleep(min(poller.next_interval(price, levels), sessions.seconds_until_end()))
+        await handle_commands(trader, control)
+        fresh = await poll_price(s.pair_name)
+        if fresh is not None:
+            price = fresh
+            observe_price(s.pair_name, price)
+        trades, _ = await trader.open_trades()
+
+        # Legs that disappeared since the last poll hit TP or SL
+        current = {(t["pair_index"], t["trade_index"]): t for t in map(order_to_dict, trades)}
+        closed = [t for key, t in known.items() if key not in current]
+        if closed:
+            record_closes(control, machine, closed, price)
+        known = current
+
+        if len(trades) == 0:
+            log.info("All positions closed!")
+            end_cycle(control, machine, "closed")
+            return
+
+        # Status every 2 minutes
+        if time.time() - pos_last_status >= 120:
+            now = get_msk_time()
+            log.info(f"[{now.strftime('%H:%M:%S')}] Positions: {len(trades)} open")
+            pos_last_status = time.time()
+
+
+# ------------------------------------------------------------
+# GRID MODE (config.GRID_LEVELS > 1)
+# ------------------------------------------------------------
+
+def plan_grid(anchor_price: float) -> list:
+    """
+    Entry levels for one grid cycle, alternating above and below the anchor.
+    Each side splits ENTRY_OFFSET_MIN..MAX into bands with one random
+    offset per band, so levels never coincide.
+    """
+    k = config.GRID_LEVELS
+    span = config.ENTRY_OFFSET_MAX - config.ENTRY_OFFSET_MIN
+    first = random.choice(["ABOVE", "BELOW"])
+    grid = []
+    for i in range(k):
+        direction = first if i % 2 == 0 else ("BELOW" if first == "ABOVE" else "ABOVE")
+        per_side = (k + 1) // 2 if i % 2 == 0 else k // 2
+        band = i // 2
+        offset = config.ENTRY_OFFSET_MIN + span * (band + random.uniform(0.2, 0.8)) / per_side
+        entry = anchor_price * (1 + offset if direction == "ABOVE" else 1 - offset)
+        grid.append({
+            "entry": entry, "direction": direction, "offset": offset,
+            "collateral": vary_amount(config.POSITION_SIZE_USDC),
+            # pending -> filled -> closed, or pending -> cancelled
+            "status": "pending",
+        })
+
+    # TP/SL of all levels at once, costs looked up once per cycle
+    entries = [level["entry"] for level in grid]
+    costs = trade_costs()
+    args = (config.LEVERAGE, config.TAKE_PROFIT_PNL, config.STOP_LOSS_PNL)
+    long_tps, long_sls = calc_tp_sl_prices(entries, *args, True, costs)
+    short_tps, short_sls = calc_tp_sl_prices(entries, *args, False, costs)
+    for level, long_tp, long_sl, short_tp, short_sl in zip(grid, long_tps, long_sls, short_tps, short_sls):
+        level.update(long_tp=long_tp, long_sl=long_sl, short_tp=short_tp, short_sl=short_sl)
+    return grid
+
+
+def grid_orders(s, grid: list) -> list:
+    """place_limit_order arguments for both legs of every level."""
+    orders = []
+    for level in grid:
+        for is_long in (True, False):
+            orders.append({
+                "pair_index": s.pair_index,
+                "is_long": is_long,
+                "collateral": level["collateral"],
+                "leverage": config.LEVERAGE,
+                "limit_price": level["entry"],
+                "tp_price": level["long_tp"] if is_long else level["short_tp"],
+                "sl_price": level["long_sl"] if is_long else level["short_sl"],
+                "direction": level["direction"],
+            })
+    return orders
+
+
+def nearest_level(grid: list, price: float) -> int:
+    return min(range(len(grid)), key=lambda i: abs(grid[i]["entry"] - price))
+
+
+async def place_grid_cycle(trader: AvantisTrader, control: BotControl, machine: CycleMachine):
+    """Place GRID_LEVELS LONG/SHORT pairs in one pipelined batch. IDLE -> PLACING -> WAITING."""
+    cycle = machine.current.cycle + 1
+    uid = uuid.uuid4().hex[:16]
+    profiler.begin_cycle(cycle, uid)
+    tracing.start_cycle(uid, cycle=cycle, pair=config.PAIR_NAME, dry_run=config.DRY_RUN,
+                        grid_levels=config.GRID_LEVELS)
+    now = get_msk_time()
+    log.info(f"\n{'='*50}")
+    log.info(f"CYCLE {cycle} | {now.strftime('%H:%M:%S')} MSK | GRID x{config.GRID_LEVELS}")
+    log.info("=" * 50)
+
+    anchor_price = await get_pair_price(config.PAIR_NAME)
+    observe_price(config.PAIR_NAME, anchor_price)
+    log.info(f"{config.PAIR_NAME} price: ${anchor_price:.2f}")
+
+    with tracing.span("plan_grid", price=anchor_price, levels=config.GRID_LEVELS):
+        grid = plan_grid(anchor_price)
+    reposition_threshold = get_reposition_threshold()
+    for level in grid:
+        log.info(f"  {level['direction']:<5} {level['offset']*100:.3f}% -> ${level['entry']:.2f}"
+                 f" ({level['collateral']} USDC)")
+
+    # The nearest level stands in for the cycle entry (chart, status, journal)
+    near = grid[nearest_level(grid, anchor_price)]
+    s = machine.transition(
+        BotState.PLACING, cycle=cycle, uid=uid,
+        pair_name=config.PAIR_NAME, pair_index=config.PAIR_INDEX,
+        anchor_price=anchor_price, entry_price=near["entry"],
+        direction=near["direction"], offset=near["offset"],
+        reposition_threshold=reposition_threshold, collateral=near["collateral"],
+        long_tp=near["long_tp"], long_sl=near["long_sl"],
+        short_tp=near["short_tp"], short_sl=near["short_sl"], grid=grid,
+    )
+    botlog.bind(cycle_id=s.uid, pair=s.pair_name)
+    metrics.CYCLES_STARTED.inc()
+
+    journal = control.journal
+    if journal:
+        journal.record_cycle_start(
+            s.uid, cycle, s.pair_name, s.pair_index, config.DRY_RUN, "GRID",
+            anchor_price, near["entry"], near["offset"], reposition_threshold,
+            sum(level["collateral"] for level in grid), config.LEVERAGE, strategy_params())
+
+    log.info(f"\nPlacing {2 * len(grid)} limit orders in one batch...")
+    orders = grid_orders(s, grid)
+    tx_hashes = await trader.place_limit_orders(orders, dry_run=paper_only())
+
+    for i, level in enumerate(grid):
+        # A level with no leg sent never existed on chain
+        if tx_hashes[2 * i] is None and tx_hashes[2 * i + 1] is None:
+            level["status"] = "cancelled"
+    machine.transition(BotState.PLACING, tx_hashes=[h for h in tx_hashes if h], grid=grid)
+
+    if journal:
+        for order, tx_hash in zip(orders, tx_hashes):
+            if tx_hash:
+                journal.record_order(
+                    s.uid, "place", s.pair_index, side="LONG" if order["is_long"] else "SHORT",
+                    order_type=order_type_name(order["direction"], order["is_long"]),
+                    price=order["limit_price"], tp=order["tp_price"], sl=order["sl_price"],
+                    collateral=order["collateral"], leverage=config.LEVERAGE, tx_hash=tx_hash,
+                    gas_used=trader.gas_used.pop(tx_hash, None))
+
+    if all(level["status"] == "cancelled" for level in grid):
+        log.info("No grid orders were placed")
+        machine.transition(BotState.RESET)
+        end_cycle(control, machine, "cancelled")
+        return
+
+    machine.transition(BotState.WAITING)
+    log.info("Grid placed. Monitoring...")
+    log.info(f"Reposition threshold: {reposition_threshold*100:.2f}%")
+
+
+def grid_watch_levels(s) -> list:
+    """Prices that change something: pending entries, TP/SL of filled levels, reposition bounds."""
+    levels = [s.anchor_price * (1 + s.reposition_threshold),
+              s.anchor_price * (1 - s.reposition_threshold)]
+    for level in s.grid:
+        if level["status"] == "pending":
+            levels.append(level["entry"])
+        elif level["status"] == "filled":
+            levels += [level["long_tp"], level["long_sl"], level["short_tp"], level["short_sl"]]
+    return levels
+
+
+def match_legs(s, items: list) -> dict:
+    """Group our trades or orders on the cycle pair by the nearest grid level."""
+    by_level = {}
+    for item in items:
+        d = order_to_dict(item)
+        if d["pair_index"] == s.pair_index and d["price"]:
+            by_level.setdefault(nearest_level(s.grid, d["price"]), []).append((item, d))
+    return by_level
+
+
+async def monitor_grid(trader: AvantisTrader, control: BotControl, machine: CycleMachine):
+    """
+    Manage grid levels independently until all are closed or cancelled.
+    Pending levels are cancelled on reposition or session end; filled
+    levels keep running to their own TP/SL.
+    WAITING -> IN_POSITION -> IDLE, or WAITING -> RESET -> IDLE.
+    """
+    s = machine.current
+    grid = s.grid
+    price = 0.0
+    last_status_time = 0
+    known = {}
+    reason = "repositioned"
 
-            # Wait random interval
-            interval = get_check_interval()
-            await asyncio.sleep(interval)
-
-            current_price = await get_btc_price()
-            price_diff = abs(current_price - anchor_price) / anchor_price
-            check_count += 1
-
-            # Show status only every 60 seconds
-            current_time = time.time()
-            show_status = (current_time - last_status_time) >= 60
-
-            if config.DRY_RUN:
-                if show_status:
-                    now = get_msk_time()
-                    print(f"[{now.strftime('%H:%M:%S')}] ${current_price:.2f} | Diff: {price_diff*100:.2f}%")
-                    last_status_time = current_time
-
-                if price_diff > reposition_threshold:
-                    print(f"[DRY-RUN] Price moved {price_diff*100:.2f}% - repositioning")
-                    break
-
-                # Simulate order fill
-                if direction == "BELOW" and current_price <= entry_price:
-                    print(f"[DRY-RUN] Orders filled at ${entry_price:.2f}")
-                    break
-                elif direction == "ABOVE" and current_price >= entry_price:
-                    print(f"[DRY-RUN] Orders filled at ${entry_price:.2f}")
-                    break
-
-            else:
-                # Live trading
-                trades, pending = await trader.get_open_trades()
-
-                if show_status:
-                    now = get_msk_time()
-                    print(f"[{now.strftime('%H:%M:%S')}] ${current_price:.2f} | Diff: {price_diff*100:.2f}% | Pos: {len(trades)} | Pend: {len(pending)}")
-                    last_status_time = current_time
-
-                # If positions opened - wait for TP/SL
-                if len(trades) >= 2:
-                    print(f"Both positions opened! Waiting for TP/SL...")
-                    pos_last_status = time.time()
-
-                    while True:
-                        if not is_trading_hours():
-                            break
-
-                        await asyncio.sleep(get_check_interval())
-                        trades, _ = await trader.get_open_trades()
-
-                        if len(trades) == 0:
-                            print("All positions closed!")
-                            break
-
-                        # Status every 2 minutes
-                        if time.time() - pos_last_status >= 120:
-                            now = get_msk_time()
-                            print(f"[{now.strftime('%H:%M:%S')}] Positions: {len(trades)} open")
-                            pos_last_status = time.time()
-
-                    break  # Go to next cycle
-
-                # Check if price moved too far - reposition
-                if price_diff > reposition_threshold:
-                    print(f"Price moved {price_diff*100:.2f}% - repositioning...")
-
-                    # Cancel pending orders
-                    for order in pending:
-                        try:
-                            await trader.cancel_order(
-                                pair_index=order.pair_index,
-                                trade_index=order.trade_index,
-                                dry_run=False
-                            )
-                            await asyncio.sleep(random.uniform(1, 2))
-                        except Exception as e:
-                            print(f"Cancel error: {e}")
-
-                    break  # Go to next cycle (new orders)
-
-        print(f"\nCycle {cycle} complete.")
-        await asyncio.sleep(random.uniform(3, 8))
+    while True:
+        pending_levels = [i for i, level in enumerate(grid) if level["status"] == "pending"]
+        filled_levels = [i for i, level in enumerate(grid) if level["status"] == "filled"]
+
+        if not pending_levels and not filled_levels:
+            if any(level["status"] == "closed" for level in grid):
+                reason = "filled" if paper_only() else "closed"
+            if machine.state == BotState.WAITING:
+                machine.transition(BotState.RESET)
+            end_cycle(control, machine, reason)
+            return
+        if not pending_levels and machine.state == BotState.WAITING:
+            machine.transition(BotState.IN_POSITION)
+
+        if not is_trading_hours():
+            if pending_levels:
+                now = get_msk_time()
+                log.info(f"\n[{now.strftime('%H:%M:%S')} MSK] Trading hours ended. Cancelling pending levels...")
+                reason = "session_end"
+                await cancel_grid_levels(trader, control, machine, pending_levels)
+                continue
+            return  # Open levels stay IN_POSITION until the next session
+
+        await control.sleep(min(poller.next_interval(price, grid_watch_levels(s)),
+                                sessions.seconds_until_end()))
+        if await handle_commands(trader, control):
+            # Cancel-all removed every pending order
+            reason = "cancelled"
+            await cancel_grid_levels(trader, control, machine, pending_levels, cancelled=True)
+            continue
+
+        fresh = await poll_price(s.pair_name)
+        if fresh is None:
+            continue
+        price = fresh
+        observe_price(s.pair_name, price)
+        price_diff = abs(price - s.anchor_price) / s.anchor_price
+        control.status.update(price=price, price_diff=price_diff)
+        before = [level["status"] for level in grid]
+        # Levels with one leg open wait for the other, they are never cancelled
+        partial = set()
+
+        if paper_only():
+            for i in pending_levels:
+                level = grid[i]
+                if (level["direction"] == "BELOW" and price <= level["entry"]) or \
+                   (level["direction"] == "ABOVE" and price >= level["entry"]):
+                    log.info(f"[DRY-RUN] Level {i + 1} filled at ${level['entry']:.2f}")
+                    # Dry run does not simulate TP/SL: a filled level is done
+                    level["status"] = "closed"
+                    metrics.FILLS.inc(2)
+                    if control.journal:
+                        for side in ("LONG", "SHORT"):
+                            control.journal.record_fill(s.uid, s.pair_index, side, level["entry"],
+                                                        level["collateral"], config.LEVERAGE)
+        else:
+            trades, pending = await trader.open_trades()
+            open_by_level = match_legs(s, trades)
+            pending_by_level = match_legs(s, pending)
+
+            for i in pending_levels:
+                legs = open_by_level.get(i, [])
+                if len(legs) >= 2:
+                    log.info(f"Level {i + 1} filled at ${grid[i]['entry']:.2f}")
+                    grid[i]["status"] = "filled"
+                    record_fills(control, machine, [item for item, _ in legs])
+                elif legs:
+                    partial.add(i)
+                elif i not in pending_by_level:
+                    grid[i]["status"] = "cancelled"  # Gone without a fill
+
+            # Filled levels whose legs disappeared hit TP or SL
+            current = {(d["pair_index"], d["trade_index"]): d
+                       for legs in open_by_level.values() for _, d in legs}
+            closed = [d for key, d in known.items() if key not in current]
+            if closed:
+                record_closes(control, machine, closed, price)
+            known = current
+            for i in filled_levels:
+                if i not in open_by_level:
+                    log.info(f"Level {i + 1} closed")
+                    grid[i]["status"] = "closed"
+
+        if time.time() - last_status_time >= 60:
+            now = get_msk_time()
+            counts = {k: sum(1 for level in grid if level["status"] == k)
+                      for k in ("pending", "filled", "closed")}
+            log.info(f"[{now.strftime('%H:%M:%S')}] ${price:.2f} | Diff: {price_diff*100:.2f}% | "
+                     f"Pending: {counts['pending']} | Open: {counts['filled']} | Done: {counts['closed']}")
+            last_status_time = time.time()
+
+        # Reposition: only levels without any fill are cancelled
+        stale = [i for i, level in enumerate(grid)
+                 if level["status"] == "pending" and i not in partial]
+        if stale and price_diff > s.reposition_threshold:
+            log.info(f"Price moved {price_diff*100:.2f}% - cancelling {len(stale)} pending levels")
+            await cancel_grid_levels(trader, control, machine, stale)
+        elif [level["status"] for level in grid] != before:
+            machine.transition(machine.state, grid=grid)
+
+
+async def cancel_grid_levels(trader: AvantisTrader, control: BotControl, machine: CycleMachine,
+                             indexes: list, cancelled: bool = False):
+    """
+    Cancel the pending orders of the given grid levels.
+    A level with a leg already open becomes "filled" so that leg is still tracked.
+
+    Args:
+        cancelled: True if the orders are already cancelled (cancel-all command)
+    """
+    s = machine.current
+    open_levels = set()
+    if not paper_only():
+        trades, pending = await trader.get_open_trades()
+        open_levels = set(match_legs(s, trades))
+        if not cancelled:
+            pending_by_level = match_legs(s, pending)
+            orders = [item for i in indexes for item, _ in pending_by_level.get(i, [])]
+            await cancel_pending_orders(trader, orders, control.journal, s.uid)
+    elif not cancelled:
+        log.info(f"[DRY-RUN] {len(indexes)} pending levels cancelled")
+    for i in indexes:
+        s.grid[i]["status"] = "filled" if i in open_levels else "cancelled"
+    machine.transition(machine.state, grid=s.grid)
+
+
+async def step(trader: AvantisTrader, control: BotControl, machine: CycleMachine):
+    """One pass of the engine loop: wait for the session, then advance the cycle state."""
+    # Wait for trading hours
+    await wait_for_trading_hours(trader, control)
+    await handle_commands(trader, control)
+
+    if machine.state == BotState.IDLE:
+        # Between cycles: pair, size and entry settings may change too
+        if control.watcher:
+            control.watcher.apply_pending(cycle_boundary=True)
+
+        # Orders placed outside this journal: wait them out
+        if not paper_only() and await wait_for_existing_orders(trader, control):
+            return  # Start new cycle
+
+        if config.GRID_LEVELS > 1:
+            await place_grid_cycle(trader, control, machine)
+        else:
+            await place_cycle(trader, control, machine)
+
+    elif machine.state == BotState.PLACING:
+        await recover_placing(trader, control, machine)
+
+    elif machine.state == BotState.RESET:
+        await cancel_pending_orders(trader, journal=control.journal,
+                                    cycle_uid=machine.current.uid)
+        end_cycle(control, machine, "cancelled")
+
+    cycle = machine.current.cycle
+    if machine.current.grid:
+        if machine.state in (BotState.WAITING, BotState.IN_POSITION):
+            await monitor_grid(trader, control, machine)
+    else:
+        if machine.state == BotState.WAITING:
+            await monitor_cycle(trader, control, machine)
+        if machine.state == BotState.IN_POSITION:
+            await wait_for_close(trader, control, machine)
+
+    if machine.state == BotState.IDLE:
+        log.info(f"\nCycle {cycle} complete.")
+        await control.sleep(random.uniform(3, 8))
+
+
+async def run(control: BotControl):
+    log.info("=" * 50)
+    log.info("DELTA-NEUTRAL BOT (v3)")
+    log.info("=" * 50)
+    mode = "LIVE" if not config.DRY_RUN else ("DRY RUN" if paper_only() else "DRY RUN (simulated exchange)")
+    log.info(f"Mode: {mode}")
+    pairs.start_refresh()
+    try:
+        pair = pairs.get_pair(config.PAIR_NAME)
+        log.info(f"Pair: {pair.name} #{pair.index} ({pair.group}, {pair.max_leverage:g}x max)")
+        if not pair.min_leverage <= config.LEVERAGE <= pair.max_leverage:
+            log.warning(f"[PAIRS] Leverage {config.LEVERAGE}x is outside {pair.name} limits "
+                        f"{pair.min_leverage:g}-{pair.max_leverage:g}x")
+    except ValueError:
+        log.warning(f"[PAIRS] {config.PAIR_NAME} is not in the pair table, using index {config.PAIR_INDEX}")
+    log.info(f"Margin: {config.POSITION_SIZE_USDC} USDC")
+    log.info(f"Leverage: {config.LEVERAGE}x")
+    log.info(f"Entry Offset: {config.ENTRY_OFFSET_MIN*100:.2f}% - {config.ENTRY_OFFSET_MAX*100:.2f}%")
+    log.info(f"Reposition: {config.REPOSITION_THRESHOLD_PCT*100:.1f}% (±{config.REPOSITION_RANDOM*100:.1f}%)")
+    if config.GRID_LEVELS > 1:
+        log.info(f"Grid: {config.GRID_LEVELS} LONG/SHORT pairs per cycle")
+    log.info(f"Check Interval: {config.CHECK_INTERVAL_MIN}-{config.CHECK_INTERVAL_MAX}s")
+    log.info(f"Trading Hours: {config.TRADING_START_HOUR}:00 - {config.TRADING_END_HOUR % 24}:00 MSK (±{config.TRADING_HOURS_VARIANCE}min)")
+    log.info("-" * 50)
+
+    if config.DRY_RUN and config.SIM_EXCHANGE:
+        from sim_exchange import SimExchange
+        trader = SimExchange(config.PRIVATE_KEY, balance=config.SIM_BALANCE)
+    else:
+        trader = AvantisTrader(config.RPC_URL, config.PRIVATE_KEY, config.RPC_FALLBACK_URLS)
+    control.trader = trader
+    metrics.attach(control)
+    botlog.bind(wallet=trader.wallet, pair=config.PAIR_NAME)
+    if config.PROFILE_CYCLES:
+        profiler.start(asyncio.get_running_loop(), state_dir() / "profiles",
+                       config.PROFILE_CYCLES, config.STALL_THRESHOLD_MS)
+    if config.TRADE_DB:
+        from trade_journal import TradeJournal
+        control.journal = TradeJournal(state_dir() / config.TRADE_DB, trader.wallet)
+
+    # Resume from the local journal, no chain reads needed
+    machine = CycleMachine.recover(journal_path(trader.wallet))
+    machine.listeners.append(lambda old, s: control.status.update(
+        phase=s.state.value, cycle=s.cycle, anchor_price=s.anchor_price,
+        entry_price=s.entry_price, direction=s.direction))
+    s = machine.current
+    control.status.update(phase=s.state.value, cycle=s.cycle)
+    if s.state != BotState.IDLE and config.DRY_RUN and config.SIM_EXCHANGE:
+        # Simulated orders live in memory only
+        log.info(f"[STATE] Dropping simulated cycle {s.cycle} ({s.state.value})")
+        if s.state != BotState.IN_POSITION:
+            machine.transition(BotState.RESET)
+        end_cycle(control, machine, "cancelled")
+    elif s.state != BotState.IDLE:
+        botlog.bind(cycle_id=s.uid or None, pair=s.pair_name)
+        tracing.start_cycle(s.uid or uuid.uuid4().hex[:16], cycle=s.cycle, pair=s.pair_name,
+                            dry_run=config.DRY_RUN, resumed=s.state.value)
+        log.info(f"[STATE] Resuming cycle {s.cycle} ({s.state.value}): "
+                 f"{s.pair_name} entry ${s.entry_price:.2f} {s.direction}")
+
+    # Approve once
+    book_task = None
+    if not paper_only():
+        await trader.check_and_approve_usdc(config.POSITION_SIZE_USDC * 2)
+    if not config.DRY_RUN:
+        book_task = asyncio.create_task(follow_chain(trader), name="follow_chain")
+        book_task.add_done_callback(log_task_error)
+
+    try:
+        failures = 0
+        while True:
+            control.heartbeat()
+            try:
+                await step(trader, control, machine)
+                failures = 0
+            except resilience.ServiceError as e:
+                # Feed or chain unavailable: the cycle state is journaled, pick it up later
+                failures += 1
+                delay = min(60, 5 * 2 ** min(failures - 1, 4)) * random.uniform(0.75, 1.25)
+                log.warning(f"[ENGINE] {e}. Retrying in {delay:.0f}s")
+                await control.sleep(delay)
+    finally:
+        # A cycle still running when the engine stops is exported as it is
+        tracing.end_cycle(outcome="stopped")
+        profiler.stop()
+        metrics.detach()
+        if book_task:
+            book_task.cancel()
+        machine.journal.close()
+        if control.journal:
+            control.journal.close()
 
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Delta-Neutral Bot (console)")
+    parser.add_argument("--profile", type=int, metavar="N", default=config.PROFILE_CYCLES,
+                        help="Profile N cycles to STATE_DIR/profiles")
+    config.PROFILE_CYCLES = parser.parse_args().profile
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("\nBot stopped")
+        log.info("\nBot stopped")
@@ -0,0 +1,308 @@
+"""
+Engine metrics in the Prometheus text format.
+
+Counters, gauges and histograms are created once at import and updated
+in place, with no dicts or strings built per update. Updates come from
+several threads (engine loop, GUI workers, rate limiter, watchdog), so
+counters and histograms hold a lock per child for the read-modify-write;
+a gauge set is a single assignment. Values derived from the order book
+(open positions, exposure) are computed only when /metrics is scraped.
+
+Served by the daemon's GET /metrics, or on config.METRICS_PORT by
+start_http_server for GUI and console runs.
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+import botlog
+
+log = botlog.get("metrics")
+
+PREFIX = "dn_"
+
+RPC_OPS = ("approve", "place", "place_batch", "cancel", "close", "get_trades")
+OUTCOMES = ("filled", "closed", "repositioned", "cancelled", "session_end")
+CALL_KINDS = ("feed", "read", "write")
+WATCHDOG_STEPS = ("switch_endpoint", "cancel_all", "restart")
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # Last slot is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        slot = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> tuple:
+        """(counts, sum, count) taken together, so buckets add up to count."""
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Family:
+    """
+    One metric name, optionally with one label whose values are known up
+    front. Hot paths keep a reference to the child (family["place"]).
+    """
+
+    def __init__(self, name: str, kind: str, help: str, cls, label: str = None, values=()):
+        self.name = PREFIX + name
+        self.kind = kind
+        self.help = help
+        self.label = label
+        self._cls = cls
+        self.children = {value: cls() for value in values} if label else {None: cls()}
+        self._lock = threading.Lock()
+        _families.append(self)
+
+    def __getitem__(self, value):
+        child = self.children.get(value)
+        if child is None:
+            # Rare: a label value not declared up front
+            with self._lock:
+                child = self.children.setdefault(value, self._cls())
+        return child
+
+    # Unlabelled families act as their only child
+    def inc(self, n=1):
+        self.children[None].inc(n)
+
+    def set(self, value):
+        self.children[None].set(value)
+
+    def observe(self, value):
+        self.children[None].observe(value)
+
+    def render(self, lines: list):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for value, child in list(self.children.items()):
+            labels = f'{self.label}="{value}"' if self.label else ""
+            if self.kind == "histogram":
+                sep = "," if labels else ""
+                counts, total_sum, count = child.snapshot()
+                total = 0
+                for bound, n in zip(self.bounds_of(child), counts):
+                    total += n
+                    lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {total}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.name}_sum{suffix} {total_sum:.6f}")
+                lines.append(f"{self.name}_count{suffix} {count}")
+            else:
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.name}{suffix} {child.value}")
+
+    @staticmethod
+    def bounds_of(child) -> list:
+        return [str(b) for b in child.bounds] + ["+Inf"]
+
+
+_families = []
+
+
+def counter(name, help, label=None, values=()):
+    return Family(name, "counter", help, Counter, label, values)
+
+
+def gauge(name, help, label=None, values=()):
+    return Family(name, "gauge", help, Gauge, label, values)
+
+
+def histogram(name, help, label=None, values=()):
+    return Family(name, "histogram", help, Histogram, label, values)
+
+
+# ----- Engine -----
+CYCLES_STARTED = counter("cycles_started_total", "Cycles that placed orders")
+CYCLES_ENDED = counter("cycles_completed_total", "Cycles ended, by outcome", "outcome", OUTCOMES)
+REPOSITIONS = counter("repositions_total", "Cycles ended because price moved past the threshold")
+FILLS = counter("fills_total", "Position legs filled")
+CLOSES = counter("closes_total", "Position legs closed, by TP or SL", "reason", ("tp", "sl"))
+CANCEL_ERRORS = counter("cancel_errors_total", "Failed order cancels")
+PRICE = gauge("price", "Last price of the traded pair")
+TRIGGER_DISTANCE = gauge("trigger_distance_ratio",
+                         "Relative distance from price to the nearest entry, TP, SL or reposition level")
+
+# ----- Chain and feed -----
+RPC_CALLS = counter("rpc_calls_total", "Chain transactions and reads", "op", RPC_OPS)
+RPC_ERRORS = counter("rpc_errors_total", "Failed chain transactions and reads", "op", RPC_OPS)
+RPC_LATENCY = histogram("rpc_latency_seconds", "Chain call latency", "op", RPC_OPS)
+FEED_CALLS = counter("feed_calls_total", "Price feed requests")
+FEED_ERRORS = counter("feed_errors_total", "Failed price feed requests")
+FEED_LATENCY = histogram("feed_latency_seconds", "Price feed latency")
+
+# ----- Resilience and watchdog -----
+CALL_TIMEOUTS = counter("call_timeouts_total", "Feed and chain calls that missed their deadline",
+                        "kind", CALL_KINDS)
+CALL_RETRIES = counter("call_retries_total", "Feed and chain calls retried after a timeout or transient error",
+                       "kind", CALL_KINDS)
+ENDPOINT_SWITCHES = counter("endpoint_switches_total", "Switches to another RPC or a fresh feed client",
+                            "target", ("rpc", "feed"))
+WATCHDOG_ESCALATIONS = counter("watchdog_escalations_total",
+                               "Watchdog steps taken after a missed engine heartbeat",
+                               "step", WATCHDOG_STEPS)
+CIRCUIT_OPENS = counter("circuit_opens_total", "Circuit breakers opened after repeated failures",
+                        "target", ("rpc", "feed"))
+CIRCUIT_REJECTED = counter("circuit_rejected_total", "Calls failed fast by an open circuit breaker",
+                           "target", ("rpc", "feed"))
+THROTTLED = counter("throttled_total", "Calls delayed by the rate limiter, by budget",
+                    "budget", CALL_KINDS)
+THROTTLED_BY_PRIORITY = counter("throttled_by_priority_total", "Calls delayed by the rate limiter, by priority",
+                                "priority", ("high", "normal", "low"))
+THROTTLE_WAIT = histogram("throttle_wait_seconds", "Time delayed calls waited for a rate limit token",
+                          "budget", CALL_KINDS)
+HEARTBEAT_OVERDUE = gauge("heartbeat_overdue_seconds", "Seconds since the engine heartbeat was due (0 = healthy)")
+
+# Engine control whose status and order book are read at scrape time
+_control = None
+_started = time.time()
+
+
+def attach(control):
+    """Report on this engine (BotControl) until detach()."""
+    global _control
+    _control = control
+
+
+def detach():
+    global _control
+    _control = None
+
+
+def timed(op: str):
+    """Count, time and count failures of an async chain call. Dry-run calls are skipped."""
+    calls, errors, latency = RPC_CALLS[op], RPC_ERRORS[op], RPC_LATENCY[op]
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if kwargs.get("dry_run") is True:
+                return await fn(*args, **kwargs)
+            calls.inc()
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def _engine_lines(lines: list):
+    control = _control
+    status = control.status if control else {}
+    trader = control.trader if control else None
+    lines.append(f"# TYPE {PREFIX}engine_up gauge")
+    lines.append(f"{PREFIX}engine_up {int(control is not None)}")
+    lines.append(f"# TYPE {PREFIX}cycle gauge")
+    lines.append(f"{PREFIX}cycle {status.get('cycle', 0)}")
+    lines.append(f"# TYPE {PREFIX}price_diff_ratio gauge")
+    lines.append(f"{PREFIX}price_diff_ratio {status.get('price_diff', 0)}")
+    if trader is None:
+        return
+
+    import config
+    trades, pending = trader.book.snapshot()
+    exposure = sum((getattr(t, "collateral_in_trade", 0) or 0) * (getattr(t, "leverage", 0) or 0)
+                   for t in trades)
+    mode = "live" if not config.DRY_RUN else "dry"
+    lines.append(f"# TYPE {PREFIX}info gauge")
+    lines.append(f'{PREFIX}info{{wallet="{trader.wallet}",pair="{config.PAIR_NAME}",mode="{mode}"}} 1')
+    lines.append(f"# HELP {PREFIX}open_positions Open position legs (order book)")
+    lines.append(f"# TYPE {PREFIX}open_positions gauge")
+    lines.append(f"{PREFIX}open_positions {len(trades)}")
+    lines.append(f"# TYPE {PREFIX}pending_orders gauge")
+    lines.append(f"{PREFIX}pending_orders {len(pending)}")
+    lines.append(f"# HELP {PREFIX}open_exposure_usdc Position size (collateral x leverage) of open legs")
+    lines.append(f"# TYPE {PREFIX}open_exposure_usdc gauge")
+    lines.append(f"{PREFIX}open_exposure_usdc {exposure:.2f}")
+
+
+def render(extra: dict = None) -> str:
+    """
+    All metrics in the Prometheus text format.
+
+    Args:
+        extra: Additional gauges {name: value} (e.g. process stats from the daemon)
+    """
+    lines = []
+    for family in _families:
+        family.render(lines)
+    _engine_lines(lines)
+    extra = dict(extra or {})
+    extra.setdefault("uptime_seconds", round(time.time() - _started, 1))
+    for name, value in extra.items():
+        lines.append(f"# TYPE {PREFIX}{name} gauge")
+        lines.append(f"{PREFIX}{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+_server = None
+
+
+def start_http_server(port: int, host: str = "127.0.0.1"):
+    """Serve GET /metrics on a background thread (once per process)."""
+    global _server
+    if _server is not None:
+        return
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    log.info(f"[METRICS] Serving http://{host}:{port}/metrics")
@@ -0,0 +1,363 @@
+"""
+Local stand-in for the Base RPC and the Avantis price feed.
+
+Serves scripted, deterministic price paths and the generic JSON-RPC
+methods the bot uses (block number, nonces, gas, raw transactions,
+receipts, logs), with configurable latency, error injection and an
+accelerated clock. Stdlib only.
+
+Usage:
+    python mock_server.py --port 8545 --speed 10 --seed 1
+    python mock_server.py --path sine --latency 0.05 --error-rate 0.02
+    python mock_server.py --path prices.csv      # lines: seconds,price
+
+Point the bot at it in settings.json:
+    "rpc_url": "http://127.0.0.1:8545", "feed_url": "http://127.0.0.1:8545"
+
+Endpoints:
+    GET  /price?pairs=BTC/USD,ETH/USD   Current prices
+    POST /price   {"pair": "BTC/USD", "price": 101000}   Jump a path
+    POST /errors  {"rate": 0.1, "latency": 0.2}          Change injection
+    POST /v1/traces   OTLP/JSON traces (collector stand-in, see --traces)
+    GET  /v1/traces?limit=50   Recent spans
+    POST /        JSON-RPC
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import zlib
+from collections import deque
+
+# Start prices of the generated paths (other pairs start at 100)
+START_PRICES = {"BTC/USD": 100000.0, "ETH/USD": 3500.0, "SOL/USD": 150.0,
+                "XAU/USD": 2400.0, "EUR/USD": 1.08}
+
+CHAIN_ID = 8453  # Base
+BLOCK_TIME = 2.0
+MAX_UINT = 2**256 - 1
+ALLOWANCE_SELECTOR = "0xdd62ed3e"
+
+
+class PricePath:
+    """
+    Deterministic price of one pair as a function of simulated time.
+
+    random: geometric random walk, one seeded step per simulated second
+    sine:   start * (1 + amplitude * sin(2 pi t / period))
+    csv:    linear interpolation of (seconds, price) rows, looped
+    """
+
+    def __init__(self, kind: str, start: float, seed: int, vol: float,
+                 amplitude: float = 0.01, period: float = 600, rows: list = None):
+        self.kind = kind
+        self.start = start
+        self.vol = vol
+        self.amplitude = amplitude
+        self.period = period
+        self.rows = rows or []
+        self.scale = 1.0
+        self._rng = random.Random(seed)
+        self._log_prices = [0.0]
+
+    def _walk(self, t: float) -> float:
+        second = int(t)
+        while len(self._log_prices) <= second + 1:
+            self._log_prices.append(self._log_prices[-1] + self._rng.gauss(0, self.vol))
+        a, b = self._log_prices[second], self._log_prices[second + 1]
+        return math.exp(a + (b - a) * (t - second))
+
+    def _csv(self, t: float) -> float:
+        rows = self.rows
+        t = t % rows[-1][0] if rows[-1][0] > 0 else 0
+        for (t0, p0), (t1, p1) in zip(rows, rows[1:]):
+            if t0 <= t <= t1:
+                return p0 + (p1 - p0) * (t - t0) / max(t1 - t0, 1e-9)
+        return rows[-1][1]
+
+    def price(self, t: float) -> float:
+        if self.kind == "sine":
+            base = self.start * (1 + self.amplitude * math.sin(2 * math.pi * t / self.period))
+        elif self.kind == "csv":
+            base = self._csv(t)
+        else:
+            base = self.start * self._walk(t)
+        return base * self.scale
+
+    def jump(self, t: float, price: float):
+        """Continue the path from `price` at time t."""
+        self.scale = 1.0
+        self.scale = price / self.price(t)
+
+
+class MockChain:
+    """Nonces, transactions and receipts for a single-wallet test chain."""
+
+    def __init__(self, clock, confirm_blocks: int = 1):
+        self.clock = clock
+        self.confirm_blocks = confirm_blocks
+        self.nonce = 0
+        self.txs = {}
+
+    def block_number(self) -> int:
+        return 1_000_000 + int(self.clock() / BLOCK_TIME)
+
+    def send_raw(self, raw: str) -> str:
+        tx_hash = "0x" + hashlib.sha256(raw.encode() + str(self.nonce).encode()).hexdigest()
+        self.txs[tx_hash] = self.block_number() + self.confirm_blocks
+        self.nonce += 1
+        return tx_hash
+
+    def receipt(self, tx_hash: str):
+        block = self.txs.get(tx_hash)
+        if block is None or self.block_number() < block:
+            return None
+        return {
+            "transactionHash": tx_hash, "blockNumber": hex(block), "blockHash": "0x" + "00" * 32,
+            "transactionIndex": "0x0", "status": "0x1", "gasUsed": hex(180000),
+            "cumulativeGasUsed": hex(180000), "effectiveGasPrice": hex(10**7),
+            "from": "0x" + "00" * 20, "to": "0x" + "00" * 20, "logs": [],
+            "logsBloom": "0x" + "00" * 256, "contractAddress": None, "type": "0x2",
+        }
+
+    def call(self, method: str, params: list):
+        if method == "eth_chainId":
+            return hex(CHAIN_ID)
+        if method == "net_version":
+            return str(CHAIN_ID)
+        if method == "eth_blockNumber":
+            return hex(self.block_number())
+        if method in ("eth_gasPrice", "eth_maxPriorityFeePerGas"):
+            return hex(10**7)
+        if method == "eth_getBalance":
+            return hex(10**18)
+        if method == "eth_getTransactionCount":
+            return hex(self.nonce)
+        if method == "eth_estimateGas":
+            return hex(250000)
+        if method == "eth_sendRawTransaction":
+            return self.send_raw(params[0])
+        if method == "eth_getTransactionReceipt":
+            return self.receipt(params[0])
+        if method == "eth_getLogs":
+            return []
+        if method == "eth_getBlockByNumber":
+            number = self.block_number()
+            return {"number": hex(number), "baseFeePerGas": hex(10**7),
+                    "timestamp": hex(int(time.time())), "hash": "0x" + "00" * 32, "transactions": []}
+        if method == "eth_call":
+            data = (params[0] or {}).get("data") or (params[0] or {}).get("input") or ""
+            # USDC allowance: always approved
+            if data.startswith(ALLOWANCE_SELECTOR):
+                return "0x" + f"{MAX_UINT:064x}"
+            return "0x" + "00" * 32
+        raise KeyError(method)
+
+
+class MockServer:
+    def __init__(self, args):
+        self.args = args
+        self.started = time.time()
+        self.latency = args.latency
+        self.error_rate = args.error_rate
+        self.errors = random.Random(args.seed + 1)
+        self.paths = {}
+        self.chain = MockChain(self.clock, args.confirm_blocks)
+        self.requests = 0
+        self.spans = deque(maxlen=1000)
+        self.traces_file = getattr(args, "traces", None)
+
+        self.rows = None
+        if args.path not in ("random", "sine"):
+            with open(args.path) as f:
+                self.rows = [tuple(map(float, line.split(",")[:2]))
+                             for line in f if line.strip() and not line.startswith("#")]
+
+    def clock(self) -> float:
+        """Simulated seconds since start."""
+        return (time.time() - self.started) * self.args.speed
+
+    def path(self, pair: str) -> PricePath:
+        if pair not in self.paths:
+            kind = "csv" if self.rows else self.args.path
+            seed = self.args.seed * 1_000_003 + zlib.crc32(pair.encode())
+            self.paths[pair] = PricePath(kind, START_PRICES.get(pair, 100.0), seed,
+                                         self.args.vol, self.args.amplitude,
+                                         self.args.period, self.rows)
+        return self.paths[pair]
+
+    def fail(self) -> bool:
+        return self.error_rate > 0 and self.errors.random() < self.error_rate
+
+    async def handle(self, reader, writer):
+        try:
+            method, path, query, body = await read_request(reader)
+            self.requests += 1
+            if self.latency > 0:
+                await asyncio.sleep(self.latency)
+            status, payload = self.route(method, path, query, body)
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        data = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.0 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def route(self, method: str, path: str, query: dict, body):
+        if path == "/price" and method == "GET":
+            if self.fail():
+                return 503, {"error": "injected feed error"}
+            t = self.clock()
+            pairs = [p for p in query.get("pairs", "BTC/USD").split(",") if p]
+            return 200, {"time": t, "prices": {p: self.path(p).price(t) for p in pairs}}
+
+        if path == "/price" and method == "POST":
+            self.path(body["pair"]).jump(self.clock(), float(body["price"]))
+            return 200, {"ok": True}
+
+        if path == "/errors" and method == "POST":
+            self.error_rate = float(body.get("rate", self.error_rate))
+            self.latency = float(body.get("latency", self.latency))
+            return 200, {"rate": self.error_rate, "latency": self.latency}
+
+        if path == "/v1/traces" and method == "POST":
+            for resource in body.get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    self.spans.extend(scope.get("spans", []))
+            if self.traces_file:
+                with open(self.traces_file, "a") as f:
+                    f.write(json.dumps(body) + "\n")
+            return 200, {"partialSuccess": {}}
+
+        if path == "/v1/traces" and method == "GET":
+            limit = int(query.get("limit", 50))
+            return 200, {"spans": list(self.spans)[-limit:]}
+
+        if path == "/" and method == "POST":
+            calls = body if isinstance(body, list) else [body]
+            results = [self.rpc(call) for call in calls]
+            return 200, results if isinstance(body, list) else results[0]
+
+        return 404, {"error": f"No route for {method} {path}"}
+
+    def rpc(self, call: dict) -> dict:
+        reply = {"jsonrpc": "2.0", "id": call.get("id")}
+        if self.fail():
+            reply["error"] = {"code": -32005, "message": "injected error: rate limited"}
+            return reply
+        try:
+            reply["result"] = self.chain.call(call.get("method"), call.get("params") or [])
+        except KeyError:
+            reply["error"] = {"code": -32601, "message": f"method not found: {call.get('method')}"}
+        return reply
+
+
+async def read_request(reader):
+    line = (await reader.readline()).decode("latin-1").strip()
+    parts = line.split()
+    if len(parts) < 2:
+        raise ValueError("Bad request line")
+    method, target = parts[0].upper(), parts[1]
+    path, _, qs = target.partition("?")
+    query = dict(pair.split("=", 1) for pair in qs.split("&") if "=" in pair)
+    query = {k: v.replace("%2F", "/").replace("%2C", ",") for k, v in query.items()}
+
+    length = 0
+    while True:
+        header = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    body = json.loads(await reader.readexactly(length)) if length else None
+    return method, path, query, body
+
+
+# ------------------------------------------------------------
+# CLIENT (used by price.py when config.FEED_URL is set)
+# ------------------------------------------------------------
+
+class _Parsed:
+    def __init__(self, pair: str, price: float):
+        self.pair = pair
+        self.converted_price = price
+
+
+class _Updates:
+    def __init__(self, parsed: list):
+        self.parsed = parsed
+
+
+class MockFeedClient:
+    """FeedClient look-alike that reads prices from the mock server."""
+
+    def __init__(self, url: str):
+        url = url.split("://", 1)[-1].rstrip("/")
+        host, _, port = url.partition(":")
+        self.host = host
+        self.port = int(port or 80)
+
+    async def get_latest_price_updates(self, pairs: list) -> _Updates:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(f"GET /price?pairs={','.join(pairs)} HTTP/1.0\r\n"
+                         f"Host: {self.host}\r\n\r\n".encode())
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, body = raw.partition(b"\r\n\r\n")
+        status = int(head.split()[1])
+        if status != 200:
+            raise ConnectionError(f"Feed returned HTTP {status}")
+        prices = json.loads(body)["prices"]
+        return _Updates([_Parsed(p, prices[p]) for p in pairs])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Base RPC and Avantis price feed")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--path", default="random", help="random, sine or a CSV file (seconds,price)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for paths and error injection")
+    parser.add_argument("--vol", type=float, default=0.0005, help="random: log-return stdev per second")
+    parser.add_argument("--amplitude", type=float, default=0.01, help="sine: relative amplitude")
+    parser.add_argument("--period", type=float, default=600, help="sine: period in seconds")
+    parser.add_argument("--speed", type=float, default=1.0, help="Simulated seconds per real second")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failing requests")
+    parser.add_argument("--confirm-blocks", type=int, default=1, help="Blocks until a receipt appears")
+    parser.add_argument("--traces", help="Append traces received on /v1/traces to this file")
+    args = parser.parse_args()
+
+    server = MockServer(args)
+
+    async def serve():
+        srv = await asyncio.start_server(server.handle, host=args.host, port=args.port)
+        print(f"[MOCK] RPC and feed on http://{args.host}:{args.port} "
+              f"(path={args.path}, speed={args.speed}x, seed={args.seed})")
+        async with srv:
+            await srv.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n[MOCK] Stopped")
+
+
+if __name__ == "__main__":
+    main()
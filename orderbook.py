@@ -0,0 +1,113 @@
+"""
+Local book of our open positions and pending orders.
+
+Readers (monitor loop, TP/SL wait, GUI, daemon API) get the current
+snapshot in O(1). The book is kept up to date from our own transactions
+(cancels and closes remove entries at once), marked stale by chain logs
+that mention the wallet, and reconciled with get_trades when stale or
+older than the reconcile interval.
+"""
+
+import asyncio
+import time
+
+import botlog
+import ratelimit
+
+log = botlog.get("book")
+
+
+class OrderBook:
+    """
+    Open trades and pending orders keyed by (pair_index, trade_index).
+
+    Only the engine loop writes. snapshot() returns an immutable tuple that
+    is swapped atomically, so other threads may read it without locks.
+    """
+
+    def __init__(self):
+        self.trades = {}
+        self.pending = {}
+        self.synced_at = 0.0
+        self.stale = True
+        self._snapshot = ((), ())
+
+    @staticmethod
+    def key(item) -> tuple:
+        return item.pair_index, item.trade_index
+
+    def reconcile(self, trades: list, pending: list):
+        """Replace the book with a fresh get_trades() result."""
+        self.trades = {self.key(t): t for t in trades}
+        self.pending = {self.key(o): o for o in pending}
+        self.synced_at = time.time()
+        self.stale = False
+        self._publish()
+
+    def remove(self, pair_index: int, trade_index: int):
+        """Drop an order or position we just cancelled or closed."""
+        key = (pair_index, trade_index)
+        if self.trades.pop(key, None) is not None or self.pending.pop(key, None) is not None:
+            self._publish()
+
+    def mark_stale(self):
+        """Something changed on chain that the book cannot derive itself."""
+        self.stale = True
+
+    def is_fresh(self, max_age: float) -> bool:
+        return not self.stale and time.time() - self.synced_at < max_age
+
+    def get(self, pair_index: int, trade_index: int):
+        key = (pair_index, trade_index)
+        return self.trades.get(key) or self.pending.get(key)
+
+    def snapshot(self) -> tuple:
+        """(trades, pending) as tuples. O(1)."""
+        return self._snapshot
+
+    def _publish(self):
+        self._snapshot = (tuple(self.trades.values()), tuple(self.pending.values()))
+
+
+async def follow_chain(trader, interval: float = 3.0):
+    """
+    Mark trader.book stale whenever a trading contract log mentions our
+    wallet (order placed, executed, cancelled, TP/SL hit).
+
+    Logs are only scanned for the wallet address, not decoded, so this
+    keeps working across contract ABI changes. Polls go through the
+    trader's current endpoint (it may switch) at LOW rate-limit priority,
+    with the usual read deadline and retries. Runs until cancelled.
+    """
+    if getattr(trader.client, "async_web3", None) is None:
+        log.info("[BOOK] No web3 client, relying on periodic reconcile")
+        return
+
+    from avantis_trader_sdk.config import CONTRACT_ADDRESSES
+    addresses = [CONTRACT_ADDRESSES[name] for name in ("Trading", "TradingStorage")
+                 if name in CONTRACT_ADDRESSES]
+    wallet = bytes.fromhex(trader.wallet[2:].lower())
+
+    last = None
+    while True:
+        try:
+            with ratelimit.priority(ratelimit.LOW):
+                head = await trader._call("read", "block_number",
+                                          lambda: trader.client.async_web3.eth.block_number)
+                logs = []
+                if last is not None and head > last:
+                    query = {"address": addresses, "fromBlock": last + 1, "toBlock": head}
+                    logs = await trader._call("read", "get_logs",
+                                              lambda: trader.client.async_web3.eth.get_logs(query))
+            for entry in logs:
+                if any(wallet in bytes(t) for t in entry["topics"]) or wallet in bytes(entry["data"]):
+                    trader.book.mark_stale()
+                    break
+            last = head
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Missed blocks are covered by the periodic reconcile
+            trader.book.mark_stale()
+            log.warning(f"[BOOK] Log poll error: {e}")
+        await asyncio.sleep(interval)
@@ -1,10 +1,34 @@
 """
-Trading pairs configuration for Avantis DEX.
+Trading pairs registry for Avantis DEX.
+
+Pair indexes, groups, spreads, fees and leverage limits come from the
+chain (the SDK's pairs_cache.get_pairs_info()), not a hand-kept list:
+
+    - at startup the table is read from config.PAIRS_CACHE (in STATE_DIR),
+      or BUILTIN_PAIRS the very first time
+    - start_refresh() re-reads the chain in a background thread whenever
+      the table is older than config.PAIRS_TTL and rewrites the cache
+
+Lookups by name and by index are dict lookups. A refresh swaps the whole
+table at once, so readers in other threads never see half of it.
 """
 
-# All available trading pairs with their indexes
-# Format: (index, name, category)
-TRADING_PAIRS = [
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict, fields
+from pathlib import Path
+
+import botlog
+import config
+
+log = botlog.get("pairs")
+
+# Used until the first chain read when there is no cache yet.
+# Format: (index, name, group)
+BUILTIN_PAIRS = [
     # Crypto - Major
     (1, "BTC/USD", "Crypto"),
     (2, "ETH/USD", "Crypto"),
@@ -52,57 +76,306 @@ TRADING_PAIRS = [
     (62, "XAG/USD", "Commodities"),
 ]
 
-# Quick lookup dict: name -> (index, category)
-PAIRS_DICT = {name: (idx, cat) for idx, name, cat in TRADING_PAIRS}
+# Group index on chain -> name shown in the GUI
+GROUP_NAMES = {0: "Crypto", 1: "Forex", 2: "Commodities"}
+
+# Fees assumed for pairs whose chain data has none (fraction of position size)
+DEFAULT_OPEN_FEE = 0.0006
+DEFAULT_CLOSE_FEE = 0.0006
+
+# Wait before trying the chain again after a failed refresh
+RETRY_INTERVAL = 300
+
+
+@dataclass(frozen=True)
+class PairInfo:
+    """
+    One pair. Spread and fees are fractions of position size,
+    borrow_fee_per_hour a fraction of position size per hour held.
+    """
+    index: int
+    name: str
+    group: str = "Unknown"
+    spread: float = 0.0
+    open_fee: float = DEFAULT_OPEN_FEE
+    close_fee: float = DEFAULT_CLOSE_FEE
+    borrow_fee_per_hour: float = 0.0
+    min_leverage: float = 1
+    max_leverage: float = 150
+
+
+def _get(info, *names, default=None):
+    """First present field of an SDK model or dict."""
+    for name in names:
+        value = info.get(name) if isinstance(info, dict) else getattr(info, name, None)
+        if value is not None:
+            return value
+    return default
+
+
+def parse_pair(key, info, position: int) -> PairInfo:
+    """
+    PairInfo from one entry of get_pairs_info(). The SDK reports spread
+    and fees in percent (spread_p, open_fee_p, ...) or basis points
+    (constant_spread_bps); both are converted to fractions.
+
+    Raises:
+        ValueError: No pair name in the entry
+    """
+    base, quote = _get(info, "from_", "from"), _get(info, "to")
+    name = f"{base}/{quote}" if base and quote else _get(
+        info, "name", "pair", default=key if isinstance(key, str) else None)
+    if not name:
+        raise ValueError(f"pair {key!r} has no name")
+    index = key if isinstance(key, int) else int(_get(info, "index", "pair_index", default=position))
+
+    group = _get(info, "group", "group_name")
+    if group is None:
+        group_index = _get(info, "group_index")
+        group = GROUP_NAMES.get(group_index, f"Group {group_index}" if group_index is not None else "Unknown")
+
+    spread_bps = _get(info, "constant_spread_bps")
+    spread = spread_bps / 1e4 if spread_bps is not None else _get(info, "spread_p", default=0) / 100
+    fees = _get(info, "fees", default=info)
+    leverages = _get(info, "leverages", default=info)
+    return PairInfo(
+        index=index,
+        name=str(name),
+        group=str(group),
+        spread=float(spread),
+        open_fee=float(_get(fees, "open_fee_p", default=DEFAULT_OPEN_FEE * 100)) / 100,
+        close_fee=float(_get(fees, "close_fee_p", default=DEFAULT_CLOSE_FEE * 100)) / 100,
+        borrow_fee_per_hour=float(_get(fees, "borrow_fee_per_hour_p", "margin_fee_per_hour_p", default=0)) / 100,
+        min_leverage=float(_get(leverages, "min_leverage", default=1)),
+        max_leverage=float(_get(leverages, "max_leverage", default=150)),
+    )
+
+
+class PairRegistry:
+    """
+    Pair table with O(1) lookups by name and index.
+
+    listeners are called with the registry after a refresh changed the
+    table (from the refresh thread).
+    """
+
+    def __init__(self):
+        # (by name, by index, names in index order): swapped as one
+        self._table = ({}, {}, [])
+        self.source = None
+        self.updated_at = 0.0
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # ----- Lookups -----
+
+    def get(self, name: str) -> PairInfo:
+        """
+        Raises:
+            ValueError: Unknown pair
+        """
+        pair = self._loaded()[0].get(name)
+        if pair is None:
+            raise ValueError(f"Unknown pair: {name}")
+        return pair
+
+    def by_index(self, index: int) -> PairInfo:
+        """
+        Raises:
+            ValueError: Unknown pair index
+        """
+        pair = self._loaded()[1].get(index)
+        if pair is None:
+            raise ValueError(f"Unknown pair index: {index}")
+        return pair
+
+    def names(self) -> list:
+        return list(self._loaded()[2])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._loaded()[0]
 
-# List of pair names only
-PAIR_NAMES = [name for _, name, _ in TRADING_PAIRS]
+    @property
+    def age(self) -> float:
+        return time.time() - self.updated_at
+
+    def _loaded(self) -> tuple:
+        if self.source is None:
+            with self._lock:
+                if self.source is None:
+                    self.load()
+        return self._table
+
+    # ----- Loading -----
+
+    def cache_path(self) -> Path:
+        folder = Path(config.STATE_DIR) if config.STATE_DIR else Path(__file__).parent
+        return folder / config.PAIRS_CACHE
+
+    def load(self):
+        """Table from the disk cache (even if stale), else BUILTIN_PAIRS."""
+        if config.PAIRS_CACHE:
+            try:
+                with open(self.cache_path(), encoding="utf-8") as f:
+                    data = json.load(f)
+                names = {f.name for f in fields(PairInfo)}
+                pairs = [PairInfo(**{k: v for k, v in p.items() if k in names}) for p in data["pairs"]]
+                if pairs:
+                    self._apply(pairs, "cache", data["saved_at"])
+                    return
+            except FileNotFoundError:
+                pass
+            except (ValueError, KeyError, TypeError) as e:
+                log.warning(f"[PAIRS] Ignoring bad cache {self.cache_path().name}: {e}")
+        self._apply([PairInfo(index, name, group) for index, name, group in BUILTIN_PAIRS], "builtin", 0.0)
+
+    def save(self):
+        """Atomically rewrite the disk cache."""
+        if not config.PAIRS_CACHE:
+            return
+        path = self.cache_path()
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        by_index = self._table[1]
+        data = {"saved_at": self.updated_at, "pairs": [asdict(by_index[i]) for i in sorted(by_index)]}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+
+    async def refresh(self):
+        """
+        Read the pair table from chain, swap it in and cache it.
+
+        Raises:
+            ServiceError: RPC failed
+            ValueError: Empty or unreadable table
+        """
+        import ratelimit
+        import resilience
+        from dex import get_client
+
+        client = get_client()
+        with ratelimit.priority(ratelimit.LOW):
+            info = await resilience.call(
+                "read", "pairs info", lambda: client.pairs_cache.get_pairs_info(),
+                lambda: config.RPC_URL)
+        items = info.items() if isinstance(info, dict) else enumerate(info)
+        pairs = [parse_pair(key, entry, i) for i, (key, entry) in enumerate(items)]
+        if not pairs:
+            raise ValueError("chain returned no pairs")
+        changed = self._apply(pairs, "chain", time.time())
+        self.save()
+        log.info(f"[PAIRS] Loaded {len(pairs)} pairs from chain")
+        if changed:
+            for listener in self.listeners:
+                listener(self)
+
+    def _apply(self, pairs: list, source: str, updated_at: float) -> bool:
+        """Swap in a new table; True if any pair changed."""
+        by_name, by_index = {}, {}
+        for pair in sorted(pairs, key=lambda p: p.index):
+            if pair.name not in by_name and pair.index not in by_index:
+                by_name[pair.name] = by_index[pair.index] = pair
+        changed = by_index != self._table[1]
+        self._table = (by_name, by_index, list(by_name))
+        self.source = source
+        self.updated_at = updated_at
+
+        # Indexes drift when pairs are listed or delisted: follow the chain
+        current = by_name.get(config.PAIR_NAME)
+        if current and current.index != config.PAIR_INDEX:
+            log.warning(f"[PAIRS] {config.PAIR_NAME} index is {current.index} (was {config.PAIR_INDEX})")
+            config.PAIR_INDEX = current.index
+        return changed
+
+    # ----- Background refresh -----
+
+    def start_refresh(self):
+        """Keep the table fresh in a background thread (once per process)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pairs-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        self._loaded()
+        failures = 0
+        while True:
+            wait = config.PAIRS_TTL - self.age
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            try:
+                asyncio.run(self.refresh())
+                failures = 0
+            except Exception as e:
+                failures += 1
+                # First failure and then hourly: the RPC may be down for long
+                if failures % 12 == 1:
+                    log.warning(f"[PAIRS] Refresh failed, using {self.source} table: {e}")
+                time.sleep(min(RETRY_INTERVAL, max(config.PAIRS_TTL, 1)))
+
+
+registry = PairRegistry()
+
+
+def get_pair(pair_name: str) -> PairInfo:
+    """Pair info by name. Raises ValueError if unknown."""
+    return registry.get(pair_name)
 
 
 def get_pair_index(pair_name: str) -> int:
     """Get pair index by name."""
-    if pair_name in PAIRS_DICT:
-        return PAIRS_DICT[pair_name][0]
-    raise ValueError(f"Unknown pair: {pair_name}")
+    return registry.get(pair_name).index
+
+
+def get_pair_name(pair_index: int) -> str:
+    """Get pair name by index."""
+    return registry.by_index(pair_index).name
 
 
 def get_pair_category(pair_name: str) -> str:
     """Get pair category by name."""
-    if pair_name in PAIRS_DICT:
-        return PAIRS_DICT[pair_name][1]
+    if pair_name in registry:
+        return registry.get(pair_name).group
     return "Unknown"
 
 
+def pair_names() -> list:
+    """Pair names in index order."""
+    return registry.names()
+
+
+def start_refresh():
+    registry.start_refresh()
+
+
 async def get_pair_price(pair_name: str) -> float:
-    """Get current price for a pair."""
-    from avantis_trader_sdk.feed.feed_client import FeedClient
+    """
+    Get current price for a pair.
 
-    feed = FeedClient()
-    try:
-        data = await feed.get_latest_price_updates([pair_name])
-        if data.parsed and len(data.parsed) > 0:
-            return data.parsed[0].converted_price
-    except:
-        pass
-    return 0.0
+    Raises:
+        ServiceError: Feed failed or returned no valid price
+    """
+    from price import get_pair_price as feed_price
+    return await feed_price(pair_name)
 
 
 async def get_multiple_prices(pair_names: list) -> dict:
-    """Get prices for multiple pairs at once."""
-    from avantis_trader_sdk.feed.feed_client import FeedClient
+    """
+    Get prices for multiple pairs at once.
+    Pairs without a valid price in the response are left out.
 
-    feed = FeedClient()
-    prices = {}
-
-    try:
-        data = await feed.get_latest_price_updates(pair_names)
-        for i, pair in enumerate(pair_names):
-            if data.parsed and i < len(data.parsed):
-                prices[pair] = data.parsed[i].converted_price
-            else:
-                prices[pair] = 0.0
-    except:
-        for pair in pair_names:
-            prices[pair] = 0.0
+    Raises:
+        ServiceError: Feed failed
+    """
+    from price import fetch_prices, parse_price
+    from resilience import PriceUnavailable
 
+    data = await fetch_prices(pair_names)
+    prices = {}
+    for i, pair in enumerate(pair_names):
+        try:
+            prices[pair] = parse_price(data, pair, i)
+        except PriceUnavailable:
+            pass
     return prices
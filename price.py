@@ -1,5 +1,10 @@
-from avantis_trader_sdk.feed.feed_client import FeedClient
+import math
+import time
 
+import config
+import metrics
+import resilience
+import tracing
 
 # Global feed client instance
 _feed_client = None
@@ -9,31 +14,82 @@ def get_feed_client():
     """Get or create FeedClient instance."""
     global _feed_client
     if _feed_client is None:
-        _feed_client = FeedClient()
+        if config.FEED_URL:
+            # Local mock server (mock_server.py)
+            from mock_server import MockFeedClient
+            _feed_client = MockFeedClient(config.FEED_URL)
+        else:
+            # Imported on first use: the SDK pulls in web3 and is slow to load
+            from avantis_trader_sdk.feed.feed_client import FeedClient
+            _feed_client = FeedClient()
     return _feed_client
 
 
+def feed_endpoint() -> str:
+    """Feed URL, the circuit breaker key."""
+    return config.FEED_URL or "avantis-feed"
+
+
+def reset_feed_client():
+    """Drop the feed client (and its connections); the next request makes a new one."""
+    global _feed_client
+    _feed_client = None
+    metrics.ENDPOINT_SWITCHES["feed"].inc()
+
+
+async def fetch_prices(pair_names: list):
+    """
+    Feed request with deadline, retries and circuit breaker, call, error and
+    latency metrics and a trace span.
+    """
+    metrics.FEED_CALLS.inc()
+    started = time.perf_counter()
+    with tracing.span("price_fetch", pair=",".join(pair_names)) as span:
+        try:
+            price_data = await resilience.call(
+                "feed", "price feed",
+                lambda: get_feed_client().get_latest_price_updates(pair_names),
+                feed_endpoint, reset_feed_client)
+        except Exception:
+            metrics.FEED_ERRORS.inc()
+            raise
+        finally:
+            metrics.FEED_LATENCY.observe(time.perf_counter() - started)
+        if len(pair_names) == 1 and price_data.parsed:
+            span.set(price=price_data.parsed[0].converted_price)
+        return price_data
+
+
+def parse_price(price_data, pair_name: str, i: int = 0) -> float:
+    """
+    The i-th price of a feed response.
+
+    Raises:
+        PriceUnavailable: Missing, zero or not a finite number
+    """
+    parsed = getattr(price_data, "parsed", None) or []
+    value = parsed[i].converted_price if i < len(parsed) else None
+    if not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        raise resilience.PriceUnavailable(pair_name, value)
+    return float(value)
+
+
 async def get_btc_price() -> float:
     """
     Get BTC/USD price from Avantis feed (same source as trading).
     This ensures TP/SL calculations match exactly.
+
+    Raises:
+        ServiceError: Feed failed or returned no valid price
     """
-    feed = get_feed_client()
-    price_data = await feed.get_latest_price_updates(["BTC/USD"])
-    return price_data.parsed[0].converted_price
+    return parse_price(await fetch_prices(["BTC/USD"]), "BTC/USD")
 
 
 async def get_pair_price(pair_name: str) -> float:
     """
     Get price for any trading pair from Avantis feed.
-    """
-    feed = get_feed_client()
-    try:
-        price_data = await feed.get_latest_price_updates([pair_name])
-        if price_data.parsed and len(price_data.parsed) > 0:
-            return price_data.parsed[0].converted_price
-    except:
-        pass
-    return 0.0
-
 
+    Raises:
+        ServiceError: Feed failed or returned no valid price
+    """
+    return parse_price(await fetch_prices([pair_name]), pair_name)
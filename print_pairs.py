@@ -1,12 +1,16 @@
 import asyncio
-from dex import get_client
+from pairs import registry
+
 
 async def main():
-    client = get_client()
-    pairs_info = await client.pairs_cache.get_pairs_info()
+    # Reads the chain and rewrites the pair cache
+    await registry.refresh()
 
     print("AVAILABLE PAIRS:")
-    for key in pairs_info.keys():
-        print(key)
+    for name in registry.names():
+        p = registry.get(name)
+        print(f"{p.index:>4}  {p.name:<12} {p.group:<12} "
+              f"spread {p.spread * 100:.3f}%  fees {p.open_fee * 100:.3f}/{p.close_fee * 100:.3f}%  "
+              f"leverage {p.min_leverage:g}-{p.max_leverage:g}x")
 
 asyncio.run(main())
@@ -0,0 +1,278 @@
+"""
+Sampling profiler for the engine's event loop thread.
+
+A background thread samples the loop every few milliseconds, so nothing
+in the engine is instrumented and the SDK, signing and feed calls show up
+as they are. Each sample is charged the wall time and the loop thread's
+CPU time since the previous one, to the current cycle and:
+
+    - the loop thread's stack (sys._current_frames), as folded stacks
+      ("a;b;c 123") ready for flamegraph.pl / speedscope; its CPU time
+      goes to every coroutine function on that stack
+    - the await chain of every live task (task coroutine -> cr_await ->
+      ...): wall time goes to every coroutine on a chain, so a coroutine
+      suspended in an await (feed, RPC, sleep) is charged while it waits,
+      not only while it runs
+
+A heartbeat scheduled on the loop detects stalls: if it is late by more
+than the threshold, the stack that is blocking the loop is logged.
+
+Enabled with PROFILE_CYCLES (settings.json "profile_cycles") or
+`python main.py --profile N`. Output goes to STATE_DIR/profiles/.
+"""
+
+import asyncio
+import inspect
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+
+import botlog
+
+log = botlog.get("profiler")
+
+SAMPLE_INTERVAL = 0.005
+HEARTBEAT_INTERVAL = 0.05
+
+# The loop waiting for I/O or timers, not work
+IDLE_MARKER = "selectors.py:"
+
+
+def _code_name(code) -> str:
+    # co_qualname is Python 3.11+
+    return f"{Path(code.co_filename).name}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _frame_name(frame) -> str:
+    return _code_name(frame.f_code)
+
+
+def _await_chain(task):
+    """
+    Coroutine names from the task's coroutine down to what it awaits,
+    or None for the task running right now (its chain is the loop
+    thread's stack: a running coroutine has no cr_await).
+    """
+    chain = []
+    coro = task.get_coro()
+    # Ends at a Future, a generator or a plain awaitable
+    while coro is not None and hasattr(coro, "cr_code") and len(chain) < 100:
+        if coro.cr_running:
+            return None
+        chain.append(_code_name(coro.cr_code))
+        coro = coro.cr_await
+    return chain
+
+
+class Cycle:
+    def __init__(self, number: int, uid: str):
+        self.number = number
+        self.uid = uid
+        self.started = time.time()
+        self.wall = Counter()
+        self.cpu = Counter()
+        self.tasks = Counter()
+        self.coroutines = Counter()
+        self.coroutines_cpu = Counter()
+        self.wall_total = 0.0
+        self.cpu_total = 0.0
+        self.outcome = ""
+
+
+class Profiler:
+    """
+    Args:
+        out_dir: Folder for the output files
+        cycles: Number of cycles to profile, then stop
+        stall_ms: Loop stall threshold in milliseconds (0 = no stall detection)
+    """
+
+    def __init__(self, out_dir, cycles: int, stall_ms: float = 100):
+        self.out_dir = Path(out_dir)
+        self.cycles = cycles
+        self.stall = stall_ms / 1000
+        self.loop = None
+        self.thread_id = None
+        self.cpu_clock = None
+        self.current = None
+        self.done = []
+        self.stalls = 0
+        self._beat = 0.0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # ----- Loop side -----
+
+    def start(self, loop):
+        """Start sampling the thread running `loop`. Call from inside the loop."""
+        self.loop = loop
+        self.thread_id = threading.get_ident()
+        try:
+            self.cpu_clock = time.pthread_getcpuclockid(self.thread_id)
+        except (AttributeError, OSError):
+            self.cpu_clock = None  # No per-thread CPU clock: CPU profile stays empty
+        self._beat = time.monotonic()
+        self.loop.call_soon(self._heartbeat)
+        threading.Thread(target=self._run, name="profiler", daemon=True).start()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        log.info(f"[PROFILE] Profiling {self.cycles} cycles to {self.out_dir}")
+
+    def _heartbeat(self):
+        self._beat = time.monotonic()
+        if not self._stop.is_set():
+            self.loop.call_later(HEARTBEAT_INTERVAL, self._heartbeat)
+
+    def begin_cycle(self, number: int, uid: str):
+        with self._lock:
+            self.current = Cycle(number, uid)
+
+    def end_cycle(self, outcome: str):
+        with self._lock:
+            cycle, self.current = self.current, None
+        if cycle is None:
+            return
+        cycle.outcome = outcome
+        self.done.append(cycle)
+        self._write_cycle(cycle)
+        if len(self.done) >= self.cycles:
+            self.stop()
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._write_summary()
+        log.info(f"[PROFILE] Done: {len(self.done)} cycles, {self.stalls} loop stalls. "
+                 f"Output in {self.out_dir}")
+
+    # ----- Sampler thread -----
+
+    def _await_chains(self) -> list:
+        try:
+            tasks = asyncio.all_tasks(self.loop)
+        except RuntimeError:
+            return []  # Task set changed while copying: skip this sample
+        return [_await_chain(task) for task in tasks]
+
+    def _cpu_now(self) -> float:
+        return time.clock_gettime(self.cpu_clock) if self.cpu_clock is not None else 0.0
+
+    def _run(self):
+        last_wall = time.perf_counter()
+        last_cpu = self._cpu_now()
+        reported_beat = None
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return  # Loop thread is gone
+            now_wall, now_cpu = time.perf_counter(), self._cpu_now()
+            wall, cpu = now_wall - last_wall, now_cpu - last_cpu
+            last_wall, last_cpu = now_wall, now_cpu
+
+            stack = []
+            coroutines = []
+            f = frame
+            while f is not None:
+                name = _frame_name(f)
+                stack.append(name)
+                if f.f_code.co_flags & inspect.CO_COROUTINE:
+                    coroutines.append(name)
+                f = f.f_back
+            stack.reverse()
+            coroutines.reverse()
+            folded = ";".join(stack)
+            idle = not coroutines and IDLE_MARKER in folded
+            chains = [coroutines if chain is None else chain for chain in self._await_chains()]
+
+            with self._lock:
+                cycle = self.current
+                if cycle is not None:
+                    key = "idle" if idle else folded
+                    cycle.wall[key] += wall
+                    cycle.cpu[key] += cpu
+                    cycle.wall_total += wall
+                    cycle.cpu_total += cpu
+                    for name in set(coroutines):
+                        cycle.coroutines_cpu[name] += cpu
+                    for chain in chains:
+                        if not chain:
+                            continue
+                        cycle.tasks[";".join(chain)] += wall
+                        for name in set(chain):
+                            cycle.coroutines[name] += wall
+
+            # Stall: the heartbeat is late and the loop is busy in this stack
+            beat = self._beat
+            late = time.monotonic() - beat - HEARTBEAT_INTERVAL
+            if self.stall and late > self.stall and beat != reported_beat and not idle:
+                reported_beat = beat
+                self.stalls += 1
+                where = "".join(traceback.format_stack(frame)[-8:])
+                log.warning(f"[PROFILE] Event loop blocked for {late * 1000:.0f} ms+ at:\n{where}",
+                            extra={"cycle_id": cycle.uid if cycle else None})
+
+    # ----- Output -----
+
+    def _write_cycle(self, cycle: Cycle):
+        base = self.out_dir / f"cycle_{cycle.number}_{cycle.uid}"
+        for suffix, counts in ((".wall.folded", cycle.wall), (".cpu.folded", cycle.cpu),
+                               (".tasks.folded", cycle.tasks)):
+            with open(f"{base}{suffix}", "w") as f:
+                for stack, seconds in counts.most_common():
+                    # flamegraph.pl wants integer weights: microseconds
+                    if seconds > 0:
+                        f.write(f"{stack} {int(seconds * 1e6)}\n")
+        log.info(f"[PROFILE] Cycle {cycle.number}: wall {cycle.wall_total:.2f}s, "
+                 f"CPU {cycle.cpu_total:.3f}s ({cycle.outcome})")
+
+    def _write_summary(self):
+        summary = {
+            "sample_interval_ms": SAMPLE_INTERVAL * 1000,
+            "stall_threshold_ms": self.stall * 1000,
+            "loop_stalls": self.stalls,
+            "cycles": [{
+                "cycle": c.number,
+                "uid": c.uid,
+                "outcome": c.outcome,
+                "wall_seconds": round(c.wall_total, 3),
+                "cpu_seconds": round(c.cpu_total, 3),
+                "idle_seconds": round(c.wall["idle"], 3),
+                "coroutines": {name: {"wall_seconds": round(s, 4),
+                                      "cpu_seconds": round(c.coroutines_cpu[name], 4)}
+                               for name, s in c.coroutines.most_common(20)},
+                "top_cpu_stacks": [{"stack": s.rsplit(";", 3)[-3:], "seconds": round(v, 4)}
+                                   for s, v in c.cpu.most_common(10) if s != "idle"],
+            } for c in self.done],
+        }
+        (self.out_dir / "summary.json").write_text(json.dumps(summary, indent=2))
+
+
+# The engine's profiler while profiling, else None
+active = None
+
+
+def start(loop, out_dir, cycles: int, stall_ms: float):
+    global active
+    active = Profiler(out_dir, cycles, stall_ms)
+    active.start(loop)
+
+
+def begin_cycle(number: int, uid: str):
+    if active is not None:
+        active.begin_cycle(number, uid)
+
+
+def end_cycle(outcome: str):
+    if active is not None:
+        active.end_cycle(outcome)
+
+
+def stop():
+    global active
+    if active is not None:
+        active.stop()
+        active = None
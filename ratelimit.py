@@ -0,0 +1,146 @@
+"""
+Process-wide token buckets for the RPC and the price feed.
+
+The engine, the GUI's price ticker and its order views all share one
+public RPC and feed, so every call through resilience.call takes a token
+from the budget of its kind first:
+
+    read    RATE_LIMIT_READ chain reads per second
+    write   RATE_LIMIT_WRITE transactions per second
+    feed    RATE_LIMIT_FEED price requests per second
+
+Buckets hold RATE_LIMIT_BURST seconds of budget. Callers are admitted by
+priority rather than in arrival order:
+
+    HIGH    order placement, cancels, closes: may borrow up to one full
+            bucket ahead, so they are not queued behind polling
+    NORMAL  engine polling: needs a whole token
+    LOW     GUI cosmetics (ticker, order view): only while at least
+            LOW_RESERVE of the bucket is left for the engine
+
+The priority follows the task (contextvar): trader methods that send
+orders are decorated with prioritized(HIGH), the GUI wraps its refreshes
+in `with priority(LOW)`. Buckets are shared by all threads and event loops,
+and so are their metrics: acquire() only updates counters and histograms
+bound up front, whose updates are locked (see metrics).
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+import metrics
+
+HIGH, NORMAL, LOW = "high", "normal", "low"
+LEVELS = (HIGH, NORMAL, LOW)
+
+# Share of the bucket LOW callers leave untouched
+LOW_RESERVE = 0.5
+
+_priority = contextvars.ContextVar("ratelimit_priority", default=NORMAL)
+
+
+class TokenBucket:
+    """
+    Args:
+        name: Budget name ("read", "write", "feed")
+        rate: Function returning tokens per second (read per call, so
+              settings apply live; 0 = unlimited)
+    """
+
+    def __init__(self, name: str, rate):
+        self.name = name
+        self.rate = rate
+        self.tokens = None
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, priority: str = NORMAL) -> float:
+        """
+        Take a token if `priority` is admitted now.
+
+        Returns:
+            0 if taken, else seconds until it may be (try again then)
+        """
+        rate = self.rate()
+        if rate <= 0:
+            return 0.0
+        capacity = max(1.0, rate * config.RATE_LIMIT_BURST)
+        with self._lock:
+            now = time.monotonic()
+            if self.tokens is None:
+                self.tokens = capacity
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+
+            if priority == HIGH:
+                floor = 1 - capacity  # Borrow up to one bucket
+            elif priority == LOW:
+                floor = 1 + capacity * LOW_RESERVE
+            else:
+                floor = 1.0
+            if self.tokens >= floor:
+                self.tokens -= 1
+                return 0.0
+            return (floor - self.tokens) / rate
+
+
+buckets = {
+    "read": TokenBucket("read", lambda: config.RATE_LIMIT_READ),
+    "write": TokenBucket("write", lambda: config.RATE_LIMIT_WRITE),
+    "feed": TokenBucket("feed", lambda: config.RATE_LIMIT_FEED),
+}
+
+# Metric children per budget and priority, so callers on any thread never
+# add label values to the shared families
+_throttled = {name: metrics.THROTTLED[name] for name in buckets}
+_throttle_wait = {name: metrics.THROTTLE_WAIT[name] for name in buckets}
+_throttled_by_priority = {level: metrics.THROTTLED_BY_PRIORITY[level] for level in LEVELS}
+
+
+async def acquire(budget: str):
+    """Wait until the current task's priority is admitted to `budget`."""
+    bucket = buckets[budget]
+    priority = _priority.get()
+    wait = bucket.take(priority)
+    if not wait:
+        return
+    _throttled[budget].inc()
+    _throttled_by_priority[priority].inc()
+    started = time.perf_counter()
+    while wait:
+        await asyncio.sleep(wait)
+        wait = bucket.take(priority)
+    _throttle_wait[budget].observe(time.perf_counter() - started)
+
+
+@contextmanager
+def priority(level: str):
+    """
+    Run the calls inside (and tasks started inside) at `level`.
+
+    Raises:
+        ValueError: Unknown level
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown priority: {level!r}")
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def prioritized(level: str):
+    """Run an async function's calls at `level`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with priority(level):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
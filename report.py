@@ -0,0 +1,294 @@
+"""
+PnL report from the trade journal (trades.db).
+
+Journal rows are exported incrementally to NumPy .npz chunks (only rows
+added since the last export), then all statistics are computed with
+vectorized NumPy aggregations over those columns.
+
+Usage:
+    python report.py                   # export new rows, report by pair/hour/params
+    python report.py --by pair --days 30
+    python report.py --no-export --json
+
+Requires numpy (pip install numpy).
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import config
+from trade_journal import connect
+
+# MSK = UTC+3, same clock as the trading hours
+MSK_OFFSET = 3 * 3600
+
+# Cycles are exported once they have ended, the other tables are append-only
+TABLES = {
+    "cycles": ("ended_at", "SELECT rowid AS id, * FROM cycles"
+                           " WHERE ended_at > ? ORDER BY ended_at"),
+    "orders": ("id", "SELECT * FROM orders WHERE id > ? ORDER BY id"),
+    "fills": ("id", "SELECT * FROM fills WHERE id > ? ORDER BY id"),
+    "closes": ("id", "SELECT * FROM closes WHERE id > ? ORDER BY id"),
+}
+
+TEXT_COLUMNS = {"uid", "cycle_uid", "wallet", "pair_name", "outcome", "direction",
+                "params_hash", "params", "action", "side", "order_type", "reason", "tx_hash"}
+
+
+def default_db_path() -> Path:
+    folder = Path(config.STATE_DIR) if config.STATE_DIR else Path(__file__).parent
+    return folder / (config.TRADE_DB or "trades.db")
+
+
+# ------------------------------------------------------------
+# EXPORT
+# ------------------------------------------------------------
+
+def to_columns(rows: list) -> dict:
+    """SQLite rows -> dict of NumPy arrays (NULL becomes nan or '')."""
+    columns = {}
+    for name in rows[0].keys():
+        values = [row[name] for row in rows]
+        if name in TEXT_COLUMNS:
+            columns[name] = np.array(["" if v is None else str(v) for v in values])
+        else:
+            columns[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return columns
+
+
+def export(db_path: Path, out_dir: Path) -> dict:
+    """
+    Append journal rows added since the last export as new .npz chunks.
+
+    Returns:
+        Number of exported rows per table
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state_file = out_dir / "export_state.json"
+    marks = json.loads(state_file.read_text()) if state_file.exists() else {}
+
+    exported = {}
+    conn = connect(db_path, readonly=True)
+    try:
+        for table, (mark_column, sql) in TABLES.items():
+            rows = conn.execute(sql, (marks.get(table, 0),)).fetchall()
+            exported[table] = len(rows)
+            if not rows:
+                continue
+            columns = to_columns(rows)
+            chunk = out_dir / f"{table}_{int(columns['id'][0]):010d}_{int(time.time())}.npz"
+            np.savez(chunk, **columns)
+            marks[table] = float(columns[mark_column][-1])
+    finally:
+        conn.close()
+
+    tmp = state_file.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(marks))
+    tmp.replace(state_file)
+    return exported
+
+
+def load_table(out_dir: Path, table: str) -> dict:
+    """Concatenate all exported chunks of a table."""
+    chunks = [np.load(path) for path in sorted(out_dir.glob(f"{table}_*.npz"))]
+    if not chunks:
+        return {}
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0].files}
+
+
+# ------------------------------------------------------------
+# STATISTICS
+# ------------------------------------------------------------
+
+def cycle_metrics(cycles: dict, fills: dict, closes: dict) -> dict:
+    """
+    Per-cycle arrays: filled, closed, net PnL and time to TP/SL.
+    Fills and closes are matched to cycles by uid with a sorted search.
+    Net PnL is nan for cycles with a close whose fees were not journaled.
+    """
+    n = len(cycles["uid"])
+    order = np.argsort(cycles["uid"])
+    sorted_uids = cycles["uid"][order]
+
+    def cycle_index(uids):
+        pos = np.clip(np.searchsorted(sorted_uids, uids), 0, max(n - 1, 0))
+        found = sorted_uids[pos] == uids if n else np.zeros(len(uids), dtype=bool)
+        return order[pos[found]], found
+
+    filled_at = np.full(n, np.inf)
+    if fills:
+        idx, found = cycle_index(fills["cycle_uid"])
+        np.minimum.at(filled_at, idx, fills["ts"][found])
+
+    m = {
+        "filled": np.isfinite(filled_at),
+        "closed": np.zeros(n, dtype=bool),
+        "net_pnl": np.zeros(n),
+        "fees": np.zeros(n),
+        "tp_time": np.zeros(n), "tp_count": np.zeros(n),
+        "sl_time": np.zeros(n), "sl_count": np.zeros(n),
+    }
+    if closes:
+        idx, found = cycle_index(closes["cycle_uid"])
+        fees = closes["fees"][found]
+        # NULL, or 0 in journals written before fees were recorded
+        unpriced = ~(fees > 0)
+        fees = np.where(unpriced, 0.0, fees)
+        net = np.nan_to_num(closes["pnl"][found]) - fees
+        m["closed"][idx] = True
+        m["net_pnl"] = np.bincount(idx, weights=net, minlength=n)
+        m["net_pnl"][np.bincount(idx, weights=unpriced.astype(float), minlength=n) > 0] = np.nan
+        m["fees"] = np.bincount(idx, weights=fees, minlength=n)
+
+        reason = closes["reason"][found]
+        held = closes["ts"][found] - filled_at[idx]
+        held = np.where(np.isfinite(held), held, 0.0)
+        for kind in ("tp", "sl"):
+            hit = (reason == kind) & (held > 0)
+            m[f"{kind}_time"] = np.bincount(idx, weights=np.where(hit, held, 0.0), minlength=n)
+            m[f"{kind}_count"] = np.bincount(idx, weights=hit.astype(float), minlength=n)
+    return m
+
+
+def group_stats(keys: np.ndarray, m: dict) -> list:
+    """Aggregate per-cycle metrics by key. One bincount per column."""
+    labels, inv = np.unique(keys, return_inverse=True)
+    k = len(labels)
+
+    def total(values):
+        return np.bincount(inv, weights=values.astype(float), minlength=k)
+
+    cycles = np.bincount(inv, minlength=k)
+    filled = total(m["filled"])
+    # Net PnL and win rate only over cycles whose fees are all known
+    priced = total(m["closed"] & np.isfinite(m["net_pnl"]))
+    unpriced = total(m["closed"]) - priced
+    wins = total(m["closed"] & (m["net_pnl"] > 0))
+    net = total(np.nan_to_num(m["net_pnl"]))
+    fees = total(m["fees"])
+    tp_count, sl_count = total(m["tp_count"]), total(m["sl_count"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tp_time = total(m["tp_time"]) / tp_count
+        sl_time = total(m["sl_time"]) / sl_count
+
+    rows = []
+    for i, label in enumerate(labels):
+        rows.append({
+            "key": label.item() if hasattr(label, "item") else label,
+            "cycles": int(cycles[i]),
+            "fill_rate": filled[i] / cycles[i],
+            "win_rate": wins[i] / priced[i] if priced[i] else None,
+            "avg_time_to_tp": None if np.isnan(tp_time[i]) else float(tp_time[i]),
+            "avg_time_to_sl": None if np.isnan(sl_time[i]) else float(sl_time[i]),
+            "fees": float(fees[i]),
+            "net_pnl": float(net[i]) if priced[i] else None,
+            "cycles_without_fees": int(unpriced[i]),
+        })
+    return rows
+
+
+def build_report(out_dir: Path, by: list, since: float = 0.0, wallet: str = None,
+                 live_only: bool = False) -> dict:
+    cycles = load_table(out_dir, "cycles")
+    if not cycles:
+        return {}
+    fills = load_table(out_dir, "fills")
+    closes = load_table(out_dir, "closes")
+
+    keep = cycles["started_at"] >= since
+    if wallet:
+        keep &= np.char.lower(cycles["wallet"]) == wallet.lower()
+    if live_only:
+        keep &= cycles["dry_run"] == 0
+    cycles = {name: col[keep] for name, col in cycles.items()}
+    if not len(cycles["uid"]):
+        return {}
+
+    m = cycle_metrics(cycles, fills, closes)
+    keys = {
+        "pair": cycles["pair_name"],
+        "hour": ((cycles["started_at"] + MSK_OFFSET) // 3600 % 24).astype(int),
+        "params": cycles["params_hash"],
+    }
+    report = {"total": group_stats(np.zeros(len(cycles["uid"]), dtype=int), m)[0]}
+    for name in by:
+        report[name] = group_stats(keys[name], m)
+    return report
+
+
+# ------------------------------------------------------------
+# OUTPUT
+# ------------------------------------------------------------
+
+def fmt_pct(value) -> str:
+    return "-" if value is None else f"{value*100:.1f}%"
+
+
+def fmt_time(seconds) -> str:
+    if seconds is None:
+        return "-"
+    return f"{seconds/60:.1f}m" if seconds < 3600 else f"{seconds/3600:.1f}h"
+
+
+def print_report(report: dict):
+    headers = ("", "Cycles", "Filled", "Win", "To TP", "To SL", "Fees", "Net PnL")
+    line = "{:<16}{:>8}{:>9}{:>9}{:>9}{:>9}{:>10}{:>12}"
+    for name, rows in report.items():
+        rows = rows if isinstance(rows, list) else [dict(rows, key="all")]
+        print(f"\n{name.upper()}")
+        print(line.format(*headers))
+        for r in rows:
+            key = f"{r['key']}:00" if name == "hour" else str(r["key"])
+            print(line.format(
+                key[:15], r["cycles"], fmt_pct(r["fill_rate"]), fmt_pct(r["win_rate"]),
+                fmt_time(r["avg_time_to_tp"]), fmt_time(r["avg_time_to_sl"]),
+                f"{r['fees']:.2f}", "-" if r["net_pnl"] is None else f"{r['net_pnl']:+.2f}"
+            ))
+    unpriced = report["total"]["cycles_without_fees"]
+    if unpriced:
+        print(f"\nNet PnL and win rate leave out {unpriced} closed cycles without journaled fees")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PnL report from the trade journal")
+    parser.add_argument("--db", default=str(default_db_path()), help="Path to trades.db")
+    parser.add_argument("--out", help="Export folder (default: analytics/ next to the db)")
+    parser.add_argument("--by", nargs="+", choices=("pair", "hour", "params"),
+                        default=["pair", "hour", "params"], help="Groupings to report")
+    parser.add_argument("--days", type=float, help="Only cycles started in the last N days")
+    parser.add_argument("--wallet", help="Only this wallet")
+    parser.add_argument("--live", action="store_true", help="Skip dry-run cycles")
+    parser.add_argument("--no-export", action="store_true", help="Report from existing export only")
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    out_dir = Path(args.out) if args.out else db_path.parent / "analytics"
+
+    if not args.no_export:
+        if not db_path.exists():
+            parser.error(f"{db_path} not found")
+        exported = export(db_path, out_dir)
+        if not args.json:
+            print("Exported: " + ", ".join(f"{t} +{n}" for t, n in exported.items()))
+
+    since = time.time() - args.days * 86400 if args.days else 0.0
+    start = time.perf_counter()
+    report = build_report(out_dir, args.by, since, args.wallet, args.live)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif not report:
+        print("No finished cycles yet")
+    else:
+        print_report(report)
+        print(f"\nComputed in {elapsed*1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
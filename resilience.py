@@ -0,0 +1,242 @@
+"""
+Deadlines, retries and circuit breaking for feed and chain calls.
+
+Every call goes through call() with a deadline per kind:
+
+    feed    FEED_TIMEOUT per price request
+    read    RPC_READ_TIMEOUT per chain read (trades, nonce, gas, building a tx)
+    write   TX_TIMEOUT to sign, send and confirm a transaction
+
+Transient failures (timeouts, connection errors, HTTP 429/5xx) of feed and
+read calls are retried CALL_RETRIES times with jittered exponential
+backoff, then once more on the next endpoint (RPC_FALLBACK_URLS, a fresh
+feed client). Writes are never retried: a transaction that failed on the
+way back may still be mined.
+
+Each endpoint has a circuit breaker: after BREAKER_FAILURES transient
+failures in a row it fails calls at once for BREAKER_COOLDOWN seconds,
+then lets one trial call through.
+
+Every attempt first takes a token from the kind's rate limit budget
+(ratelimit.py).
+
+Callers get the result or a ServiceError subclass, never a placeholder
+value. Errors that are not transient (reverts, bad arguments) are raised
+as they are, without retries.
+"""
+
+import asyncio
+import random
+import time
+from urllib.parse import urlparse
+
+import botlog
+import config
+import metrics
+import ratelimit
+
+log = botlog.get("resilience")
+
+# Lower-cased fragments of error messages worth a retry
+TRANSIENT_MARKERS = ("429", "too many requests", "rate limit", "502", "503", "504",
+                     "timeout", "timed out", "temporarily", "connection", "disconnected")
+
+# Libraries whose exceptions are all network errors
+TRANSIENT_MODULES = ("aiohttp", "requests", "urllib3", "httpx", "websockets")
+
+
+# ----- Errors -----
+
+class ServiceError(Exception):
+    """A feed or chain call failed; nothing usable was returned."""
+
+    def __init__(self, kind: str, op: str, message: str):
+        super().__init__(f"{op}: {message}")
+        self.kind = kind
+        self.op = op
+
+
+class CallTimeout(ServiceError, TimeoutError):
+    """The call missed its deadline on every attempt."""
+
+    def __init__(self, kind: str, op: str, timeout: float):
+        super().__init__(kind, op, f"timed out after {timeout:g}s")
+
+
+class EndpointUnavailable(ServiceError):
+    """Transient failures (connection, 429, 5xx) on every attempt."""
+
+
+class CircuitOpen(ServiceError):
+    """The endpoint's circuit breaker is open: not called at all."""
+
+
+class PriceUnavailable(ServiceError):
+    """The feed answered without a valid price for the pair."""
+
+    def __init__(self, pair_name: str, value=None):
+        super().__init__("feed", "price", f"no valid price for {pair_name} (got {value!r})")
+        self.pair_name = pair_name
+
+
+def is_transient(error: Exception) -> bool:
+    """Worth retrying: the endpoint, not the request, is the problem."""
+    if isinstance(error, (ConnectionError, TimeoutError, OSError)):
+        return True
+    if type(error).__module__.split(".")[0] in TRANSIENT_MODULES:
+        return True
+    text = str(error).lower()
+    return any(marker in text for marker in TRANSIENT_MARKERS)
+
+
+def host(url: str) -> str:
+    """Endpoint for logs: RPC URLs often carry an API key in the path."""
+    return urlparse(url).netloc or url
+
+
+def deadline(kind: str) -> float:
+    """Seconds allowed for one call of `kind` (0 = no deadline)."""
+    if kind == "feed":
+        return config.FEED_TIMEOUT
+    if kind == "read":
+        return config.RPC_READ_TIMEOUT
+    return config.TX_TIMEOUT
+
+
+def backoff(attempt: int) -> float:
+    """Delay before retry `attempt` (1, 2, ...): exponential, half of it jittered."""
+    delay = min(config.RETRY_BACKOFF_MAX, config.RETRY_BACKOFF * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# ----- Circuit breaker -----
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. Opens after BREAKER_FAILURES transient
+    failures in a row; after BREAKER_COOLDOWN one trial call is let
+    through (half open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, target: str, endpoint: str):
+        self.target = target
+        self.endpoint = endpoint
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= config.BREAKER_COOLDOWN:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial:
+            self.trial = True
+            return True
+        return False
+
+    def success(self):
+        if self.opened_at is not None:
+            log.info(f"[CIRCUIT] {self.target} {host(self.endpoint)} closed")
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.trial or (self.opened_at is None and self.failures >= config.BREAKER_FAILURES):
+            self.opened_at = time.monotonic()
+            self.trial = False
+            metrics.CIRCUIT_OPENS[self.target].inc()
+            log.warning(f"[CIRCUIT] {self.target} {host(self.endpoint)} open after "
+                        f"{self.failures} failures, retry in {config.BREAKER_COOLDOWN:g}s")
+
+
+_breakers = {}
+
+
+def breaker(target: str, endpoint: str) -> CircuitBreaker:
+    key = (target, endpoint)
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker(target, endpoint)
+    return _breakers[key]
+
+
+# ----- Calls -----
+
+async def call(kind: str, op: str, make, endpoint=None, switch=None):
+    """
+    Await make() with the deadline, retries and breaker for `kind`.
+
+    Args:
+        kind: "feed", "read" or "write"
+        op: Call name for logs
+        make: Function returning a fresh awaitable per attempt (so an
+              attempt after switch() goes to the new endpoint)
+        endpoint: Function returning the current endpoint URL (breaker key)
+        switch: Moves to another endpoint before the last attempt
+
+    Returns:
+        The call's result
+
+    Raises:
+        ServiceError: CallTimeout, EndpointUnavailable or CircuitOpen
+        Exception: Non-transient errors of the call itself
+    """
+    target = "feed" if kind == "feed" else "rpc"
+    timeout = deadline(kind)
+    retries = 0 if kind == "write" else config.CALL_RETRIES
+    # Writes stay on their endpoint: the nonce and receipt belong to it
+    can_switch = switch is not None and kind != "write"
+    attempt = 0
+
+    while True:
+        url = endpoint() if endpoint else target
+        circuit = breaker(target, url)
+        if not circuit.allow():
+            metrics.CIRCUIT_REJECTED[target].inc()
+            raise CircuitOpen(kind, op, f"{target} {host(url)} circuit open")
+
+        # Budget per attempt: retries cost requests too (not part of the deadline)
+        await ratelimit.acquire(kind)
+        try:
+            if timeout:
+                result = await asyncio.wait_for(make(), timeout)
+            else:
+                result = await make()
+        except asyncio.TimeoutError:
+            metrics.CALL_TIMEOUTS[kind].inc()
+            error = CallTimeout(kind, op, timeout)
+        except Exception as e:
+            if not is_transient(e):
+                # The endpoint answered: a revert or bad request is not its failure
+                circuit.success()
+                raise
+            error = e
+        else:
+            circuit.success()
+            return result
+
+        circuit.failure()
+        log.warning(f"[RETRY] {op} failed on {host(url)} (attempt {attempt + 1}): {error}")
+        if attempt < retries:
+            attempt += 1
+            metrics.CALL_RETRIES[kind].inc()
+            await asyncio.sleep(backoff(attempt))
+            continue
+        if can_switch:
+            # Last try on another endpoint, no wait
+            can_switch = False
+            metrics.CALL_RETRIES[kind].inc()
+            switch()
+            continue
+        if isinstance(error, CallTimeout):
+            raise error
+        raise EndpointUnavailable(kind, op, f"{type(error).__name__}: {error}") from error
@@ -0,0 +1,76 @@
+"""
+Adaptive polling: check often when price is near a trigger, rarely when far.
+"""
+
+import math
+import random
+import time
+
+import config
+import metrics
+
+# Per-second volatility used until enough prices were seen (~2% a day)
+DEFAULT_VOLATILITY = 0.02 / math.sqrt(86400)
+
+
+class PollScheduler:
+    """
+    Picks the next check interval from the distance to the nearest level
+    (entry, TP, SL, reposition bounds) and recent volatility (a
+    strategy.RealizedVolatility fed by the engine).
+
+    Price diffusion reaches a relative distance d in roughly (d / sigma)^2
+    seconds, so the interval is a fraction of that, clamped between
+    CHECK_INTERVAL_FAST and CHECK_INTERVAL_MAX. POLL_BUDGET_PER_MIN caps
+    the average rate and allows short bursts near a trigger.
+    """
+
+    # Part of the expected time to the level we are willing to wait
+    SAFETY = 0.2
+
+    def __init__(self, volatility):
+        self.volatility = volatility
+        # Token bucket for the poll budget
+        self._tokens = None
+        self._tokens_at = 0.0
+
+    def next_interval(self, price: float, levels: list, now: float = None) -> float:
+        """
+        Seconds until the next check.
+
+        Args:
+            price: Current price
+            levels: Prices that trigger an action (zeros are ignored)
+        """
+        now = time.time() if now is None else now
+        fast = min(config.CHECK_INTERVAL_FAST, config.CHECK_INTERVAL_MAX)
+        slow = config.CHECK_INTERVAL_MAX
+
+        levels = [level for level in levels if level]
+        if price > 0 and levels:
+            distance = min(abs(price - level) for level in levels) / price
+            metrics.TRIGGER_DISTANCE.set(distance)
+            sigma = self.volatility.per_second() if self.volatility.ready else DEFAULT_VOLATILITY
+            sigma = max(sigma, 1e-12)  # Flat prices: as slow as allowed
+            expected = (distance / sigma) ** 2
+            interval = min(max(self.SAFETY * expected, fast), slow)
+        else:
+            interval = random.uniform(config.CHECK_INTERVAL_MIN, slow)
+        # Keep checks irregular
+        interval *= random.uniform(0.8, 1.2)
+
+        # Budget: refill at POLL_BUDGET_PER_MIN per minute, burst of a quarter of it
+        rate = config.POLL_BUDGET_PER_MIN / 60
+        burst = max(1.0, config.POLL_BUDGET_PER_MIN / 4)
+        if self._tokens is None:
+            self._tokens = burst
+        else:
+            self._tokens = min(burst, self._tokens + (now - self._tokens_at) * rate)
+
+        # The check happens after `interval`: make sure a token is there by then
+        available = self._tokens + interval * rate
+        if available < 1:
+            interval += (1 - available) / rate
+        self._tokens = min(burst, self._tokens + interval * rate) - 1
+        self._tokens_at = now + interval
+        return interval
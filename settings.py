@@ -0,0 +1,441 @@
+"""
+settings.json handling shared by the GUI and the headless daemon.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import botlog
+
+log = botlog.get("settings")
+
+SETTINGS_FILE = Path(__file__).parent / "settings.json"
+
+# 2: take_profit_pnl / stop_loss_pnl are percent (version 1 and the old
+#    terminal app stored fractions: 0.80 = 80%)
+SETTINGS_VERSION = 2
+
+DEFAULT_SETTINGS = {
+    "settings_version": SETTINGS_VERSION,
+    "rpc_url": "https://mainnet.base.org",
+    "rpc_fallback_urls": [],
+    "feed_url": "",
+    "private_key": "",
+    "license_key": "",
+    "dry_run": True,
+    "sim_exchange": True,
+    "sim_latency": 2.0,
+    "sim_open_fee": 0.06,
+    "sim_close_fee": 0.06,
+    "pair_name": "BTC/USD",
+    "pair_index": 1,
+    "position_size": 10.0,
+    "leverage": 75,
+    "take_profit_pnl": 80,
+    "stop_loss_pnl": 80,
+    "cost_aware_tpsl": False,
+    "hold_hours": 4,
+    "entry_offset_min": 0.25,
+    "entry_offset_max": 1.0,
+    "reposition_threshold": 1.0,
+    "reposition_random": 0.2,
+    "grid_levels": 1,
+    "adaptive_entry": False,
+    "volatility_window": 60,
+    "offset_vol_mult": 1.0,
+    "reposition_vol_mult": 2.0,
+    "reposition_min": 0.3,
+    "reposition_max": 3.0,
+    "deposit_variance": 5.0,
+    "deposit_step": 0.5,
+    "check_interval_min": 10,
+    "check_interval_max": 30,
+    "check_interval_fast": 2,
+    "poll_budget_per_min": 12,
+    "trading_start_hour": 13,
+    "trading_end_hour": 4,
+    "trading_variance": 15,
+    "trading_schedule": {},
+    "trading_holidays": [],
+    "metrics_port": 0,
+    "profile_cycles": 0,
+    "stall_threshold_ms": 100,
+    "trace_endpoint": "",
+    "feed_timeout": 10,
+    "rpc_read_timeout": 20,
+    "tx_timeout": 180,
+    "call_retries": 2,
+    "retry_backoff": 0.5,
+    "retry_backoff_max": 8,
+    "breaker_failures": 5,
+    "breaker_cooldown": 30,
+    "watchdog_timeout": 300,
+    "rate_limit_read": 10,
+    "rate_limit_write": 2,
+    "rate_limit_feed": 5,
+    "rate_limit_burst": 2,
+}
+
+
+def merge_defaults(raw: dict) -> dict:
+    """Fill missing keys from defaults and rename legacy keys."""
+    raw = dict(raw)
+    # settings.example.json and the old terminal app used this name
+    if "trading_hours_variance" in raw:
+        raw.setdefault("trading_variance", raw.pop("trading_hours_variance"))
+    if raw.get("settings_version", 1) < 2:
+        # No TP/SL of 1% or less makes sense at these leverages: read as fractions
+        for key in ("take_profit_pnl", "stop_loss_pnl"):
+            value = raw.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and 0 < value <= 1:
+                raw[key] = round(value * 100, 6)
+                log.warning(f"[SETTINGS] {key}: legacy fraction {value} read as {raw[key]:g}%")
+    raw["settings_version"] = SETTINGS_VERSION
+    return {**DEFAULT_SETTINGS, **raw}
+
+
+def load_settings(path: Path = SETTINGS_FILE) -> dict:
+    """Load settings from file merged over defaults."""
+    path = Path(path)
+    if path.exists():
+        try:
+            with open(path) as f:
+                return merge_defaults(json.load(f))
+        except:
+            pass
+    return DEFAULT_SETTINGS.copy()
+
+
+def save_settings(settings: dict, path: Path = SETTINGS_FILE):
+    # Write then rename, so a watching engine never reads a half-written file
+    path = Path(path)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(settings, f, indent=2)
+    os.replace(tmp, path)
+
+
+def apply_settings_to_config(settings: dict):
+    """
+    Copy settings into the config module.
+    Percent values in settings.json become fractions in config.
+    """
+    import config
+    config.RPC_URL = settings["rpc_url"]
+    config.RPC_FALLBACK_URLS = settings.get("rpc_fallback_urls") or []
+    config.FEED_URL = settings.get("feed_url", "")
+    config.PRIVATE_KEY = settings["private_key"]
+    config.DRY_RUN = settings["dry_run"]
+    config.SIM_EXCHANGE = settings.get("sim_exchange", True)
+    config.SIM_LATENCY = settings.get("sim_latency", 2.0)
+    config.SIM_OPEN_FEE = settings.get("sim_open_fee", 0.06) / 100
+    config.SIM_CLOSE_FEE = settings.get("sim_close_fee", 0.06) / 100
+    config.PAIR_NAME = settings["pair_name"]
+    config.PAIR_INDEX = settings["pair_index"]
+    config.POSITION_SIZE_USDC = settings["position_size"]
+    config.LEVERAGE = settings["leverage"]
+    config.TAKE_PROFIT_PNL = settings["take_profit_pnl"] / 100
+    config.STOP_LOSS_PNL = settings["stop_loss_pnl"] / 100
+    config.COST_AWARE_TPSL = settings.get("cost_aware_tpsl", False)
+    config.HOLD_HOURS = settings.get("hold_hours", 4)
+    config.ENTRY_OFFSET_MIN = settings["entry_offset_min"] / 100
+    config.ENTRY_OFFSET_MAX = settings["entry_offset_max"] / 100
+    config.REPOSITION_THRESHOLD_PCT = settings["reposition_threshold"] / 100
+    config.REPOSITION_RANDOM = settings.get("reposition_random", 0.2) / 100
+    config.GRID_LEVELS = settings.get("grid_levels", 1)
+    config.ADAPTIVE_ENTRY = settings.get("adaptive_entry", False)
+    config.VOLATILITY_WINDOW = settings.get("volatility_window", 60)
+    config.OFFSET_VOL_MULT = settings.get("offset_vol_mult", 1.0)
+    config.REPOSITION_VOL_MULT = settings.get("reposition_vol_mult", 2.0)
+    config.REPOSITION_MIN = settings.get("reposition_min", 0.3) / 100
+    config.REPOSITION_MAX = settings.get("reposition_max", 3.0) / 100
+    config.DEPOSIT_VARIANCE = settings.get("deposit_variance", 5.0) / 100
+    config.DEPOSIT_STEP = settings.get("deposit_step", 0.5)
+    config.CHECK_INTERVAL_MIN = settings["check_interval_min"]
+    config.CHECK_INTERVAL_MAX = settings["check_interval_max"]
+    config.CHECK_INTERVAL_FAST = settings.get("check_interval_fast", 2)
+    config.POLL_BUDGET_PER_MIN = settings.get("poll_budget_per_min", 12)
+    config.TRADING_START_HOUR = settings["trading_start_hour"]
+    config.TRADING_END_HOUR = settings["trading_end_hour"]
+    config.TRADING_HOURS_VARIANCE = settings.get("trading_variance", 15)
+    config.TRADING_SCHEDULE = settings.get("trading_schedule") or {}
+    config.TRADING_HOLIDAYS = settings.get("trading_holidays") or []
+    config.METRICS_PORT = settings.get("metrics_port", 0)
+    config.PROFILE_CYCLES = settings.get("profile_cycles", 0)
+    config.STALL_THRESHOLD_MS = settings.get("stall_threshold_ms", 100)
+    config.TRACE_ENDPOINT = settings.get("trace_endpoint", "")
+    config.FEED_TIMEOUT = settings.get("feed_timeout", 10)
+    config.RPC_READ_TIMEOUT = settings.get("rpc_read_timeout", 20)
+    config.TX_TIMEOUT = settings.get("tx_timeout", 180)
+    config.CALL_RETRIES = settings.get("call_retries", 2)
+    config.RETRY_BACKOFF = settings.get("retry_backoff", 0.5)
+    config.RETRY_BACKOFF_MAX = settings.get("retry_backoff_max", 8)
+    config.BREAKER_FAILURES = settings.get("breaker_failures", 5)
+    config.BREAKER_COOLDOWN = settings.get("breaker_cooldown", 30)
+    config.WATCHDOG_TIMEOUT = settings.get("watchdog_timeout", 300)
+    config.RATE_LIMIT_READ = settings.get("rate_limit_read", 10)
+    config.RATE_LIMIT_WRITE = settings.get("rate_limit_write", 2)
+    config.RATE_LIMIT_FEED = settings.get("rate_limit_feed", 5)
+    config.RATE_LIMIT_BURST = settings.get("rate_limit_burst", 2)
+
+    # The pair registry follows the chain: the saved index may be outdated
+    from pairs import registry
+    if config.PAIR_NAME in registry:
+        config.PAIR_INDEX = registry.get(config.PAIR_NAME).index
+
+
+# ------------------------------------------------------------
+# VALIDATION & HOT RELOAD
+# ------------------------------------------------------------
+
+# Need a new trader / explicit user decision: never applied live
+RESTART_KEYS = {"rpc_url", "rpc_fallback_urls", "feed_url", "private_key", "dry_run", "license_key", "sim_exchange",
+                "metrics_port", "profile_cycles", "stall_threshold_ms"}
+
+# Shape the orders of a cycle: applied only when a new cycle starts
+CYCLE_KEYS = {
+    "pair_name", "pair_index", "position_size", "leverage",
+    "take_profit_pnl", "stop_loss_pnl", "cost_aware_tpsl", "hold_hours", "entry_offset_min", "entry_offset_max",
+    "reposition_threshold", "reposition_random", "deposit_variance", "deposit_step",
+    "grid_levels", "adaptive_entry", "offset_vol_mult", "reposition_vol_mult", "reposition_min", "reposition_max",
+}
+
+# (min, max) for numeric settings, None = unbounded
+RANGES = {
+    "pair_index": (0, None),
+    "position_size": (0.01, None),
+    "leverage": (1, 150),
+    "take_profit_pnl": (0.01, None),
+    "hold_hours": (0, 720),
+    "stop_loss_pnl": (0.01, 100),
+    "entry_offset_min": (0, 50),
+    "entry_offset_max": (0, 50),
+    "reposition_threshold": (0.01, 50),
+    "reposition_random": (0, 50),
+    "grid_levels": (1, 10),
+    "sim_latency": (0, 60),
+    "sim_open_fee": (0, 5),
+    "sim_close_fee": (0, 5),
+    "volatility_window": (1, 1440),
+    "offset_vol_mult": (0, 100),
+    "reposition_vol_mult": (0, 100),
+    "reposition_min": (0.01, 50),
+    "reposition_max": (0.01, 50),
+    "deposit_variance": (0, 50),
+    "deposit_step": (0.01, None),
+    "check_interval_min": (0.1, None),
+    "check_interval_max": (0.1, None),
+    "check_interval_fast": (0.1, None),
+    "poll_budget_per_min": (1, 600),
+    "trading_start_hour": (0, 23),
+    "trading_end_hour": (0, 24),
+    "trading_variance": (0, 120),
+    "metrics_port": (0, 65535),
+    "profile_cycles": (0, 10000),
+    "stall_threshold_ms": (0, 60000),
+    "feed_timeout": (1, 600),
+    "rpc_read_timeout": (1, 600),
+    "tx_timeout": (10, 3600),
+    "call_retries": (0, 10),
+    "retry_backoff": (0, 60),
+    "retry_backoff_max": (0, 600),
+    "breaker_failures": (1, 100),
+    "breaker_cooldown": (1, 3600),
+    "watchdog_timeout": (0, 86400),
+    "rate_limit_read": (0, 1000),
+    "rate_limit_write": (0, 1000),
+    "rate_limit_feed": (0, 1000),
+    "rate_limit_burst": (0.1, 60),
+}
+
+
+def validate_settings(settings: dict) -> list:
+    """
+    Check types and ranges.
+
+    Returns:
+        List of error messages (empty if valid)
+    """
+    errors = []
+    for key, (low, high) in RANGES.items():
+        value = settings.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{key}: expected a number, got {value!r}")
+            continue
+        if low is not None and value < low:
+            errors.append(f"{key}: {value} < {low}")
+        if high is not None and value > high:
+            errors.append(f"{key}: {value} > {high}")
+
+    for key in ("dry_run", "sim_exchange", "adaptive_entry", "cost_aware_tpsl"):
+        if not isinstance(settings.get(key), bool):
+            errors.append(f"{key}: expected true/false")
+    if not isinstance(settings.get("pair_name"), str) or not settings.get("pair_name"):
+        errors.append("pair_name: expected a pair name")
+    else:
+        from pairs import registry
+        # The built-in table may lack new listings: only trust one read from chain
+        if settings["pair_name"] not in registry and registry.source != "builtin":
+            errors.append(f"pair_name: unknown pair {settings['pair_name']}")
+    if not str(settings.get("rpc_url", "")).startswith(("http://", "https://")):
+        errors.append("rpc_url: expected an http(s) URL")
+    fallbacks = settings.get("rpc_fallback_urls", [])
+    if not isinstance(fallbacks, list) or not all(
+            isinstance(url, str) and url.startswith(("http://", "https://")) for url in fallbacks):
+        errors.append("rpc_fallback_urls: expected a list of http(s) URLs")
+    for key in ("feed_url", "trace_endpoint"):
+        url = str(settings.get(key, ""))
+        if url and not url.startswith(("http://", "https://")):
+            errors.append(f"{key}: expected an http(s) URL or empty")
+    errors += validate_calendar(settings.get("trading_schedule"), settings.get("trading_holidays"))
+
+    if not errors:
+        if settings["entry_offset_max"] < settings["entry_offset_min"]:
+            errors.append("entry_offset_max is below entry_offset_min")
+        if settings["reposition_max"] < settings["reposition_min"]:
+            errors.append("reposition_max is below reposition_min")
+        if settings["check_interval_max"] < settings["check_interval_min"]:
+            errors.append("check_interval_max is below check_interval_min")
+        for key in ("leverage", "grid_levels"):
+            if settings[key] != int(settings[key]):
+                errors.append(f"{key}: expected a whole number")
+    return errors
+
+
+def validate_calendar(schedule, holidays) -> list:
+    """Check trading_schedule ({"mon": [start, end] or null}) and trading_holidays."""
+    from datetime import date
+    from trading_calendar import WEEKDAYS
+
+    errors = []
+    if not isinstance(schedule, dict):
+        return ["trading_schedule: expected an object"]
+    for day, hours in schedule.items():
+        if day not in WEEKDAYS:
+            errors.append(f"trading_schedule: unknown weekday {day!r}")
+        elif hours is not None and not (
+                isinstance(hours, list) and len(hours) == 2
+                and all(isinstance(h, (int, float)) and not isinstance(h, bool) for h in hours)
+                and 0 <= hours[0] <= 23 and 0 <= hours[1] <= 24):
+            errors.append(f"trading_schedule.{day}: expected [start_hour, end_hour] or null")
+
+    if not isinstance(holidays, list):
+        return errors + ["trading_holidays: expected a list of dates"]
+    for day in holidays:
+        try:
+            date.fromisoformat(day)
+        except (TypeError, ValueError):
+            errors.append(f"trading_holidays: bad date {day!r} (expected YYYY-MM-DD)")
+    return errors
+
+
+class SettingsWatcher:
+    """
+    Polls settings.json mtime and stages validated changes.
+
+    The engine applies staged changes at safe points with apply_pending():
+    CYCLE_KEYS only between cycles, the rest at any check, RESTART_KEYS never.
+
+    overrides (e.g. {"profile_cycles": 5} from --profile) win over the file
+    on every reload, so applying new settings never drops them.
+    """
+
+    def __init__(self, path: Path = SETTINGS_FILE, poll_interval: float = 2.0, overrides: dict = None):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.overrides = dict(overrides or {})
+        self.applied = {**load_settings(self.path), **self.overrides}
+        self.pending = None
+        self._stamp = self._file_stamp()
+
+    def _file_stamp(self):
+        try:
+            st = self.path.stat()
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def poll(self) -> bool:
+        """
+        Reload the file if it changed.
+
+        Returns:
+            True if new valid settings were staged
+        """
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+
+        try:
+            with open(self.path) as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            # Half-written file or bad JSON: keep current settings
+            log.warning(f"[SETTINGS] Ignoring unreadable settings.json: {e}")
+            return False
+
+        if not isinstance(raw, dict):
+            log.warning("[SETTINGS] Ignoring settings.json: expected a JSON object")
+            return False
+
+        new = {**merge_defaults(raw), **self.overrides}
+        errors = validate_settings(new)
+        if errors:
+            log.warning(f"[SETTINGS] Rejected settings.json: {'; '.join(errors)}")
+            return False
+
+        if new == self.applied:
+            self.pending = None
+            return False
+
+        skipped = sorted(k for k in RESTART_KEYS if new.get(k) != self.applied.get(k))
+        if skipped:
+            log.info(f"[SETTINGS] Restart required for: {', '.join(skipped)}")
+        self.pending = new
+        return True
+
+    def apply_pending(self, cycle_boundary: bool = False) -> list:
+        """
+        Apply staged settings to config in one step.
+
+        Args:
+            cycle_boundary: True between cycles, so CYCLE_KEYS may change too
+
+        Returns:
+            Names of the settings that changed
+        """
+        if self.pending is None:
+            return []
+
+        merged = dict(self.applied)
+        changed = []
+        for key, value in self.pending.items():
+            if key in RESTART_KEYS or merged.get(key) == value:
+                continue
+            if key in CYCLE_KEYS and not cycle_boundary:
+                continue
+            merged[key] = value
+            changed.append(key)
+
+        if changed:
+            apply_settings_to_config(merged)
+            self.applied = merged
+            log.info(f"[SETTINGS] Applied: {', '.join(sorted(changed))}")
+
+        # Keep staged values that still wait for a cycle boundary
+        waiting = any(
+            self.pending.get(k) != merged.get(k) for k in CYCLE_KEYS
+        )
+        if not waiting:
+            self.pending = None
+        return changed
+
+    async def watch(self, on_change=None):
+        """Poll forever; call on_change() when new settings are staged."""
+        import asyncio
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self.poll() and on_change:
+                on_change()
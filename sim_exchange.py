@@ -0,0 +1,263 @@
+"""
+In-process simulated exchange for dry runs and backtests.
+
+SimExchange has the AvantisTrader interface, so the engine runs its live
+code paths against it. Orders rest in a local book and are triggered by
+the price feed (or any price source passed in):
+
+    LIMIT       LONG fills at price <= limit, SHORT at price >= limit
+    STOP_LIMIT  LONG fills at price >= limit, SHORT at price <= limit
+
+Open positions close at their TP or SL. Opening and closing fees are
+charged on position size, and every transaction waits a simulated
+confirmation latency.
+"""
+
+import asyncio
+import itertools
+import random
+import time
+
+import botlog
+import config
+import tracing
+from orderbook import OrderBook
+from resilience import ServiceError
+from strategy import calc_pnl_pct
+from trader import AvantisTrader, order_type_name
+
+log = botlog.get("sim")
+
+
+class SimOrder:
+    """Pending order, attribute names as in the SDK."""
+
+    def __init__(self, pair_index, trade_index, buy, price, leverage, collateral, tp, sl, order_type):
+        self.pair_index = pair_index
+        self.trade_index = trade_index
+        self.buy = buy
+        self.price = price
+        self.leverage = leverage
+        self.open_collateral = collateral
+        self.tp = tp
+        self.sl = sl
+        self.order_type = order_type
+
+
+class SimTrade:
+    """Open position, attribute names as in the SDK."""
+
+    def __init__(self, order: SimOrder, open_fee: float):
+        self.pair_index = order.pair_index
+        self.trade_index = order.trade_index
+        self.buy = order.buy
+        self.open_price = order.price
+        self.leverage = order.leverage
+        self.collateral_in_trade = order.open_collateral - open_fee
+        self.tp = order.tp
+        self.sl = order.sl
+        self.opened_at = time.time()
+
+
+class SimExchange(AvantisTrader):
+    """
+    AvantisTrader stand-in that never touches the chain.
+
+    Args:
+        price_source: async fn(pair_name) -> price, defaults to the Avantis feed
+        balance: Starting USDC balance
+    """
+
+    def __init__(self, private_key: str = "", price_source=None, balance: float = 1000.0):
+        self.wallet = wallet_address(private_key)
+        self.gas_used = {}
+        self.book = OrderBook()
+        self.balance = balance
+        self.fees_paid = 0.0
+        self.realized_pnl = 0.0
+        # Closed trades: (trade, close_price, reason, pnl after fees)
+        self.history = []
+        self.orders = {}
+        self.trades = {}
+        self._price_source = price_source
+        self._indexes = itertools.count()
+        self._tx = itertools.count(1)
+        log.info(f"[SIM] Simulated exchange, wallet {self.wallet}, balance {balance:.2f} USDC")
+
+    # ----- Helpers -----
+
+    async def _confirm(self):
+        """Wait a simulated block confirmation."""
+        latency = config.SIM_LATENCY
+        if latency > 0:
+            await asyncio.sleep(random.uniform(0.5 * latency, 1.5 * latency))
+
+    def _tx_hash(self) -> str:
+        tx_hash = f"0x{next(self._tx):064x}"
+        self.gas_used[tx_hash] = 0
+        return tx_hash
+
+    async def _price(self, pair_index: int) -> float:
+        if self._price_source is None:
+            from price import get_pair_price
+            self._price_source = get_pair_price
+        return await self._price_source(pair_name_for(pair_index))
+
+    @staticmethod
+    def _triggered(order: SimOrder, price: float) -> bool:
+        rising = (order.order_type == "LIMIT") != order.buy
+        return price >= order.price if rising else price <= order.price
+
+    def _close(self, trade: SimTrade, close_price: float, reason: str):
+        size = trade.collateral_in_trade * trade.leverage
+        fee = size * config.SIM_CLOSE_FEE
+        pnl = calc_pnl_pct(trade.open_price, close_price, trade.leverage, trade.buy)
+        # Losses are capped at the collateral (liquidation)
+        pnl_usdc = max(pnl * trade.collateral_in_trade, -trade.collateral_in_trade) - fee
+        self.balance += trade.collateral_in_trade + pnl_usdc
+        self.fees_paid += fee
+        self.realized_pnl += pnl_usdc
+        self.history.append((trade, close_price, reason, pnl_usdc))
+        del self.trades[(trade.pair_index, trade.trade_index)]
+        side = "LONG" if trade.buy else "SHORT"
+        log.info(f"[SIM] {side} #{trade.trade_index} closed by {reason.upper()} at "
+                 f"${close_price:.2f}: {pnl_usdc:+.2f} USDC", extra={"side": side})
+
+    async def step(self):
+        """Fetch prices and execute triggered orders and TP/SL."""
+        pairs = {key[0] for key in self.orders} | {key[0] for key in self.trades}
+        for pair_index in pairs:
+            try:
+                price = await self._price(pair_index)
+            except ServiceError as e:
+                log.warning(f"[SIM] {e}")
+                continue
+            if not price:
+                continue
+
+            for key, order in list(self.orders.items()):
+                if key[0] == pair_index and self._triggered(order, price):
+                    fee = order.open_collateral * order.leverage * config.SIM_OPEN_FEE
+                    self.fees_paid += fee
+                    self.realized_pnl -= fee
+                    del self.orders[key]
+                    self.trades[key] = SimTrade(order, fee)
+                    side = "LONG" if order.buy else "SHORT"
+                    log.info(f"[SIM] {side} #{order.trade_index} filled at ${order.price:.2f}",
+                             extra={"side": side})
+
+            for key, trade in list(self.trades.items()):
+                if key[0] != pair_index:
+                    continue
+                if trade.buy:
+                    hit_tp = trade.tp and price >= trade.tp
+                    hit_sl = trade.sl and price <= trade.sl
+                else:
+                    hit_tp = trade.tp and price <= trade.tp
+                    hit_sl = trade.sl and price >= trade.sl
+                if hit_sl:
+                    self._close(trade, trade.sl, "sl")
+                elif hit_tp:
+                    self._close(trade, trade.tp, "tp")
+
+    # ----- AvantisTrader interface -----
+
+    async def check_and_approve_usdc(self, amount: float) -> bool:
+        return True
+
+    def switch_endpoint(self):
+        pass
+
+    @tracing.traced("place_limit_order")
+    async def place_limit_order(self, pair_index: int, is_long: bool, collateral: float,
+                                leverage: int, limit_price: float, tp_price: float,
+                                sl_price: float, direction: str = "BELOW",
+                                dry_run: bool = True) -> str:
+        await self._confirm()
+        return self._open_order(pair_index, is_long, collateral, leverage,
+                                limit_price, tp_price, sl_price, direction)
+
+    @tracing.traced("place_limit_orders")
+    async def place_limit_orders(self, orders: list, dry_run: bool = True) -> list:
+        # Pipelined like the real batch: one confirmation for all
+        await self._confirm()
+        hashes = []
+        for order in orders:
+            try:
+                hashes.append(self._open_order(**order))
+            except ValueError as e:
+                log.warning(f"[SIM] {e}")
+                hashes.append(None)
+        return hashes
+
+    def _open_order(self, pair_index: int, is_long: bool, collateral: float, leverage: int,
+                    limit_price: float, tp_price: float, sl_price: float,
+                    direction: str = "BELOW") -> str:
+        if collateral > self.balance:
+            raise ValueError(f"Insufficient simulated balance: {self.balance:.2f} USDC")
+        tx_hash = self._tx_hash()
+        order_type = order_type_name(direction, is_long)
+        trade_index = next(self._indexes)
+        self.balance -= collateral
+        self.orders[(pair_index, trade_index)] = SimOrder(
+            pair_index, trade_index, is_long, limit_price, leverage, collateral,
+            tp_price, sl_price, order_type)
+        self.book.mark_stale()
+        side = "LONG" if is_long else "SHORT"
+        log.info(f"[SIM] [{side}] {order_type.replace('_', '-')} at ${limit_price:.2f}: {tx_hash}",
+                 extra={"side": side, "tx_hash": tx_hash})
+        return tx_hash
+
+    @tracing.traced("cancel_order")
+    async def cancel_order(self, pair_index: int, trade_index: int, dry_run: bool = True) -> str:
+        order = self.orders.get((pair_index, trade_index))
+        if order is None:
+            raise ValueError(f"No pending order {pair_index}/{trade_index}")
+        await self._confirm()
+        tx_hash = self._tx_hash()
+        if self.orders.pop((pair_index, trade_index), None):
+            self.balance += order.open_collateral
+        self.book.remove(pair_index, trade_index)
+        log.info(f"[SIM] Order #{trade_index} cancelled")
+        return tx_hash
+
+    @tracing.traced("close_position")
+    async def close_position(self, pair_index: int, trade_index: int,
+                             collateral_to_close: float, dry_run: bool = True) -> str:
+        trade = self.trades.get((pair_index, trade_index))
+        if trade is None:
+            raise ValueError(f"No open trade {pair_index}/{trade_index}")
+        await self._confirm()
+        tx_hash = self._tx_hash()
+        if (pair_index, trade_index) in self.trades:
+            self._close(trade, await self._price(pair_index), "manual")
+        self.book.remove(pair_index, trade_index)
+        return tx_hash
+
+    @tracing.traced("get_open_trades")
+    async def get_open_trades(self):
+        await self.step()
+        trades, pending = list(self.trades.values()), list(self.orders.values())
+        self.book.reconcile(trades, pending)
+        return trades, pending
+
+    async def open_trades(self, max_age: float = 0):
+        # In-process reads are free and drive the simulation
+        return await self.get_open_trades()
+
+
+def pair_name_for(pair_index: int) -> str:
+    if pair_index == config.PAIR_INDEX:
+        return config.PAIR_NAME
+    from pairs import get_pair_name
+    return get_pair_name(pair_index)
+
+
+def wallet_address(private_key: str) -> str:
+    if private_key:
+        try:
+            from eth_account import Account
+            return Account.from_key(private_key).address
+        except Exception:
+            pass
+    return "0x" + "51" * 20
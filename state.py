@@ -1,8 +1,206 @@
 # state.py
 
+import json
+import os
+import time
+from dataclasses import dataclass, asdict, field, fields
 from enum import Enum
+from pathlib import Path
+
+import botlog
+
+log = botlog.get("state")
+
 
 class BotState(Enum):
-    IDLE = "idle"
-    WAITING = "waiting"
-    RESET = "reset"
+    IDLE = "idle"              # No cycle in progress
+    PLACING = "placing"        # Submitting the LONG/SHORT orders
+    WAITING = "waiting"        # Orders pending, waiting for fill or reposition
+    IN_POSITION = "in_position"  # Both legs open, waiting for TP/SL
+    RESET = "reset"            # Cancelling pending orders, cycle ends
+
+
+# Allowed transitions. Anything else is a bug in the engine.
+TRANSITIONS = {
+    BotState.IDLE: {BotState.PLACING, BotState.WAITING, BotState.IN_POSITION},
+    BotState.PLACING: {BotState.WAITING, BotState.RESET, BotState.IDLE},
+    BotState.WAITING: {BotState.IN_POSITION, BotState.RESET, BotState.IDLE},
+    BotState.IN_POSITION: {BotState.IDLE},
+    BotState.RESET: {BotState.IDLE},
+}
+
+
+# Levels of the running cycle (anchor, entry, long/short TP and SL).
+# Published by main.main, read by the GUI chart. Empty between cycles.
+cycle_levels = {}
+
+
+@dataclass
+class CycleState:
+    """Everything the engine needs to resume a cycle after a restart."""
+    state: BotState = BotState.IDLE
+    cycle: int = 0
+    uid: str = ""
+    pair_name: str = ""
+    pair_index: int = 0
+    anchor_price: float = 0.0
+    entry_price: float = 0.0
+    direction: str = ""
+    offset: float = 0.0
+    reposition_threshold: float = 0.0
+    collateral: float = 0.0
+    long_tp: float = 0.0
+    long_sl: float = 0.0
+    short_tp: float = 0.0
+    short_sl: float = 0.0
+    tx_hashes: list = field(default_factory=list)
+    # Grid mode: one dict per LONG/SHORT pair (entry, direction, TP/SL, status)
+    grid: list = field(default_factory=list)
+    updated_at: float = 0.0
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["state"] = self.state.value
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "CycleState":
+        known = {f.name for f in fields(cls)}
+        d = {k: v for k, v in d.items() if k in known}
+        d["state"] = BotState(d.get("state", "idle"))
+        return cls(**d)
+
+    def levels(self) -> dict:
+        if self.state == BotState.IDLE or not self.entry_price:
+            return {}
+        return {
+            "pair": self.pair_name,
+            "anchor": self.anchor_price,
+            "entry": self.entry_price,
+            "long_tp": self.long_tp,
+            "long_sl": self.long_sl,
+            "short_tp": self.short_tp,
+            "short_sl": self.short_sl,
+        }
+
+
+class CycleJournal:
+    """
+    Append-only, fsync'd journal of cycle snapshots (one JSON line each).
+
+    Every line is a full snapshot, so recovery only needs the last intact
+    line. A torn last line from a crash mid-write is skipped. The file is
+    compacted to a single line once it grows past max_lines.
+    """
+
+    def __init__(self, path, max_lines: int = 1000):
+        self.path = Path(path)
+        self.max_lines = max_lines
+        self._lines = 0
+        self._file = None
+
+    def load(self):
+        """Return the last intact snapshot as a dict, or None."""
+        if not self.path.exists():
+            return None
+
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            # Snapshots are a few hundred bytes: the tail is enough
+            f.seek(max(0, size - 16384))
+            tail = f.read().splitlines()
+
+        for line in reversed(tail):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+        return None
+
+    def append(self, snapshot: dict):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(json.dumps(snapshot, separators=(",", ":")).encode() + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._lines += 1
+
+        if self._lines >= self.max_lines:
+            self.compact(snapshot)
+
+    def compact(self, snapshot: dict):
+        """Atomically replace the journal with a single snapshot."""
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(snapshot, separators=(",", ":")).encode() + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.close()
+        os.replace(tmp, self.path)
+        self._lines = 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class CycleMachine:
+    """
+    Cycle state machine built on BotState.
+    Every transition is journaled before the engine acts on it.
+    """
+
+    def __init__(self, journal: CycleJournal = None):
+        self.journal = journal
+        self.current = CycleState()
+        # Called with (old_state, CycleState) after every transition
+        self.listeners = []
+
+    @classmethod
+    def recover(cls, path) -> "CycleMachine":
+        """Restore the last journaled state (IDLE if there is none)."""
+        machine = cls(CycleJournal(path))
+        snapshot = machine.journal.load()
+        if snapshot:
+            try:
+                machine.current = CycleState.from_dict(snapshot)
+            except (ValueError, TypeError) as e:
+                log.warning(f"[STATE] Ignoring unreadable journal entry: {e}")
+        global cycle_levels
+        cycle_levels = machine.current.levels()
+        return machine
+
+    @property
+    def state(self) -> BotState:
+        return self.current.state
+
+    def transition(self, new_state: BotState, **changes) -> CycleState:
+        """
+        Move to new_state, updating cycle fields, and journal it.
+
+        Raises:
+            ValueError: If the transition is not allowed
+        """
+        old = self.current.state
+        if new_state != old and new_state not in TRANSITIONS[old]:
+            raise ValueError(f"Invalid transition {old.value} -> {new_state.value}")
+
+        if new_state == BotState.IDLE:
+            # Keep only the cycle counter between cycles
+            self.current = CycleState(cycle=self.current.cycle)
+        for key, value in changes.items():
+            setattr(self.current, key, value)
+        self.current.state = new_state
+        self.current.updated_at = time.time()
+
+        if self.journal:
+            self.journal.append(self.current.to_dict())
+
+        global cycle_levels
+        cycle_levels = self.current.levels()
+
+        for listener in self.listeners:
+            listener(old, self.current)
+        return self.current
@@ -1,26 +1,142 @@
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# A stop loss eaten up by costs still keeps this share of its leverage-only distance
+MIN_SL_SHARE = 0.25
+
+
+@dataclass(frozen=True)
+class TradeCosts:
+    """
+    Costs of one position as fractions of its size (collateral * leverage):
+    open and close fees, the spread paid on entry and borrow fees for the
+    expected holding time.
+    """
+    open_fee: float = 0.0
+    close_fee: float = 0.0
+    spread: float = 0.0
+    borrow_per_hour: float = 0.0
+    hold_hours: float = 0.0
+
+    @classmethod
+    def for_pair(cls, pair, hold_hours: float = 0.0) -> "TradeCosts":
+        """Costs from a pairs.PairInfo."""
+        return cls(pair.open_fee, pair.close_fee, pair.spread, pair.borrow_fee_per_hour, hold_hours)
+
+    @property
+    def total(self) -> float:
+        """Round trip cost as a fraction of position size."""
+        return self.open_fee + self.close_fee + self.spread + self.borrow_per_hour * self.hold_hours
+
+    def fees(self, size: float) -> float:
+        """
+        Fees in USDC on a position of `size` (collateral * leverage): open,
+        close and borrow for hold_hours. The spread is left out, it is
+        already in the fill price.
+        """
+        return size * (self.open_fee + self.close_fee + self.borrow_per_hour * self.hold_hours)
+
+
+def tp_sl_multipliers(
+    leverage: float,
+    tp_pnl_pct: float,
+    sl_pnl_pct: float,
+    is_long: bool,
+    costs: TradeCosts = None,
+):
+    """
+    Entry price multipliers for TP and SL.
+
+    With costs, both are net of them: the TP moves out so the trade still
+    makes tp_pnl_pct after costs, the SL moves in so it loses no more than
+    sl_pnl_pct including costs (but keeps MIN_SL_SHARE of its distance).
+    """
+    cost_move = costs.total if costs else 0.0
+    tp_move_pct = tp_pnl_pct / leverage + cost_move
+    sl_move_pct = max(sl_pnl_pct / leverage - cost_move, sl_pnl_pct / leverage * MIN_SL_SHARE)
+
+    if is_long:
+        return 1 + tp_move_pct, 1 - sl_move_pct
+    return 1 - tp_move_pct, 1 + sl_move_pct
+
+
 def calc_tp_sl_price(
     entry_price: float,
     leverage: float,
     tp_pnl_pct: float,
     sl_pnl_pct: float,
     is_long: bool,
+    costs: TradeCosts = None,
 ):
     """
     tp_pnl_pct = 0.80 means +80% PnL on collateral for take profit
     sl_pnl_pct = 0.80 means -80% PnL on collateral for stop loss
+    costs: Net the targets of fees, spread and borrow (None = leverage only)
     """
+    tp_mult, sl_mult = tp_sl_multipliers(leverage, tp_pnl_pct, sl_pnl_pct, is_long, costs)
+    return entry_price * tp_mult, entry_price * sl_mult
 
-    tp_move_pct = tp_pnl_pct / leverage
-    sl_move_pct = sl_pnl_pct / leverage
 
-    if is_long:
-        tp_price = entry_price * (1 + tp_move_pct)
-        sl_price = entry_price * (1 - sl_move_pct)
-    else:
-        tp_price = entry_price * (1 - tp_move_pct)
-        sl_price = entry_price * (1 + sl_move_pct)
+def calc_tp_sl_prices(
+    entry_prices,
+    leverage: float,
+    tp_pnl_pct: float,
+    sl_pnl_pct: float,
+    is_long: bool,
+    costs: TradeCosts = None,
+):
+    """
+    calc_tp_sl_price for many entries of one side (grid levels, batches).
+    The multipliers are computed once; a numpy array of entries is
+    multiplied in one operation.
+
+    Returns:
+        (tp_prices, sl_prices): lists, or arrays for an array input
+    """
+    tp_mult, sl_mult = tp_sl_multipliers(leverage, tp_pnl_pct, sl_pnl_pct, is_long, costs)
+    if hasattr(entry_prices, "__array__"):
+        return entry_prices * tp_mult, entry_prices * sl_mult
+    return [p * tp_mult for p in entry_prices], [p * sl_mult for p in entry_prices]
+
+
+def calc_net_pnl_pct(
+    entry_price: float,
+    exit_price: float,
+    leverage: float,
+    is_long: bool,
+    costs: TradeCosts = None,
+):
+    """PnL on collateral after costs (0.80 = +80%)."""
+    cost_pnl = costs.total * leverage if costs else 0.0
+    return calc_pnl_pct(entry_price, exit_price, leverage, is_long) - cost_pnl
+
+
+def pair_break_even(
+    entry_price: float,
+    leverage: float,
+    sl_pnl_pct: float,
+    costs: TradeCosts = None,
+):
+    """
+    Break-even of a delta-neutral LONG + SHORT pair at one entry.
+
+    Once one leg stops out, the other has to cover that loss and its own
+    costs for the cycle to end flat.
 
-    return tp_price, sl_price
+    Returns:
+        (long_exit, short_exit): price the LONG must reach after the SHORT
+        stopped out, and the SHORT's price after the LONG stopped out
+    """
+    exits = []
+    for is_long in (True, False):
+        # The opposite leg's SL sits on this leg's profitable side
+        _, stop = calc_tp_sl_price(entry_price, leverage, 0.0, sl_pnl_pct, not is_long, costs)
+        loss = -calc_net_pnl_pct(entry_price, stop, leverage, not is_long, costs)
+        exit_price, _ = calc_tp_sl_price(entry_price, leverage, loss, sl_pnl_pct, is_long, costs)
+        exits.append(exit_price)
+    return tuple(exits)
 
 
 def calc_pnl_pct(
@@ -36,3 +152,63 @@ def calc_pnl_pct(
     )
 
     return price_diff_pct * leverage
+
+
+class RealizedVolatility:
+    """
+    Rolling realized volatility of one pair from price ticks.
+
+    Squared log returns and the time they span are summed over a sliding
+    window, so adding a tick is O(1) amortized.
+    """
+
+    MIN_SAMPLES = 10
+
+    def __init__(self, window: float = 3600):
+        self.window = window
+        self.pair = None
+        self.reset()
+
+    def reset(self):
+        self._ticks = deque()  # (time, squared log return, seconds spanned)
+        self._sum_r2 = 0.0
+        self._sum_dt = 0.0
+        self._last = None
+
+    def add(self, pair: str, price: float, now: float = None):
+        if price <= 0:
+            return
+        if pair != self.pair:
+            self.pair = pair
+            self.reset()
+
+        now = time.time() if now is None else now
+        if self._last:
+            last_time, last_price = self._last
+            dt = now - last_time
+            if dt <= 0:
+                return
+            r2 = math.log(price / last_price) ** 2
+            self._ticks.append((now, r2, dt))
+            self._sum_r2 += r2
+            self._sum_dt += dt
+        self._last = (now, price)
+
+        while self._ticks and self._ticks[0][0] < now - self.window:
+            _, r2, dt = self._ticks.popleft()
+            self._sum_r2 -= r2
+            self._sum_dt -= dt
+
+    @property
+    def ready(self) -> bool:
+        return len(self._ticks) >= self.MIN_SAMPLES
+
+    def per_second(self) -> float:
+        """Volatility of log price per sqrt(second), 0.0 without data."""
+        if self._sum_dt <= 0:
+            return 0.0
+        return math.sqrt(max(self._sum_r2, 0.0) / self._sum_dt)
+
+    def over(self, seconds: float) -> float:
+        """Expected relative move (one sigma) over `seconds`."""
+        return self.per_second() * math.sqrt(seconds)
@@ -0,0 +1,271 @@
+"""
+Per-cycle traces: a root span for each cycle, child spans for price
+fetches, the entry decision and every order placement, cancel, close and
+get_trades poll, with pair, side, price and tx hash attributes.
+
+Spans only exist inside a cycle (start_cycle .. end_cycle), so GUI price
+polls and other calls outside the engine cost nothing. When the cycle
+ends, its spans are handed to a background thread that writes them in
+the OTLP/JSON format:
+
+    - as one line per trace to config.TRACE_FILE (in STATE_DIR)
+    - POSTed to config.TRACE_ENDPOINT (an OTLP/HTTP collector, e.g.
+      http://127.0.0.1:4318/v1/traces, or mock_server.py's /v1/traces)
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import botlog
+
+log = botlog.get("tracing")
+
+SERVICE_NAME = "delta-neutral-bot"
+
+# Long cycles poll for hours: keep the first spans, count the rest
+MAX_SPANS_PER_TRACE = 5000
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end_time",
+                 "attributes", "error")
+
+    def __init__(self, trace, name: str, parent_id: str, attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end_time = 0
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.error = None
+
+    def set(self, **attributes):
+        for key, value in attributes.items():
+            if value is not None:
+                self.attributes[key] = value
+
+    def fail(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # INTERNAL
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end_time or time.time_ns()),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    def __init__(self, uid: str):
+        # Cycle uid (16 hex) + 16 random hex = 128-bit trace id
+        self.trace_id = (uid + os.urandom(8).hex())[:32].ljust(32, "0")
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, span: Span):
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+
+class _NoSpan:
+    """Stand-in outside a cycle."""
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+# ----- Cycle root -----
+
+def start_cycle(uid: str, **attributes):
+    """Open the root span of a cycle in the current task."""
+    if _current.get() is not None:
+        # Previous cycle failed before end_cycle: export what it has
+        end_cycle(outcome="abandoned")
+    root = Span(Trace(uid), "cycle", None, attributes)
+    _current.set(root)
+    return root
+
+
+def end_cycle(**attributes):
+    """Close the cycle's root span and export the trace."""
+    root = _current.get()
+    if root is None or root.parent_id is not None:
+        return
+    _current.set(None)
+    root.set(**attributes)
+    root.end_time = time.time_ns()
+    trace = root.trace
+    if trace.dropped:
+        root.set(dropped_spans=trace.dropped)
+    trace.add(root)
+    _exporter.submit(trace)
+
+
+def current():
+    """The active span, or NO_SPAN outside a cycle."""
+    return _current.get() or NO_SPAN
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the active one. Does nothing outside a cycle."""
+    parent = _current.get()
+    if parent is None:
+        yield NO_SPAN
+        return
+    s = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.fail(e)
+        raise
+    finally:
+        _current.reset(token)
+        s.end_time = time.time_ns()
+        parent.trace.add(s)
+
+
+def traced(name: str):
+    """
+    Span around an async trader call. Order arguments become attributes
+    (pair_index, trade_index, side, price, tp, sl, collateral) and the
+    result its tx hash(es) or order counts.
+    """
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await fn(*args, **kwargs)
+            args_map = signature.bind_partial(*args, **kwargs).arguments
+            is_long = args_map.get("is_long")
+            with span(name,
+                      pair_index=args_map.get("pair_index"),
+                      trade_index=args_map.get("trade_index"),
+                      side=None if is_long is None else ("LONG" if is_long else "SHORT"),
+                      price=args_map.get("limit_price"),
+                      tp=args_map.get("tp_price"),
+                      sl=args_map.get("sl_price"),
+                      collateral=args_map.get("collateral"),
+                      orders=len(args_map["orders"]) if "orders" in args_map else None,
+                      dry_run=args_map.get("dry_run")) as s:
+                result = await fn(*args, **kwargs)
+                if isinstance(result, str):
+                    s.set(tx_hash=result)
+                elif isinstance(result, list):
+                    s.set(tx_hashes=",".join(h or "-" for h in result))
+                elif isinstance(result, tuple) and len(result) == 2:
+                    s.set(open_trades=len(result[0]), pending_orders=len(result[1]))
+                return result
+        return wrapper
+    return decorate
+
+
+# ----- Export -----
+
+class _Exporter:
+    """Writes finished traces on a background thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._errors = 0
+
+    def submit(self, trace: Trace):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass  # Exporter is behind: drop rather than slow the engine
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            try:
+                self.export(trace)
+            except Exception as e:
+                self._errors += 1
+                # First error and then every 100th, the collector may be down for long
+                if self._errors % 100 == 1:
+                    log.warning(f"[TRACE] Export failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0):
+        """Wait (bounded) for queued traces to be written, e.g. at exit."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    @staticmethod
+    def payload(trace: Trace) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "dn"},
+                "spans": [s.to_otlp() for s in trace.spans],
+            }],
+        }]}
+
+    def export(self, trace: Trace):
+        import config
+        data = json.dumps(self.payload(trace))
+        if config.TRACE_FILE:
+            folder = Path(config.STATE_DIR) if config.STATE_DIR else Path(__file__).parent
+            with open(folder / config.TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(data + "\n")
+        if config.TRACE_ENDPOINT:
+            import urllib.request
+            request = urllib.request.Request(
+                config.TRACE_ENDPOINT, data=data.encode(), method="POST",
+                headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+
+
+_exporter = _Exporter()
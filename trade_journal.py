@@ -0,0 +1,281 @@
+"""
+SQLite trade journal: cycles, placed/cancelled orders, fills and closes.
+
+Writes are queued and committed in batches by a background thread, so the
+trading loop never waits on disk. The database runs in WAL mode, so
+reports can read it while the bot is writing.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+import botlog
+
+log = botlog.get("journal")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    uid TEXT PRIMARY KEY,
+    cycle INTEGER,
+    wallet TEXT,
+    pair_name TEXT,
+    pair_index INTEGER,
+    dry_run INTEGER,
+    started_at REAL,
+    ended_at REAL,
+    outcome TEXT,
+    direction TEXT,
+    anchor_price REAL,
+    entry_price REAL,
+    offset REAL,
+    reposition_threshold REAL,
+    collateral REAL,
+    leverage INTEGER,
+    params_hash TEXT,
+    params TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cycles_time ON cycles(started_at);
+CREATE INDEX IF NOT EXISTS idx_cycles_pair ON cycles(pair_index, started_at);
+CREATE INDEX IF NOT EXISTS idx_cycles_wallet ON cycles(wallet, started_at);
+CREATE INDEX IF NOT EXISTS idx_cycles_ended ON cycles(ended_at);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    cycle_uid TEXT,
+    ts REAL,
+    wallet TEXT,
+    pair_index INTEGER,
+    action TEXT,
+    side TEXT,
+    order_type TEXT,
+    price REAL,
+    tp REAL,
+    sl REAL,
+    collateral REAL,
+    leverage INTEGER,
+    trade_index INTEGER,
+    tx_hash TEXT,
+    gas_used INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_orders_time ON orders(ts);
+CREATE INDEX IF NOT EXISTS idx_orders_pair ON orders(pair_index, ts);
+CREATE INDEX IF NOT EXISTS idx_orders_wallet ON orders(wallet, ts);
+CREATE INDEX IF NOT EXISTS idx_orders_cycle ON orders(cycle_uid);
+
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY,
+    cycle_uid TEXT,
+    ts REAL,
+    wallet TEXT,
+    pair_index INTEGER,
+    side TEXT,
+    trade_index INTEGER,
+    price REAL,
+    collateral REAL,
+    leverage INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_fills_time ON fills(ts);
+CREATE INDEX IF NOT EXISTS idx_fills_pair ON fills(pair_index, ts);
+CREATE INDEX IF NOT EXISTS idx_fills_wallet ON fills(wallet, ts);
+CREATE INDEX IF NOT EXISTS idx_fills_cycle ON fills(cycle_uid);
+
+CREATE TABLE IF NOT EXISTS closes (
+    id INTEGER PRIMARY KEY,
+    cycle_uid TEXT,
+    ts REAL,
+    wallet TEXT,
+    pair_index INTEGER,
+    side TEXT,
+    trade_index INTEGER,
+    reason TEXT,
+    open_price REAL,
+    close_price REAL,
+    collateral REAL,
+    leverage INTEGER,
+    pnl REAL,
+    fees REAL,
+    tx_hash TEXT,
+    gas_used INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_closes_time ON closes(ts);
+CREATE INDEX IF NOT EXISTS idx_closes_pair ON closes(pair_index, ts);
+CREATE INDEX IF NOT EXISTS idx_closes_wallet ON closes(wallet, ts);
+CREATE INDEX IF NOT EXISTS idx_closes_cycle ON closes(cycle_uid);
+"""
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5
+
+
+def connect(path, readonly: bool = False) -> sqlite3.Connection:
+    """Open the journal database (creating the schema if needed)."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class TradeJournal:
+    """
+    Append-only journal with a batched background writer.
+
+    All record_* methods only enqueue a row and return immediately.
+    """
+
+    def __init__(self, path, wallet: str = ""):
+        self.path = str(path)
+        self.wallet = wallet
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=100000)
+        self._thread = threading.Thread(target=self._writer, name="trade-journal", daemon=True)
+        # Create the schema up front so readers never see a missing table
+        connect(self.path).close()
+        self._thread.start()
+
+    # ----- Writers -----
+
+    def record_cycle_start(self, uid: str, cycle: int, pair_name: str, pair_index: int,
+                           dry_run: bool, direction: str, anchor_price: float,
+                           entry_price: float, offset: float, reposition_threshold: float,
+                           collateral: float, leverage: int, params: dict):
+        params_json = json.dumps(params, sort_keys=True)
+        self._put(
+            "INSERT OR REPLACE INTO cycles (uid, cycle, wallet, pair_name, pair_index, dry_run,"
+            " started_at, direction, anchor_price, entry_price, offset, reposition_threshold,"
+            " collateral, leverage, params_hash, params)"
+            " VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (uid, cycle, self.wallet, pair_name, pair_index, int(dry_run), time.time(),
+             direction, anchor_price, entry_price, offset, reposition_threshold,
+             collateral, leverage, params_hash(params_json), params_json)
+        )
+
+    def record_cycle_end(self, uid: str, outcome: str):
+        """outcome: filled, closed, repositioned, session_end or cancelled."""
+        self._put("UPDATE cycles SET ended_at = ?, outcome = ? WHERE uid = ?",
+                  (time.time(), outcome, uid))
+
+    def record_order(self, cycle_uid: str, action: str, pair_index: int, side: str = None,
+                     order_type: str = None, price: float = None, tp: float = None,
+                     sl: float = None, collateral: float = None, leverage: int = None,
+                     trade_index: int = None, tx_hash: str = None, gas_used: int = None):
+        """action: place or cancel."""
+        self._put(
+            "INSERT INTO orders (cycle_uid, ts, wallet, pair_index, action, side, order_type,"
+            " price, tp, sl, collateral, leverage, trade_index, tx_hash, gas_used)"
+            " VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (cycle_uid, time.time(), self.wallet, pair_index, action, side, order_type,
+             price, tp, sl, collateral, leverage, trade_index, tx_hash, gas_used)
+        )
+
+    def record_fill(self, cycle_uid: str, pair_index: int, side: str, price: float,
+                    collateral: float, leverage: int, trade_index: int = None):
+        self._put(
+            "INSERT INTO fills (cycle_uid, ts, wallet, pair_index, side, trade_index,"
+            " price, collateral, leverage) VALUES (?,?,?,?,?,?,?,?,?)",
+            (cycle_uid, time.time(), self.wallet, pair_index, side, trade_index,
+             price, collateral, leverage)
+        )
+
+    def record_close(self, cycle_uid: str, pair_index: int, side: str, reason: str,
+                     open_price: float, close_price: float, collateral: float,
+                     leverage: int, pnl: float, fees: float = None,
+                     trade_index: int = None, tx_hash: str = None, gas_used: int = None):
+        """
+        reason: tp, sl or manual. pnl is realized USDC before fees,
+        fees None when they are not known.
+        """
+        self._put(
+            "INSERT INTO closes (cycle_uid, ts, wallet, pair_index, side, trade_index, reason,"
+            " open_price, close_price, collateral, leverage, pnl, fees, tx_hash, gas_used)"
+            " VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (cycle_uid, time.time(), self.wallet, pair_index, side, trade_index, reason,
+             open_price, close_price, collateral, leverage, pnl, fees, tx_hash, gas_used)
+        )
+
+    def _put(self, sql: str, params: tuple):
+        try:
+            self._queue.put_nowait((sql, params))
+        except queue.Full:
+            # Never block trading on the journal
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued rows and stop the writer."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _writer(self):
+        conn = connect(self.path)
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+
+            batch = []
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE or time.monotonic() >= deadline:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if item is None:
+                running = False
+
+            try:
+                with conn:
+                    for sql, params in batch:
+                        conn.execute(sql, params)
+            except sqlite3.Error as e:
+                log.error(f"[JOURNAL] Write failed ({len(batch)} rows): {e}")
+        conn.close()
+
+    # ----- Readers -----
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        """Run a read-only query on a separate connection."""
+        conn = connect(self.path, readonly=True)
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def recent_cycles(self, limit: int = 20) -> list:
+        return self.query(
+            "SELECT * FROM cycles WHERE wallet = ? ORDER BY started_at DESC LIMIT ?",
+            (self.wallet, limit)
+        )
+
+    def pnl_summary(self, since: float = 0.0, pair_index: int = None) -> dict:
+        """
+        Realized PnL, fees and close count since a unix timestamp.
+        net_pnl only covers closes with journaled fees (closes_without_fees
+        counts the others), None if there are none.
+        """
+        sql = ("SELECT COUNT(*) AS closes, COALESCE(SUM(pnl), 0) AS pnl,"
+               " COALESCE(SUM(fees), 0) AS fees, SUM(CASE WHEN fees > 0 THEN pnl - fees END) AS net_pnl,"
+               " COALESCE(SUM(fees IS NULL OR fees <= 0), 0) AS closes_without_fees"
+               " FROM closes WHERE wallet = ? AND ts >= ?")
+        params = [self.wallet, since]
+        if pair_index is not None:
+            sql += " AND pair_index = ?"
+            params.append(pair_index)
+        return self.query(sql, tuple(params))[0]
+
+
+def params_hash(params_json: str) -> str:
+    """Short stable id of a parameter set, for grouping in reports."""
+    import hashlib
+    return hashlib.sha1(params_json.encode()).hexdigest()[:12]
@@ -1,7 +1,54 @@
-from avantis_trader_sdk import TraderClient
-from avantis_trader_sdk.types import TradeInput, TradeInputOrderType
-from avantis_trader_sdk.config import CONTRACT_ADDRESSES
-from eth_account import Account
+# The SDK and web3 stack take seconds to import, so they are loaded on
+# first trading action (or by preload_sdk in the background), not at import.
+
+import asyncio
+
+import botlog
+import metrics
+import ratelimit
+import resilience
+import tracing
+from orderbook import OrderBook
+
+log = botlog.get("trader")
+
+# Max age of the order book before readers trigger a get_trades reconcile
+BOOK_MAX_AGE = 60
+
+
+def preload_sdk():
+    """Import the SDK modules used by AvantisTrader (safe to call from a thread)."""
+    import avantis_trader_sdk.types  # noqa: F401
+    import avantis_trader_sdk.feed.feed_client  # noqa: F401
+    from avantis_trader_sdk import TraderClient  # noqa: F401
+    from eth_account import Account  # noqa: F401
+
+
+def order_type_name(direction: str, is_long: bool) -> str:
+    """
+    Order type for one leg of the pair.
+    BELOW (waiting for price drop): LONG=LIMIT, SHORT=STOP_LIMIT
+    ABOVE (waiting for price rise): LONG=STOP_LIMIT, SHORT=LIMIT
+    """
+    if direction == "BELOW":
+        return "LIMIT" if is_long else "STOP_LIMIT"
+    return "STOP_LIMIT" if is_long else "LIMIT"
+
+
+def order_to_dict(order) -> dict:
+    """Flatten an SDK trade/order object (attribute names vary between them)."""
+    is_long = getattr(order, "buy", getattr(order, "is_long", None))
+    return {
+        "pair_index": getattr(order, "pair_index", None),
+        "trade_index": getattr(order, "trade_index", None),
+        "side": None if is_long is None else ("LONG" if is_long else "SHORT"),
+        "price": getattr(order, "open_price", getattr(order, "price", None)),
+        "leverage": getattr(order, "leverage", None),
+        "collateral": getattr(order, "collateral_in_trade",
+                              getattr(order, "open_collateral", None)),
+        "tp": getattr(order, "tp", None),
+        "sl": getattr(order, "sl", None),
+    }
 
 
 class AvantisTrader:
@@ -10,14 +57,55 @@ class AvantisTrader:
     Handles opening and closing positions with LIMIT orders.
     """
 
-    def __init__(self, rpc_url: str, private_key: str):
+    def __init__(self, rpc_url: str, private_key: str, fallback_urls=()):
+        from avantis_trader_sdk import TraderClient
+        from avantis_trader_sdk.config import CONTRACT_ADDRESSES
+        from eth_account import Account
+
         self.client = TraderClient(rpc_url)
         self.client.set_local_signer(private_key)
+        # switch_endpoint cycles through these when calls keep timing out
+        self.rpc_urls = [rpc_url] + [url for url in fallback_urls if url != rpc_url]
+        self.rpc_index = 0
         self.private_key = private_key
         self.wallet = Account.from_key(private_key).address
         self.trading_address = CONTRACT_ADDRESSES["Trading"]
-        print(f"[TRADER] Wallet: {self.wallet}")
+        # tx_hash -> gas used, popped by the trade journal
+        self.gas_used = {}
+        self.book = OrderBook()
+        log.info(f"[TRADER] Wallet: {self.wallet}")
+
+    def switch_endpoint(self):
+        """Reconnect through the next RPC (a fresh connection if there is only one)."""
+        from avantis_trader_sdk import TraderClient
+
+        self.rpc_index = (self.rpc_index + 1) % len(self.rpc_urls)
+        url = self.rpc_urls[self.rpc_index]
+        self.client = TraderClient(url)
+        self.client.set_local_signer(self.private_key)
+        metrics.ENDPOINT_SWITCHES["rpc"].inc()
+        log.warning(f"[RPC] Switched to {resilience.host(url)}")
+
+    async def _call(self, kind: str, op: str, make):
+        """
+        Chain call with deadline, retries and circuit breaker (see resilience.call).
 
+        Args:
+            kind: "read" (retried, may switch endpoint) or "write"
+            op: Call name for logs
+            make: Function returning the awaitable, called per attempt
+        """
+        try:
+            return await resilience.call(kind, op, make,
+                                         lambda: self.rpc_urls[self.rpc_index], self.switch_endpoint)
+        except resilience.ServiceError:
+            if kind == "write":
+                # The transaction may still be mined: re-read orders before trusting the book
+                self.book.mark_stale()
+            raise
+
+    @ratelimit.prioritized(ratelimit.HIGH)
+    @metrics.timed("approve")
     async def check_and_approve_usdc(self, amount: float) -> bool:
         """
         Check USDC allowance and approve if needed.
@@ -29,37 +117,43 @@ class AvantisTrader:
             True if approved or already has allowance
         """
         # Check current allowance
-        allowance = await self.client.read_contract(
+        allowance = await self._call("read", "allowance", lambda: self.client.read_contract(
             "USDC", "allowance", self.wallet, self.trading_address, decode=False
-        )
+        ))
         allowance_usdc = allowance / 10**6
 
         if allowance_usdc >= amount:
-            print(f"[APPROVE] USDC allowance OK: {allowance_usdc:.2f}")
+            log.info(f"[APPROVE] USDC allowance OK: {allowance_usdc:.2f}")
             return True
 
-        print(f"[APPROVE] Current allowance: {allowance_usdc:.2f}, need: {amount:.2f}")
-        print("[APPROVE] Approving USDC for Trading contract...")
+        log.info(f"[APPROVE] Current allowance: {allowance_usdc:.2f}, need: {amount:.2f}")
+        log.info("[APPROVE] Approving USDC for Trading contract...")
 
         # Approve max uint256
         max_amount = 2**256 - 1
 
         # Build approve transaction
-        usdc_contract = self.client.contracts["USDC"]
-        tx = await usdc_contract.functions.approve(
-            self.trading_address, max_amount
-        ).build_transaction({
-            "from": self.wallet,
-            "nonce": await self.client.get_transaction_count(self.wallet),
-            "gasPrice": await self.client.get_gas_price(),
-        })
+        async def build():
+            usdc_contract = self.client.contracts["USDC"]
+            return await usdc_contract.functions.approve(
+                self.trading_address, max_amount
+            ).build_transaction({
+                "from": self.wallet,
+                "nonce": await self.client.get_transaction_count(self.wallet),
+                "gasPrice": await self.client.get_gas_price(),
+            })
+
+        tx = await self._call("read", "build_approve", build)
 
         # Sign and send
-        receipt = await self.client.sign_and_get_receipt(tx)
+        receipt = await self._call("write", "approve", lambda: self.client.sign_and_get_receipt(tx))
         tx_hash = receipt["transactionHash"].hex()
-        print(f"[APPROVE] USDC approved: {tx_hash}")
+        log.info(f"[APPROVE] USDC approved: {tx_hash}", extra={"tx_hash": tx_hash})
         return True
 
+    @tracing.traced("place_limit_order")
+    @ratelimit.prioritized(ratelimit.HIGH)
+    @metrics.timed("place")
     async def place_limit_order(
         self,
         pair_index: int,
@@ -91,15 +185,105 @@ class AvantisTrader:
         side = "LONG" if is_long else "SHORT"
 
         if dry_run:
-            print(f"[DRY-RUN] Placing {side} LIMIT order:")
-            print(f"  Pair Index: {pair_index}")
-            print(f"  Collateral: {collateral} USDC")
-            print(f"  Leverage: {leverage}x")
-            print(f"  Limit Price: {limit_price:.2f}")
-            print(f"  TP Price: {tp_price:.2f}")
-            print(f"  SL Price: {sl_price:.2f}")
+            log.info(f"[DRY-RUN] Placing {side} LIMIT order:")
+            log.info(f"  Pair Index: {pair_index}")
+            log.info(f"  Collateral: {collateral} USDC")
+            log.info(f"  Leverage: {leverage}x")
+            log.info(f"  Limit Price: {limit_price:.2f}")
+            log.info(f"  TP Price: {tp_price:.2f}")
+            log.info(f"  SL Price: {sl_price:.2f}")
             return "DRY_RUN"
 
+        tx = await self._build_open_tx(pair_index, is_long, collateral, leverage,
+                                       limit_price, tp_price, sl_price, direction)
+
+        # Sign and send
+        receipt = await self._call("write", "place", lambda: self.client.sign_and_get_receipt(tx))
+
+        tx_hash = receipt["transactionHash"].hex()
+        self.gas_used[tx_hash] = receipt.get("gasUsed")
+        # The new trade_index is only known on chain
+        self.book.mark_stale()
+        kind = order_type_name(direction, is_long).replace("_", "-")
+        log.info(f"[{side}] {kind} at ${limit_price:.2f}: {tx_hash}",
+                 extra={"side": side, "tx_hash": tx_hash})
+        return tx_hash
+
+    @tracing.traced("place_limit_orders")
+    @ratelimit.prioritized(ratelimit.HIGH)
+    @metrics.timed("place_batch")
+    async def place_limit_orders(self, orders: list, dry_run: bool = True) -> list:
+        """
+        Place several LIMIT orders as one pipelined batch.
+
+        Transactions get consecutive nonces and are broadcast back to back,
+        then all receipts are awaited together, so K orders take about one
+        confirmation instead of K. Each receipt is awaited on its own: one
+        slow receipt does not lose the others.
+
+        Args:
+            orders: Dicts of place_limit_order arguments (without dry_run)
+            dry_run: If True, don't send transactions
+
+        Returns:
+            Transaction hash per order ("DRY_RUN" in dry run, None if not sent
+            or reverted). Orders whose receipt could not be read keep their
+            hash: they may still be mined.
+        """
+        if dry_run:
+            return [await self.place_limit_order(**order, dry_run=True) for order in orders]
+
+        from eth_account import Account
+
+        nonce = await self._call("read", "nonce",
+                                 lambda: self.client.get_transaction_count(self.wallet))
+        w3 = self.client.async_web3
+        sent = []
+        try:
+            for i, order in enumerate(orders):
+                tx = await self._build_open_tx(**order)
+                tx["nonce"] = nonce + i
+                signed = Account.sign_transaction(tx, self.private_key)
+                raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+                sent.append(await self._call("write", "send", lambda: w3.eth.send_raw_transaction(raw)))
+        except Exception as e:
+            # Later nonces would be stuck behind the gap: stop here
+            log.warning(f"[BATCH] Sent {len(sent)}/{len(orders)} orders: {e}")
+
+        def wait_receipt(tx_hash):
+            return self._call("write", "receipt", lambda: w3.eth.wait_for_transaction_receipt(tx_hash))
+
+        receipts = await asyncio.gather(*(wait_receipt(h) for h in sent), return_exceptions=True)
+        self.book.mark_stale()
+
+        hashes = [None] * len(orders)
+        for i, (sent_hash, receipt) in enumerate(zip(sent, receipts)):
+            order = orders[i]
+            side = "LONG" if order["is_long"] else "SHORT"
+            if isinstance(receipt, BaseException):
+                tx_hash = sent_hash if isinstance(sent_hash, str) else sent_hash.hex()
+                log.warning(f"[{side}] Unconfirmed at ${order['limit_price']:.2f}: {tx_hash} ({receipt})",
+                            extra={"side": side, "tx_hash": tx_hash})
+                hashes[i] = tx_hash
+                continue
+            tx_hash = receipt["transactionHash"].hex()
+            self.gas_used[tx_hash] = receipt.get("gasUsed")
+            if receipt.get("status") == 0:
+                log.warning(f"[{side}] Reverted at ${order['limit_price']:.2f}: {tx_hash}",
+                            extra={"side": side, "tx_hash": tx_hash})
+                continue
+            kind = order_type_name(order.get("direction", "BELOW"), order["is_long"]).replace("_", "-")
+            log.info(f"[{side}] {kind} at ${order['limit_price']:.2f}: {tx_hash}",
+                     extra={"side": side, "tx_hash": tx_hash})
+            hashes[i] = tx_hash
+        return hashes
+
+    async def _build_open_tx(self, pair_index: int, is_long: bool, collateral: float,
+                             leverage: int, limit_price: float, tp_price: float,
+                             sl_price: float, direction: str = "BELOW") -> dict:
+        """Build an unsigned LIMIT/STOP_LIMIT open transaction."""
+        from avantis_trader_sdk.types import TradeInput, TradeInputOrderType
+
         # Create trade input
         trade_input = TradeInput(
             trader=self.wallet,
@@ -113,27 +297,20 @@ class AvantisTrader:
         )
 
         # Choose order type based on direction and side
-        # BELOW (waiting for price drop): LONG=LIMIT, SHORT=STOP_LIMIT
-        # ABOVE (waiting for price rise): LONG=STOP_LIMIT, SHORT=LIMIT
-        if direction == "BELOW":
-            order_type = TradeInputOrderType.LIMIT if is_long else TradeInputOrderType.STOP_LIMIT
-        else:  # ABOVE
-            order_type = TradeInputOrderType.STOP_LIMIT if is_long else TradeInputOrderType.LIMIT
-
-        tx = await self.client.trade.build_trade_open_tx(
+        if order_type_name(direction, is_long) == "LIMIT":
+            order_type = TradeInputOrderType.LIMIT
+        else:
+            order_type = TradeInputOrderType.STOP_LIMIT
+
+        return await self._call("read", "build_open", lambda: self.client.trade.build_trade_open_tx(
             trade_input=trade_input,
             trade_input_order_type=order_type,
             slippage_percentage=1
-        )
-
-        # Sign and send
-        receipt = await self.client.sign_and_get_receipt(tx)
-
-        tx_hash = receipt["transactionHash"].hex()
-        order_type_name = "LIMIT" if order_type == TradeInputOrderType.LIMIT else "STOP-LIMIT"
-        print(f"[{side}] {order_type_name} at ${limit_price:.2f}: {tx_hash}")
-        return tx_hash
+        ))
 
+    @tracing.traced("cancel_order")
+    @ratelimit.prioritized(ratelimit.HIGH)
+    @metrics.timed("cancel")
     async def cancel_order(
         self,
         pair_index: int,
@@ -152,25 +329,30 @@ class AvantisTrader:
             Transaction hash or "DRY_RUN"
         """
         if dry_run:
-            print(f"[DRY-RUN] Cancelling order:")
-            print(f"  Pair Index: {pair_index}")
-            print(f"  Trade Index: {trade_index}")
+            log.info(f"[DRY-RUN] Cancelling order:")
+            log.info(f"  Pair Index: {pair_index}")
+            log.info(f"  Trade Index: {trade_index}")
             return "DRY_RUN"
 
         # Build cancel transaction
-        tx = await self.client.trade.build_order_cancel_tx(
+        tx = await self._call("read", "build_cancel", lambda: self.client.trade.build_order_cancel_tx(
             trader=self.wallet,
             pair_index=pair_index,
             trade_index=trade_index
-        )
+        ))
 
         # Sign and send
-        receipt = await self.client.sign_and_get_receipt(tx)
+        receipt = await self._call("write", "cancel", lambda: self.client.sign_and_get_receipt(tx))
 
         tx_hash = receipt["transactionHash"].hex()
-        print(f"[CANCEL] Order cancelled: {tx_hash}")
+        self.gas_used[tx_hash] = receipt.get("gasUsed")
+        self.book.remove(pair_index, trade_index)
+        log.info(f"[CANCEL] Order cancelled: {tx_hash}", extra={"tx_hash": tx_hash})
         return tx_hash
 
+    @tracing.traced("close_position")
+    @ratelimit.prioritized(ratelimit.HIGH)
+    @metrics.timed("close")
     async def close_position(
         self,
         pair_index: int,
@@ -191,33 +373,55 @@ class AvantisTrader:
             Transaction hash or "DRY_RUN"
         """
         if dry_run:
-            print(f"[DRY-RUN] Closing position:")
-            print(f"  Pair Index: {pair_index}")
-            print(f"  Trade Index: {trade_index}")
-            print(f"  Collateral to close: {collateral_to_close} USDC")
+            log.info(f"[DRY-RUN] Closing position:")
+            log.info(f"  Pair Index: {pair_index}")
+            log.info(f"  Trade Index: {trade_index}")
+            log.info(f"  Collateral to close: {collateral_to_close} USDC")
             return "DRY_RUN"
 
         # Build close transaction
-        tx = await self.client.trade.build_trade_close_tx(
+        tx = await self._call("read", "build_close", lambda: self.client.trade.build_trade_close_tx(
             trader=self.wallet,
             pair_index=pair_index,
             trade_index=trade_index,
             collateral_to_close=collateral_to_close
-        )
+        ))
 
         # Sign and send
-        receipt = await self.client.sign_and_get_receipt(tx)
+        receipt = await self._call("write", "close", lambda: self.client.sign_and_get_receipt(tx))
 
         tx_hash = receipt["transactionHash"].hex()
-        print(f"[CLOSE] Position closed: {tx_hash}")
+        self.gas_used[tx_hash] = receipt.get("gasUsed")
+        if collateral_to_close >= getattr(self.book.get(pair_index, trade_index),
+                                          "collateral_in_trade", float("inf")):
+            self.book.remove(pair_index, trade_index)
+        else:
+            self.book.mark_stale()
+        log.info(f"[CLOSE] Position closed: {tx_hash}", extra={"tx_hash": tx_hash})
         return tx_hash
 
+    @tracing.traced("get_open_trades")
+    @metrics.timed("get_trades")
     async def get_open_trades(self):
         """
-        Get all open trades for the wallet.
+        Get all open trades for the wallet from chain and reconcile the book.
 
         Returns:
             Tuple of (trades, pending_orders)
         """
-        trades, pending_orders = await self.client.trade.get_trades(self.wallet)
+        trades, pending_orders = await self._call(
+            "read", "get_trades", lambda: self.client.trade.get_trades(self.wallet))
+        self.book.reconcile(trades, pending_orders)
         return trades, pending_orders
+
+    async def open_trades(self, max_age: float = BOOK_MAX_AGE):
+        """
+        Open trades and pending orders from the local book.
+        Only reads the chain if the book is stale or older than max_age.
+
+        Returns:
+            Tuple of (trades, pending_orders)
+        """
+        if self.book.is_fresh(max_age):
+            return self.book.snapshot()
+        return await self.get_open_trades()
@@ -0,0 +1,120 @@
+"""
+Trading session calendar (MSK).
+
+Each day's randomized start and end are drawn once and cached, so the
+session edges do not move between checks. Weekdays can have their own
+hours or be off, and holidays are skipped.
+"""
+
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import config
+
+# MSK = UTC+3
+MSK = timezone(timedelta(hours=3))
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Longest stretch of back-to-back sessions followed by seconds_until_end
+MAX_MERGED_DAYS = 7
+
+
+class SessionCalendar:
+    """
+    Sessions keyed by the MSK date they start on.
+
+    A session with end hour <= start hour runs overnight into the next
+    day. Sessions that touch or overlap are treated as one.
+    """
+
+    def __init__(self):
+        self._days = {}
+        self._config = None
+
+    def _hours(self, day: date):
+        """(start_hour, end_hour) for a date, or None if there is no session."""
+        if day.isoformat() in config.TRADING_HOLIDAYS:
+            return None
+        schedule = config.TRADING_SCHEDULE
+        name = WEEKDAYS[day.weekday()]
+        if name in schedule:
+            return tuple(schedule[name]) if schedule[name] else None
+        return config.TRADING_START_HOUR, config.TRADING_END_HOUR
+
+    def session(self, day: date):
+        """(start, end) datetimes of the session starting on `day`, or None."""
+        current = (config.TRADING_START_HOUR, config.TRADING_END_HOUR,
+                   config.TRADING_HOURS_VARIANCE, repr(config.TRADING_SCHEDULE),
+                   tuple(config.TRADING_HOLIDAYS))
+        if current != self._config:
+            # Hours changed (hot reload): draw again
+            self._days.clear()
+            self._config = current
+
+        if day not in self._days:
+            hours = self._hours(day)
+            if hours is None:
+                self._days[day] = None
+            else:
+                start_hour, end_hour = hours
+                variance = config.TRADING_HOURS_VARIANCE
+                midnight = datetime(day.year, day.month, day.day, tzinfo=MSK)
+                start = midnight + timedelta(
+                    hours=start_hour, minutes=random.randint(-variance, variance))
+                end_day = midnight if end_hour > start_hour else midnight + timedelta(days=1)
+                end = end_day + timedelta(
+                    hours=end_hour, minutes=random.randint(-variance, variance))
+                self._days[day] = (start, end)
+        return self._days[day]
+
+    def current(self, now: datetime = None):
+        """The session open at `now` as (start, end), or None."""
+        now = now or datetime.now(MSK)
+        today = now.astimezone(MSK).date()
+        # An overnight session from yesterday may still be running
+        for day in (today - timedelta(days=1), today):
+            s = self.session(day)
+            if s and s[0] <= now < s[1]:
+                return s
+        return None
+
+    def is_open(self, now: datetime = None) -> bool:
+        return self.current(now) is not None
+
+    def seconds_until_end(self, now: datetime = None) -> float:
+        """Seconds until trading stops (0 if closed now)."""
+        now = now or datetime.now(MSK)
+        s = self.current(now)
+        if s is None:
+            return 0.0
+        end = s[1]
+        day = s[0].date()
+        for _ in range(MAX_MERGED_DAYS):
+            day += timedelta(days=1)
+            nxt = self.session(day)
+            if not nxt or nxt[0] > end:
+                break
+            end = max(end, nxt[1])
+        return (end - now).total_seconds()
+
+    def next_start(self, now: datetime = None):
+        """Start of the next session (now if one is open), or None if none within a year."""
+        now = now or datetime.now(MSK)
+        if self.is_open(now):
+            return now
+        day = now.astimezone(MSK).date()
+        for _ in range(366):
+            s = self.session(day)
+            if s and s[0] > now:
+                return s[0]
+            day += timedelta(days=1)
+        return None
+
+    def seconds_until_start(self, now: datetime = None) -> float:
+        """Seconds until the next session starts (0 if open now)."""
+        now = now or datetime.now(MSK)
+        start = self.next_start(now)
+        if start is None:
+            return float("inf")
+        return max((start - now).total_seconds(), 0.0)
@@ -0,0 +1,117 @@
+"""
+Heartbeat watchdog for the engine.
+
+Feed and chain calls have their own deadlines and retries (resilience.py),
+but an await without one, or a blocked loop, would still freeze the bot
+while orders sit unmanaged. The engine touches the heartbeat every loop
+iteration and before every sleep (BotControl.heartbeat). If it is overdue
+by WATCHDOG_TIMEOUT, the watchdog thread escalates one step every
+ESCALATION_STEP seconds until the heartbeat comes back:
+
+    1. switch endpoints
+    2. cancel all pending orders: a cancel-all command without pause, so
+       the engine ends its cycle (RESET -> IDLE) at its next safe point
+    3. restart the engine (main.run resumes from the cycle journal, the
+       cancel-all is still pending for it)
+
+Escalation steps and the overdue time are exported in metrics.
+"""
+
+import asyncio
+import threading
+import time
+
+import botlog
+import config
+import metrics
+
+log = botlog.get("watchdog")
+
+CHECK_INTERVAL = 1.0
+ESCALATION_STEP = 30
+
+
+class Watchdog:
+    """
+    Heartbeat monitor for one engine.
+
+    Args:
+        control: BotControl of the engine (trader and journal are read from it)
+    """
+
+    def __init__(self, control):
+        self.control = control
+        self.loop = None
+        self.engine = None
+        self.restart_requested = False
+        self._deadline = None
+        self._step = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ----- Loop side -----
+
+    def start(self, engine: asyncio.Task):
+        """Watch `engine` (the task running main.run). Call from inside the loop."""
+        self.loop = asyncio.get_running_loop()
+        self.engine = engine
+        self.restart_requested = False
+        self.beat()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+            self._thread.start()
+
+    def beat(self, grace: float = 0.0):
+        """The engine is alive; the next beat is due within grace + WATCHDOG_TIMEOUT."""
+        self._deadline = time.monotonic() + grace + config.WATCHDOG_TIMEOUT
+        if self._step:
+            log.info("[WATCHDOG] Engine heartbeat is back")
+            self._step = 0
+            metrics.HEARTBEAT_OVERDUE.set(0)
+
+    def suspend(self):
+        """Paused on purpose: nothing to watch until the next beat."""
+        self._deadline = None
+
+    def take_restart(self) -> bool:
+        """True once after the watchdog cancelled the engine to restart it."""
+        requested, self.restart_requested = self.restart_requested, False
+        return requested
+
+    def stop(self):
+        self._stop.set()
+
+    async def _switch_endpoints(self):
+        from price import reset_feed_client
+        reset_feed_client()
+        if self.control.trader is not None:
+            self.control.trader.switch_endpoint()
+
+    # ----- Watchdog thread -----
+
+    def _run(self):
+        while not self._stop.wait(CHECK_INTERVAL):
+            deadline = self._deadline
+            if deadline is None or not config.WATCHDOG_TIMEOUT:
+                continue
+            late = time.monotonic() - deadline
+            if late < 0:
+                continue
+            metrics.HEARTBEAT_OVERDUE.set(round(late + config.WATCHDOG_TIMEOUT, 1))
+            if self._step < len(metrics.WATCHDOG_STEPS) and late >= self._step * ESCALATION_STEP:
+                self._escalate(metrics.WATCHDOG_STEPS[self._step], late + config.WATCHDOG_TIMEOUT)
+                self._step += 1
+
+    def _escalate(self, step: str, overdue: float):
+        metrics.WATCHDOG_ESCALATIONS[step].inc()
+        log.error(f"[WATCHDOG] No engine heartbeat for {overdue:.0f}s: {step.replace('_', ' ')}")
+        try:
+            if step == "switch_endpoint":
+                asyncio.run_coroutine_threadsafe(self._switch_endpoints(), self.loop)
+            elif step == "cancel_all":
+                self.control.cancel_all(pause=False)
+            elif step == "restart":
+                self.restart_requested = True
+                self.loop.call_soon_threadsafe(self.engine.cancel)
+        except RuntimeError:
+            pass  # Loop closed in between: engine already finished